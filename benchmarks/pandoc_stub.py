@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""Minimal stand-in for pandoc, for benchmarking build_docx.py without it.
+
+Implements only what build_docx.py calls: --version, --print-default-data-file
+reference.docx, and markdown -> docx with --reference-doc (to -o FILE or, with
+-t docx, stdout). The conversion is line based (headings, paragraphs, fenced
+code, pipe tables, bullet lists, --toc) and produces the same kind of
+package pandoc does, so the later stages get realistic input. --lua-filter
+is not run; tables come out as docx_tables.lua makes pandoc write them.
+Its own conversion time says nothing about pandoc's.
+"""
+
+import io
+import re
+import sys
+import zipfile
+from xml.sax.saxutils import escape
+
+VERSION = "pandoc-stub 0.1 (benchmark stand-in)"
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+R_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+A_NS = "http://schemas.openxmlformats.org/drawingml/2006/main"
+WP_NS = "http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing"
+REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+DOC_TYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+CT = "application/vnd.openxmlformats-officedocument.wordprocessingml"
+
+CONTENT_TYPES = f"""<?xml version="1.0" encoding="UTF-8"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="xml" ContentType="application/xml"/>
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Override PartName="/word/document.xml" ContentType="{CT}.document.main+xml"/>
+<Override PartName="/word/styles.xml" ContentType="{CT}.styles+xml"/>
+<Override PartName="/word/numbering.xml" ContentType="{CT}.numbering+xml"/>
+<Override PartName="/word/footnotes.xml" ContentType="{CT}.footnotes+xml"/>
+<Override PartName="/word/settings.xml" ContentType="{CT}.settings+xml"/>
+<Override PartName="/word/theme/theme1.xml" ContentType="application/vnd.openxmlformats-officedocument.theme+xml"/>
+</Types>"""
+
+PACKAGE_RELS = f"""<?xml version="1.0" encoding="UTF-8"?>
+<Relationships xmlns="{REL_NS}"><Relationship Id="rId1" Type="{DOC_TYPE}/officeDocument" Target="word/document.xml"/></Relationships>"""
+
+DOCUMENT_RELS = f"""<?xml version="1.0" encoding="UTF-8"?>
+<Relationships xmlns="{REL_NS}">
+<Relationship Type="{DOC_TYPE}/numbering" Id="rId1" Target="numbering.xml"/>
+<Relationship Type="{DOC_TYPE}/styles" Id="rId2" Target="styles.xml"/>
+<Relationship Type="{DOC_TYPE}/settings" Id="rId3" Target="settings.xml"/>
+<Relationship Type="{DOC_TYPE}/theme" Id="rId4" Target="theme/theme1.xml"/>
+<Relationship Type="{DOC_TYPE}/footnotes" Id="rId5" Target="footnotes.xml"/>
+</Relationships>"""
+
+
+def _style(style_id, kind="paragraph", size=None, extra_ppr=""):
+    rpr = (f'<w:rPr><w:rFonts w:ascii="Cambria" w:hAnsi="Cambria" w:eastAsia="Cambria"/>'
+           f'<w:sz w:val="{size}"/><w:szCs w:val="{size}"/></w:rPr>') if size else ""
+    return (f'<w:style w:type="{kind}" w:styleId="{style_id}"><w:name w:val="{style_id}"/>'
+            f'<w:pPr><w:spacing w:before="0" w:after="0"/>{extra_ppr}</w:pPr>{rpr}</w:style>')
+
+
+STYLES = f"""<?xml version="1.0" encoding="UTF-8"?>
+<w:styles xmlns:w="{W_NS}">
+<w:docDefaults><w:rPrDefault><w:rPr><w:sz w:val="24"/><w:szCs w:val="24"/><w:lang w:val="en-US" w:eastAsia="en-US"/></w:rPr></w:rPrDefault>
+<w:pPrDefault><w:pPr><w:spacing w:after="200"/></w:pPr></w:pPrDefault></w:docDefaults>
+{_style("Normal")}{_style("BodyText")}{_style("Heading1", size=32)}{_style("Heading2", size=28)}
+{_style("Heading3", size=24)}{_style("Heading4", size=24)}{_style("Title", size=36)}{_style("BlockText")}
+{_style("TOCHeading")}{_style("Compact")}
+<w:style w:type="character" w:styleId="VerbatimChar"><w:name w:val="Verbatim Char"/><w:rPr><w:rFonts w:ascii="Consolas" w:hAnsi="Consolas"/><w:sz w:val="22"/></w:rPr></w:style>
+<w:style w:type="table" w:styleId="Table"><w:name w:val="Table"/><w:semiHidden/><w:tblPr/></w:style>
+</w:styles>"""
+
+THEME = f"""<?xml version="1.0" encoding="UTF-8"?>
+<a:theme xmlns:a="{A_NS}" name="Office Theme"><a:themeElements><a:fontScheme name="Office">
+<a:majorFont><a:latin typeface="Calibri"/><a:ea typeface=""/><a:cs typeface=""/><a:font script="Hang" typeface="Malgun Gothic"/></a:majorFont>
+<a:minorFont><a:latin typeface="Cambria"/><a:ea typeface=""/><a:cs typeface=""/><a:font script="Hang" typeface="Malgun Gothic"/></a:minorFont>
+</a:fontScheme></a:themeElements></a:theme>"""
+
+NUMBERING_EMPTY = f'<?xml version="1.0" encoding="UTF-8"?>\n<w:numbering xmlns:w="{W_NS}"/>'
+
+NUMBERING_BULLETS = f"""<?xml version="1.0" encoding="UTF-8"?>
+<w:numbering xmlns:w="{W_NS}"><w:abstractNum w:abstractNumId="990"><w:nsid w:val="0000A990"/>
+<w:multiLevelType w:val="multilevel"/><w:lvl w:ilvl="0"><w:numFmt w:val="bullet"/><w:lvlText w:val="&#8226;"/>
+<w:lvlJc w:val="left"/><w:pPr><w:ind w:left="720" w:hanging="360"/></w:pPr></w:lvl></w:abstractNum>
+<w:num w:numId="1000"><w:abstractNumId w:val="990"/></w:num></w:numbering>"""
+
+FOOTNOTES = f"""<?xml version="1.0" encoding="UTF-8"?>
+<w:footnotes xmlns:w="{W_NS}"><w:footnote w:type="continuationSeparator" w:id="0"><w:p><w:r><w:continuationSeparator/></w:r></w:p></w:footnote>
+<w:footnote w:type="separator" w:id="-1"><w:p><w:r><w:separator/></w:r></w:p></w:footnote></w:footnotes>"""
+
+SETTINGS = f'<?xml version="1.0" encoding="UTF-8"?>\n<w:settings xmlns:w="{W_NS}"/>'
+
+SECT_PR = ('<w:sectPr><w:pgSz w:w="12240" w:h="15840"/><w:pgMar w:top="1417" w:right="1417" '
+           'w:bottom="1417" w:left="1417" w:header="708" w:footer="708" w:gutter="0"/></w:sectPr>')
+
+TOC_SDT = ('<w:sdt><w:sdtPr><w:docPartObj><w:docPartGallery w:val="Table of Contents"/><w:docPartUnique/>'
+           '</w:docPartObj></w:sdtPr><w:sdtContent><w:p><w:pPr><w:pStyle w:val="TOCHeading"/></w:pPr>'
+           '<w:r><w:t xml:space="preserve">Table of Contents</w:t></w:r></w:p><w:p><w:r>'
+           '<w:fldChar w:fldCharType="begin" w:dirty="true"/><w:instrText xml:space="preserve">'
+           'TOC \\o &quot;1-3&quot; \\h \\z \\u</w:instrText><w:fldChar w:fldCharType="separate"/>'
+           '<w:fldChar w:fldCharType="end"/></w:r></w:p></w:sdtContent></w:sdt>')
+
+HEADING_RE = re.compile(r"^(#{1,6}) (.+)$")
+INLINE_CODE_RE = re.compile(r"`([^`]+)`")
+
+
+def _document(body):
+    return (f'<?xml version="1.0" encoding="UTF-8"?>\n<w:document xmlns:w="{W_NS}" xmlns:r="{R_NS}" '
+            f'xmlns:a="{A_NS}" xmlns:wp="{WP_NS}">\n  <w:body>{body}{SECT_PR}</w:body>\n</w:document>')
+
+
+def _zip(parts):
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in parts.items():
+            zf.writestr(name, data)
+    return out.getvalue()
+
+
+def reference_docx():
+    return _zip({
+        "[Content_Types].xml": CONTENT_TYPES,
+        "_rels/.rels": PACKAGE_RELS,
+        "word/_rels/document.xml.rels": DOCUMENT_RELS,
+        "word/document.xml": _document(""),
+        "word/styles.xml": STYLES,
+        "word/numbering.xml": NUMBERING_EMPTY,
+        "word/footnotes.xml": FOOTNOTES,
+        "word/settings.xml": SETTINGS,
+        "word/theme/theme1.xml": THEME,
+    })
+
+
+def _runs(text):
+    """Runs for inline text, with `code` spans in VerbatimChar."""
+    out = []
+    for i, piece in enumerate(INLINE_CODE_RE.split(text)):
+        if not piece:
+            continue
+        rpr = '<w:rPr><w:rStyle w:val="VerbatimChar"/></w:rPr>' if i % 2 else ""
+        out.append(f'<w:r>{rpr}<w:t xml:space="preserve">{escape(piece)}</w:t></w:r>')
+    return "".join(out)
+
+
+def _para(style, text, extra=""):
+    return f'<w:p><w:pPr><w:pStyle w:val="{style}"/>{extra}</w:pPr>{_runs(text)}</w:p>'
+
+
+def _table(rows, width):
+    cells = [[c.strip() for c in row.strip().strip("|").split("|")] for row in rows]
+    grid = "".join(f'<w:gridCol w:w="{width // len(cells[0])}"/>' for _ in cells[0])
+    xml = [f'<w:tbl><w:tblPr><w:tblStyle w:val="Table"/><w:tblW w:w="{round(5000 * width / 7920)}" w:type="pct"/>'
+           f'<w:tblLayout w:type="fixed"/><w:tblLook w:firstRow="1"/></w:tblPr><w:tblGrid>{grid}</w:tblGrid>']
+    for row in cells:
+        xml.append("<w:tr>" + "".join(f'<w:tc><w:tcPr/>{_para("Compact", cell)}</w:tc>'
+                                      for cell in row) + "</w:tr>")
+    xml.append("</w:tbl>")
+    return "".join(xml)
+
+
+def convert(text, with_toc, table_width=7920):
+    """Return (document.xml body, uses bullet numbering).
+
+    table_width: docx_tables.lua's -M table_width (column grid total, twips).
+    """
+    body = [TOC_SDT] if with_toc else []
+    lines = text.splitlines()
+    bookmark = 0
+    bullets = False
+    para = []
+    i = 0
+
+    def flush():
+        if para:
+            body.append(_para("BodyText", " ".join(para)))
+            para.clear()
+
+    while i < len(lines):
+        line = lines[i]
+        if line.startswith("```"):
+            flush()
+            i += 1
+            while i < len(lines) and not lines[i].startswith("```"):
+                body.append(f'<w:p><w:pPr><w:pStyle w:val="SourceCode"/></w:pPr><w:r>'
+                            f'<w:t xml:space="preserve">{escape(lines[i])}</w:t></w:r></w:p>')
+                i += 1
+        elif line.startswith("|"):
+            flush()
+            rows = []
+            while i < len(lines) and lines[i].startswith("|"):
+                if not re.match(r"^\|[\s:|-]+\|$", lines[i]):
+                    rows.append(lines[i])
+                i += 1
+            body.append(_table(rows, table_width))
+            continue
+        elif HEADING_RE.match(line):
+            flush()
+            level, title = HEADING_RE.match(line).groups()
+            name = re.sub(r"\s+", "-", title.lower())
+            body.append(f'<w:bookmarkStart w:id="{bookmark}" w:name="{escape(name)}"/>'
+                        + _para(f"Heading{min(len(level), 4)}", title)
+                        + f'<w:bookmarkEnd w:id="{bookmark}"/>')
+            bookmark += 1
+        elif line.startswith("- "):
+            flush()
+            bullets = True
+            body.append(_para("Compact", line[2:],
+                              '<w:numPr><w:ilvl w:val="0"/><w:numId w:val="1000"/></w:numPr>'))
+        elif not line.strip() or line.strip() == "---":
+            flush()
+        else:
+            para.append(line.strip())
+        i += 1
+    flush()
+    return "".join(body), bullets
+
+
+def main(argv):
+    if "--version" in argv:
+        print(VERSION)
+        return 0
+    if "--print-default-data-file" in argv:
+        sys.stdout.buffer.write(reference_docx())
+        return 0
+
+    inputs, output, reference, to_stdout = [], None, None, False
+    meta = {}
+    args = iter(argv)
+    for arg in args:
+        if arg == "-o":
+            output = next(args)
+        elif arg == "-t":
+            to_stdout = next(args) == "docx"
+        elif arg == "-f":
+            next(args)
+        elif arg == "-M":
+            key, _, value = next(args).partition("=")
+            meta[key] = value
+        elif arg.startswith("--reference-doc="):
+            reference = arg.split("=", 1)[1]
+        elif not arg.startswith("-"):
+            inputs.append(arg)
+
+    text = "\n\n".join(open(path, encoding="utf-8").read() for path in inputs)
+    body, bullets = convert(text, with_toc="--toc" in argv, table_width=int(meta.get("table_width", 7920)))
+
+    parts = {}
+    with zipfile.ZipFile(reference or io.BytesIO(reference_docx())) as ref:
+        for name in ref.namelist():
+            parts[name] = ref.read(name)
+    parts["word/document.xml"] = _document(body)
+    if bullets:
+        parts["word/numbering.xml"] = NUMBERING_BULLETS
+    data = _zip(parts)
+    if output and output != "-":
+        with open(output, "wb") as f:
+            f.write(data)
+    elif to_stdout:
+        sys.stdout.buffer.write(data)
+    else:
+        print("pandoc-stub: only docx output is supported", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""Benchmark convert.py and build_docx.py on a synthetic book.
+
+Generates a book (see synthetic_book.py), copies the build scripts next to
+it in a temp directory and runs each pipeline there with --report, so the
+per-stage wall time and peak RSS come from the scripts' own reports
+(buildstats.py). Each run is repeated --repeat times; the best time counts.
+
+Runs: convert (cold --force, then warm/no-op), build_docx (cold, warm),
+build_docx --writer native (cold, warm) and, with --per-chapter, build_docx --per-chapter (cold, warm). If pandoc is not
+installed, or with --stub-pandoc, benchmarks/pandoc_stub.py stands in for it
+(the pandoc stage is then meaningless, the other stages are not).
+
+Results are compared with a stored baseline (--baseline, default
+.build_cache/bench/baseline.json, written with --save-baseline); the exit
+status is 1 if any stage got slower or bigger than --threshold.
+
+Usage:
+    python3 benchmarks/run.py [--scale 2] [--repeat 3] [--save-baseline]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from synthetic_book import add_config_arguments, config_from_args, generate
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+DEFAULT_BASELINE = os.path.join(REPO_DIR, ".build_cache", "bench", "baseline.json")
+
+# Files a pipeline needs to run from a copy of the repo
+BUILD_FILES = ["convert.py", "build_docx.py", "docxwriter.py", "docx_tables.lua", "merge.py", "toc.py", "buildcache.py", "buildstats.py",
+               "highlight.py", "search.py", "bookindex.py", "index_terms.md", "fonts.py", "dist.py",
+               "offline.py"]
+BUILD_DIRS = ["css", "js"]
+
+# (run name, script, arguments); the warm runs follow their cold run
+RUNS = [
+    ("convert", "convert.py", ["--force"]),
+    ("convert-warm", "convert.py", []),
+    ("docx", "build_docx.py", ["--force"]),
+    ("docx-warm", "build_docx.py", []),
+    ("docx-native", "build_docx.py", ["--force", "--writer", "native"]),
+    ("docx-native-warm", "build_docx.py", ["--writer", "native"]),
+]
+PER_CHAPTER_RUNS = [
+    ("docx-chapters", "build_docx.py", ["--force", "--per-chapter"]),
+    ("docx-chapters-warm", "build_docx.py", ["--per-chapter"]),
+]
+
+# Recorded per stage, with the smallest difference that is not noise
+MEASURES = {
+    "wall_s": 0.05,
+    "peak_rss_kb": 8 * 1024,
+    "children_peak_rss_kb": 8 * 1024,
+}
+
+
+def prepare_workdir(workdir, config, stub_pandoc):
+    """Copy the build scripts, generate the book and return the run environment."""
+    for name in BUILD_FILES:
+        shutil.copy2(os.path.join(REPO_DIR, name), workdir)
+    for name in BUILD_DIRS:
+        shutil.copytree(os.path.join(REPO_DIR, name), os.path.join(workdir, name))
+    count = generate(workdir, config)
+    print(f"Synthetic book: {count} chapter files, "
+          f"{sum(os.path.getsize(os.path.join(workdir, 'parts', f)) for f in os.listdir(os.path.join(workdir, 'parts'))) // 1024} KB")
+
+    env = dict(os.environ)
+    if stub_pandoc:
+        bin_dir = os.path.join(workdir, "bin")
+        os.makedirs(bin_dir)
+        wrapper = os.path.join(bin_dir, "pandoc")
+        with open(wrapper, "w") as f:
+            f.write(f'#!/bin/sh\nexec "{sys.executable}" "{os.path.join(BENCH_DIR, "pandoc_stub.py")}" "$@"\n')
+        os.chmod(wrapper, 0o755)
+        env["PATH"] = bin_dir + os.pathsep + env.get("PATH", "")
+    return env
+
+
+def run_once(workdir, env, script, args):
+    """Run a pipeline and return its report."""
+    report_path = os.path.join(workdir, "report.json")
+    result = subprocess.run([sys.executable, script, *args, "--report", report_path],
+                            cwd=workdir, env=env, capture_output=True, text=True)
+    if result.returncode != 0 or not os.path.exists(report_path):
+        raise RuntimeError(f"{script} {' '.join(args)} failed:\n{result.stdout[-2000:]}{result.stderr[-2000:]}")
+    with open(report_path, encoding="utf-8") as f:
+        report = json.load(f)
+    os.remove(report_path)
+    return report
+
+
+def run_benchmarks(workdir, env, runs, repeat):
+    """Return {"run/stage": {"wall_s", "peak_rss_kb", "children_peak_rss_kb"}}.
+
+    Each value is the best (lowest) of the repeats. Peak RSS is the high-water
+    mark at the end of the stage, for the build process and for its children
+    (pandoc, render workers) separately.
+    """
+    results = {}
+    for _ in range(repeat):
+        for name, script, args in runs:
+            report = run_once(workdir, env, script, args)
+            for stage in report["stages"] + [dict(report["total"], name="total")]:
+                sample = {field: stage.get(field) or 0 for field in MEASURES}
+                best = results.setdefault(f"{name}/{stage['name']}", sample)
+                for field in MEASURES:
+                    best[field] = min(best[field], sample[field])
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print results next to the baseline; return the regressed keys."""
+    regressions = []
+    print(f"\n{'run/stage':<36}{'wall':>9}{'base':>9}{'rss MB':>8}{'base':>6}{'child MB':>10}{'base':>6}")
+    for key, cur in results.items():
+        base = baseline.get(key)
+        columns = []
+        worse = []
+        for field, min_delta in MEASURES.items():
+            value = cur[field]
+            base_value = base.get(field) if base else None
+            if field == "wall_s":
+                columns.append(f"{value:>8.2f}s" + (f"{base_value:>8.2f}s" if base_value is not None else f"{'-':>9}"))
+            else:
+                width = 8 if field == "peak_rss_kb" else 10
+                columns.append(f"{value / 1024:>{width}.0f}"
+                               + (f"{base_value / 1024:>6.0f}" if base_value is not None else f"{'-':>6}"))
+            if (base_value is not None and value > base_value * (1 + threshold)
+                    and value - base_value > min_delta):
+                worse.append(field)
+        if worse:
+            regressions.append(key)
+        print(f"{key:<36}{''.join(columns)}" + (f"  REGRESSED ({', '.join(worse)})" if worse else ""))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_config_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=1, help="runs per pipeline, best counts (default: 1)")
+    parser.add_argument("--per-chapter", action="store_true", help="also benchmark build_docx.py --per-chapter")
+    parser.add_argument("--stub-pandoc", action="store_true", help="use pandoc_stub.py even if pandoc is installed")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown/growth per stage, as a fraction (default: 0.25)")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    parser.add_argument("--keep", action="store_true", help="keep the temp build directory")
+    args = parser.parse_args(argv)
+
+    config = config_from_args(args)
+    stub_pandoc = args.stub_pandoc or shutil.which("pandoc") is None
+    if stub_pandoc:
+        print("pandoc: using benchmarks/pandoc_stub.py")
+    runs = RUNS + (PER_CHAPTER_RUNS if args.per_chapter else [])
+
+    workdir = tempfile.mkdtemp(prefix="book-bench-")
+    try:
+        env = prepare_workdir(workdir, config, stub_pandoc)
+        results = run_benchmarks(workdir, env, runs, args.repeat)
+    finally:
+        if args.keep:
+            print(f"Build directory kept: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    setup = {"config": config._asdict(), "stub_pandoc": stub_pandoc,
+             "python": sys.version.split()[0], "cpu_count": os.cpu_count()}
+    stored = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            stored = json.load(f)
+    baseline = stored.get("results", {})
+    if baseline and stored.get("setup") != setup:
+        print(f"\nBaseline {args.baseline} was recorded with a different setup; not comparing.")
+        baseline = {}
+
+    regressions = compare(results, baseline, args.threshold)
+    data = {"setup": setup, "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"\nBaseline saved: {args.baseline}")
+
+    if regressions:
+        print(f"\n✗ {len(regressions)} stage(s) regressed by more than {args.threshold:.0%}")
+        return 1
+    if baseline:
+        print(f"\n✓ No stage regressed by more than {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
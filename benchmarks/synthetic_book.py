@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""Generate a synthetic book in the layout the build scripts expect.
+
+Writes list.md and parts/chNN.md / parts/appendix_x.md under OUTDIR. The
+defaults roughly match the real manuscript (25 files, ~700 fenced code
+blocks, ~1000 table rows, ~820 headings); every knob can be scaled for
+benchmarks. Output is deterministic for a given seed.
+
+Usage:
+    python3 benchmarks/synthetic_book.py OUTDIR [--chapters 21] [--scale 2] ...
+"""
+
+import argparse
+import os
+import random
+from collections import namedtuple
+
+# Per-chapter content mix
+BookConfig = namedtuple("BookConfig", [
+    "chapters",          # numbered chapters
+    "appendices",        # 부록 A, B, ...
+    "chapters_per_part",
+    "sections",          # "## N.M" headings per chapter
+    "subsections",       # "### N.M.K" headings per section
+    "paragraphs",        # prose paragraphs per subsection
+    "code_blocks",       # fenced code blocks per chapter
+    "code_lines",        # average lines per code block
+    "tables",            # tables per chapter
+    "table_rows",        # body rows per table
+    "korean",            # share of Korean words in prose, 0..1
+    "seed",
+])
+
+DEFAULT_CONFIG = BookConfig(
+    chapters=21, appendices=4, chapters_per_part=3, sections=8, subsections=3,
+    paragraphs=2, code_blocks=28, code_lines=12, tables=7, table_rows=5,
+    korean=0.8, seed=1,
+)
+
+KOREAN_WORDS = (
+    "리액티브 스트림 비동기 논블로킹 데이터 처리 요청 응답 서버 클라이언트 구독 발행 "
+    "연산자 스케줄러 스레드 배압 이벤트 저장소 컬렉션 문서 인덱스 쿼리 트랜잭션 설정 "
+    "테스트 보안 인증 필터 라우터 핸들러 예외 로그 성능 메모리 캐시 배포 컨테이너"
+).split()
+KOREAN_ENDINGS = ["이다.", "한다.", "할 수 있다.", "을 살펴본다.", "가 필요하다.", "를 사용한다."]
+ENGLISH_WORDS = (
+    "Mono Flux Publisher Subscriber WebFlux Reactor MongoDB Netty backpressure operator "
+    "scheduler repository template router handler filter codec buffer stream index query"
+).split()
+CODE_LANGS = ["java", "yaml", "bash", "json", "kotlin"]
+IDENTIFIERS = ["user", "order", "product", "event", "result", "client", "repository", "service"]
+
+
+def _prose(rng, config, words):
+    """One prose sentence with the configured Korean/English mix."""
+    out = []
+    for _ in range(words):
+        if rng.random() < config.korean:
+            out.append(rng.choice(KOREAN_WORDS))
+        else:
+            word = rng.choice(ENGLISH_WORDS)
+            out.append(f"`{word}`" if rng.random() < 0.2 else word)
+    return " ".join(out) + (rng.choice(KOREAN_ENDINGS) if config.korean else ".")
+
+
+def _paragraph(rng, config):
+    return " ".join(_prose(rng, config, rng.randint(8, 16)) for _ in range(rng.randint(2, 4)))
+
+
+def _code_block(rng, config):
+    lang = rng.choice(CODE_LANGS)
+    lines = []
+    for i in range(max(1, int(rng.gauss(config.code_lines, config.code_lines / 3)))):
+        name = rng.choice(IDENTIFIERS)
+        if lang in ("java", "kotlin"):
+            lines.append(f"    {name}{i}.map(v -> v.{rng.choice(IDENTIFIERS)}()).subscribe(); "
+                         f"// {rng.choice(KOREAN_WORDS)}")
+        elif lang == "yaml":
+            lines.append(f"{'  ' * (i % 3)}{name}-{i}: {rng.randint(1, 9999)}")
+        elif lang == "bash":
+            lines.append(f"curl -s http://localhost:8080/api/{name}s/{i} | jq .")
+        else:
+            lines.append(f'  "{name}{i}": "{rng.choice(ENGLISH_WORDS)}",')
+    return f"```{lang}\n" + "\n".join(lines) + "\n```"
+
+
+def _table(rng, config):
+    cols = rng.randint(2, 5)
+    header = "| " + " | ".join(rng.choice(KOREAN_WORDS) for _ in range(cols)) + " |"
+    sep = "|" + "|".join("------" for _ in range(cols)) + "|"
+    rows = ["| " + " | ".join(
+        f"`{rng.choice(ENGLISH_WORDS)}`" if c == 0 else _prose(rng, config, rng.randint(2, 6))
+        for c in range(cols)) + " |" for _ in range(config.table_rows)]
+    return "\n".join([header, sep] + rows)
+
+
+def _chapter(rng, config, label, number, title):
+    """Markdown text and section titles of one chapter."""
+    blocks = [f"# {label}. {title}", _paragraph(rng, config), "---"]
+    slots = config.sections * config.subsections
+    # Spread code blocks and tables evenly over the subsections
+    code_at = [i * slots // config.code_blocks for i in range(config.code_blocks)] if config.code_blocks else []
+    table_at = [i * slots // config.tables for i in range(config.tables)] if config.tables else []
+    sections = []
+    slot = 0
+    for s in range(1, config.sections + 1):
+        section = f"{number}.{s} {rng.choice(ENGLISH_WORDS)} {rng.choice(KOREAN_WORDS)}"
+        sections.append(section)
+        blocks.append(f"## {section}")
+        blocks.append(_paragraph(rng, config))
+        for k in range(1, config.subsections + 1):
+            blocks.append(f"### {number}.{s}.{k} {rng.choice(KOREAN_WORDS)} {rng.choice(KOREAN_WORDS)}")
+            for _ in range(config.paragraphs):
+                blocks.append(_paragraph(rng, config))
+            blocks.extend(_code_block(rng, config) for _ in range(code_at.count(slot)))
+            blocks.extend(_table(rng, config) for _ in range(table_at.count(slot)))
+            slot += 1
+    blocks.append("## 정리")
+    blocks.append(_paragraph(rng, config))
+    return "\n\n".join(blocks) + "\n", sections
+
+
+def generate(outdir, config=DEFAULT_CONFIG):
+    """Write list.md and parts/*.md for config under outdir. Returns the file count."""
+    rng = random.Random(config.seed)
+    parts_dir = os.path.join(outdir, "parts")
+    os.makedirs(parts_dir, exist_ok=True)
+
+    toc = ["# Synthetic Book 목차", "", "---", ""]
+    count = 0
+    for n in range(1, config.chapters + 1):
+        if (n - 1) % config.chapters_per_part == 0:
+            part = (n - 1) // config.chapters_per_part + 1
+            toc += [f"## Part {part}. {rng.choice(KOREAN_WORDS)} {rng.choice(KOREAN_WORDS)}", ""]
+        title = f"{rng.choice(ENGLISH_WORDS)} {rng.choice(KOREAN_WORDS)}"
+        text, sections = _chapter(rng, config, f"Chapter {n}", n, title)
+        with open(os.path.join(parts_dir, f"ch{n:02d}.md"), "w", encoding="utf-8") as f:
+            f.write(text)
+        toc += [f"### Chapter {n}. {title}"] + [f"- {s}" for s in sections] + [""]
+        count += 1
+
+    if config.appendices:
+        toc += ["---", "", "## 부록", ""]
+    for i in range(config.appendices):
+        letter = chr(ord("A") + i)
+        title = f"{rng.choice(KOREAN_WORDS)} 레퍼런스"
+        text, _ = _chapter(rng, config, f"부록 {letter}", letter, title)
+        with open(os.path.join(parts_dir, f"appendix_{letter.lower()}.md"), "w", encoding="utf-8") as f:
+            f.write(text)
+        toc.append(f"### 부록 {letter}. {title}")
+        count += 1
+
+    with open(os.path.join(outdir, "list.md"), "w", encoding="utf-8") as f:
+        f.write("\n".join(toc) + "\n")
+    return count
+
+
+def add_config_arguments(parser):
+    """Add one option per BookConfig field (plus --scale) to parser."""
+    for field in BookConfig._fields:
+        default = getattr(DEFAULT_CONFIG, field)
+        parser.add_argument(f"--{field.replace('_', '-')}", type=type(default), default=default,
+                            help=f"(default: {default})")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="multiply the number of chapters (default: 1)")
+
+
+def config_from_args(args):
+    """BookConfig from parsed add_config_arguments options."""
+    config = BookConfig(**{field: getattr(args, field) for field in BookConfig._fields})
+    return config._replace(chapters=max(1, round(config.chapters * args.scale)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("outdir")
+    add_config_arguments(parser)
+    args = parser.parse_args(argv)
+    count = generate(args.outdir, config_from_args(args))
+    print(f"Generated {count} chapter files in {args.outdir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""Back-of-book index (찾아보기) for the HTML and DOCX editions.
+
+The terms come from index_terms.md. Each chapter source is scanned once
+with an Aho-Corasick automaton over every term pattern, so a scan costs
+the same whether the list has ten terms or a thousand. A match is
+recorded against its section: the nearest h1-h3 heading above it, with
+the heading id the HTML page gives it (Python-Markdown's toc extension).
+Fenced code is not scanned, except for the terms listed under
+"## 코드 포함".
+
+Matching: ASCII letters match regardless of case, and a pattern that
+starts or ends with an ASCII letter, digit or "_" only matches there at a
+word boundary (flatMap does not match flatMapMany). Hangul has no
+boundary check, so 배압 also matches 배압을.
+
+The hits are cached per chapter and pattern in .build_cache/book_index.json.
+A chapter is rescanned when its source changes. When the term list
+changes, removed patterns are dropped from the cached hits, and only the
+chapters whose text contains an added pattern are scanned again, for the
+added patterns only; renaming or regrouping terms scans nothing.
+
+Usage:
+    python3 bookindex.py          # print the index
+"""
+
+import os
+import re
+from collections import deque, namedtuple
+
+from buildcache import CACHE_DIR, load_json, save_json, source_state
+from toc import BASE_DIR, PARTS_DIR, all_chapters, load_toc
+
+TERMS_MD = os.path.join(BASE_DIR, "index_terms.md")
+INDEX_CACHE_PATH = os.path.join(CACHE_DIR, "book_index.json")
+
+# Bump when the scan or the cache layout changes
+INDEX_VERSION = "1"
+
+# name: "배압(Backpressure)", patterns: ["배압", "backpressure"] (case-folded),
+# code: also matched inside fenced code
+Term = namedtuple("Term", ["name", "patterns", "code"])
+# anchor: heading id on the chapter page, level: 1-3 (0 for text before the first heading)
+Section = namedtuple("Section", ["anchor", "title", "level"])
+# locations: [(file_id, section index)] in book order
+Entry = namedtuple("Entry", ["term", "locations"])
+# sections: {file_id: [Section]}, entries: [Entry] in index order
+BookIndex = namedtuple("BookIndex", ["sections", "entries"])
+
+TERM_RE = re.compile(r"^- (.+?)(?:\s*:\s*(.+))?$")
+BILINGUAL_RE = re.compile(r"^(.+?)\s*\((.+)\)$")
+CODE_SECTION = "## 코드 포함"
+
+FENCE_RE = re.compile(r"^(`{3,}|~{3,})")
+HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)(?:\s+#+)?\s*$")
+LINK_RE = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+SECTION_NUMBER_RE = re.compile(r"^((?:\d+|[A-Z])(?:\.\d+)+)\s")
+
+ASCII_FOLD = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+WORD_CHARS = frozenset("abcdefghijklmnopqrstuvwxyz0123456789_")
+# Initial consonants of the Hangul syllables, in syllable order (19 each)
+CHOSEONG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+# Index groups use the plain consonant (ㄲ under ㄱ)
+GROUP_OF = {"ㄲ": "ㄱ", "ㄸ": "ㄷ", "ㅃ": "ㅂ", "ㅆ": "ㅅ", "ㅉ": "ㅈ"}
+
+
+def fold(text):
+    """Lower-case ASCII letters only, so offsets stay the same."""
+    return text.translate(ASCII_FOLD)
+
+
+def parse_terms(text):
+    """Parse index_terms.md into [Term].
+
+    "- 표제어" adds a term; "배압(Backpressure)" is looked up as 배압 and
+    as Backpressure, and "- 표제어: 별칭, 별칭" adds other spellings.
+    Terms below "## 코드 포함" are matched inside fenced code too.
+    """
+    terms = []
+    code = False
+    for line in text.splitlines():
+        line = line.rstrip()
+        if line.startswith("## "):
+            code = line == CODE_SECTION
+            continue
+        m = TERM_RE.match(line)
+        if not m:
+            continue
+        name = m.group(1)
+        bilingual = BILINGUAL_RE.match(name)
+        patterns = [bilingual.group(1), bilingual.group(2)] if bilingual else [name]
+        if m.group(2):
+            patterns += [alias.strip() for alias in m.group(2).split(",")]
+        patterns = list(dict.fromkeys(fold(p) for p in patterns if p))
+        terms.append(Term(name, patterns, code))
+    return terms
+
+
+def load_terms(path=TERMS_MD):
+    """The term list, or [] if there is none."""
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return parse_terms(f.read())
+
+
+# ============================================================
+# Aho-Corasick automaton
+# ============================================================
+class Automaton:
+    """Finds every occurrence of every pattern in one pass over a text.
+
+    The trie's failure links are folded into a full transition table
+    (delta), so each character costs one dict lookup however many
+    patterns share a prefix.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        goto = [{}]
+        out = [[]]
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for char in pattern:
+                if char not in goto[state]:
+                    goto[state][char] = len(goto)
+                    goto.append({})
+                    out.append([])
+                state = goto[state][char]
+            out[state].append(index)
+
+        # Breadth-first, so a state's failure target is complete before the state
+        delta = [dict(goto[0])] + [None] * (len(goto) - 1)
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        for state in queue:
+            delta[state] = {**delta[0], **goto[state]}
+        while queue:
+            state = queue.popleft()
+            for char, nxt in goto[state].items():
+                fail[nxt] = delta[fail[state]].get(char, 0)
+                out[nxt] += out[fail[nxt]]
+                delta[nxt] = {**delta[fail[nxt]], **goto[nxt]}
+                queue.append(nxt)
+        self.delta = delta
+        self.out = [tuple(matches) for matches in out]
+        # Patterns that need a word boundary before / after them
+        self.check_start = [bool(p) and p[0] in WORD_CHARS for p in self.patterns]
+        self.check_end = [bool(p) and p[-1] in WORD_CHARS for p in self.patterns]
+
+    def matches(self, text):
+        """Indexes of the patterns occurring in text (case-folded) at word boundaries."""
+        delta, out = self.delta, self.out
+        found = set()
+        state = 0
+        for end, char in enumerate(text, 1):
+            state = delta[state].get(char, 0)
+            if out[state]:
+                for index in out[state]:
+                    if index in found:
+                        continue
+                    start = end - len(self.patterns[index])
+                    if self.check_start[index] and start > 0 and text[start - 1] in WORD_CHARS:
+                        continue
+                    if self.check_end[index] and end < len(text) and text[end] in WORD_CHARS:
+                        continue
+                    found.add(index)
+        return found
+
+
+# ============================================================
+# Chapter scan
+# ============================================================
+def heading_text(raw):
+    """Heading Markdown as the rendered heading's text."""
+    return LINK_RE.sub(r"\1", raw).replace("`", "").replace("**", "")
+
+
+def scan_chapter(text, prose, code=None):
+    """Scan a chapter's Markdown once, line by line.
+
+    prose and code are Automatons (or None) for the lines outside and
+    inside fenced code blocks. Returns (sections, prose hits, code hits),
+    hits being {pattern: [section index, ...]}. Section 0 holds the text
+    before the first heading.
+    """
+    from markdown.extensions.toc import slugify, unique
+
+    sections = [Section("", "", 0)]
+    hits = ({}, {})
+    used_ids = set()
+    fence = None
+    for line in text.splitlines():
+        m = FENCE_RE.match(line)
+        if m:
+            if fence is None:
+                fence = m.group(1)
+            elif line.startswith(fence) and not line[len(fence):].strip():
+                fence = None
+            continue
+        if fence is None:
+            m = HEADING_RE.match(line)
+            if m:
+                title = heading_text(m.group(2))
+                # Every heading level takes an id, as in the toc extension
+                anchor = unique(slugify(title, "-"), used_ids)
+                if len(m.group(1)) <= 3:
+                    sections.append(Section(anchor, title, len(m.group(1))))
+        automaton, found = (prose, hits[0]) if fence is None else (code, hits[1])
+        if automaton is not None:
+            for index in automaton.matches(fold(line)):
+                found.setdefault(automaton.patterns[index], []).append(len(sections) - 1)
+    return sections, *({p: sorted(set(s)) for p, s in h.items()} for h in hits)
+
+
+# ============================================================
+# Cached index
+# ============================================================
+def update_hits(terms, force=False):
+    """Bring the cached hits up to date with the sources and the term list.
+
+    Returns ({file_id: chapter record}, chapters scanned in full, chapters
+    scanned for added patterns only). A record holds "sections" and the
+    "prose" and "code" hits.
+    """
+    prose = sorted({p for term in terms for p in term.patterns})
+    code = sorted({p for term in terms if term.code for p in term.patterns})
+    cache = {} if force else load_json(INDEX_CACHE_PATH)
+    if cache.get("version") != INDEX_VERSION:
+        cache = {}
+    cached = cache.get("chapters", {})
+    old = cache.get("patterns", {"prose": [], "code": []})
+    added = (sorted(set(prose) - set(old["prose"])), sorted(set(code) - set(old["code"])))
+    removed = (set(old["prose"]) - set(prose), set(old["code"]) - set(code))
+
+    full = None
+    chapters = {}
+    scanned = partial = 0
+    for chapter in all_chapters(load_toc()):
+        md_path = os.path.join(PARTS_DIR, f"{chapter.file_id}.md")
+        if not os.path.exists(md_path):
+            continue
+        previous = cached.get(chapter.file_id, {})
+        source = source_state(md_path, previous.get("source"))
+        if previous.get("source", [None] * 3)[2] != source[2]:
+            if full is None:
+                full = (Automaton(prose), Automaton(code) if code else None)
+            with open(md_path, "r", encoding="utf-8") as f:
+                sections, prose_hits, code_hits = scan_chapter(f.read(), *full)
+            chapters[chapter.file_id] = {"source": source, "sections": sections,
+                                         "prose": prose_hits, "code": code_hits}
+            scanned += 1
+            continue
+
+        record = dict(previous, source=source)
+        for kind, gone in zip(("prose", "code"), removed):
+            record[kind] = {p: s for p, s in record[kind].items() if p not in gone}
+        if added[0] or added[1]:
+            with open(md_path, "r", encoding="utf-8") as f:
+                text = f.read()
+            folded = fold(text)
+            new = [[p for p in patterns if p in folded] for patterns in added]
+            if new[0] or new[1]:
+                _, prose_hits, code_hits = scan_chapter(
+                    text, *(Automaton(patterns) if patterns else None for patterns in new))
+                record["prose"] = {**record["prose"], **prose_hits}
+                record["code"] = {**record["code"], **code_hits}
+                partial += 1
+        chapters[chapter.file_id] = record
+
+    save_json(INDEX_CACHE_PATH, {"version": INDEX_VERSION, "patterns": {"prose": prose, "code": code},
+                                 "chapters": chapters})
+    return chapters, scanned, partial
+
+
+def sort_key(name):
+    """Hangul terms first (가나다 order), then Latin (A-Z), then the rest."""
+    first = name[0]
+    if "가" <= first <= "힣":
+        return 0, name
+    if first.isascii() and first.isalpha():
+        return 1, name.casefold()
+    return 2, name
+
+
+def group_label(name):
+    """Index group of a term: ㄱ-ㅎ for Hangul, A-Z for Latin, 기호 otherwise."""
+    first = name[0]
+    if "가" <= first <= "힣":
+        initial = CHOSEONG[(ord(first) - ord("가")) // 588]
+        return GROUP_OF.get(initial, initial)
+    if first.isascii() and first.isalpha():
+        return first.upper()
+    return "기호"
+
+
+def load_index(force=False, verbose=True):
+    """The book's index: every term's sections, in index order.
+
+    Terms without a match are left out.
+    """
+    terms = load_terms()
+    chapters, scanned, partial = update_hits(terms, force)
+    if verbose and (scanned or partial):
+        print(f"Index: scanned {scanned} chapter(s), {partial} for new terms only "
+              f"({len(terms)} terms)")
+    entries = []
+    for term in sorted(terms, key=lambda t: sort_key(t.name)):
+        locations = []
+        for file_id, record in chapters.items():
+            found = set()
+            for pattern in term.patterns:
+                found.update(record["prose"].get(pattern, ()))
+                if term.code:
+                    found.update(record["code"].get(pattern, ()))
+            locations += [(file_id, index) for index in sorted(found)]
+        if locations:
+            entries.append(Entry(term, locations))
+    sections = {file_id: [Section(*s) for s in record["sections"]] for file_id, record in chapters.items()}
+    return BookIndex(sections, entries)
+
+
+def section_label(section, chapter_label):
+    """Short label of a location: "5.3" for numbered sections, else the chapter and title."""
+    m = SECTION_NUMBER_RE.match(section.title)
+    if m:
+        return m.group(1)
+    if section.level <= 1:
+        return chapter_label
+    return f"{chapter_label} {section.title}"
+
+
+def main():
+    index = load_index()
+    labels = {c.file_id: c.label for c in all_chapters(load_toc())}
+    group = None
+    for entry in index.entries:
+        if group_label(entry.term.name) != group:
+            group = group_label(entry.term.name)
+            print(f"\n{group}")
+        places = [section_label(index.sections[file_id][i], labels[file_id]) for file_id, i in entry.locations]
+        print(f"  {entry.term.name}  {', '.join(places)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""Build the HTML and DOCX editions together from one dependency graph.
+
+Every stage of convert.py and build_docx.py is a task with declared
+inputs and outputs (see taskgraph.py):
+
+    render <chapter> (x25) ──┐
+    index page ──────────────┼── html
+    merge ───────────────────┘
+      └── pandoc ── front matter ── .docx
+    reference doc ──┘
+
+With --writer native the two DOCX tasks after merge are one task,
+"native writer" (build_docx.py --writer native).
+
+Independent tasks run at the same time: chapters render in worker
+processes while pandoc converts books.md, and the reference doc does not
+wait for the sources at all. Tasks whose inputs did not change since
+the last run are skipped. At the end the critical path (the chain of
+tasks that set the total time) is printed.
+
+Usage:
+    python3 build.py [html] [docx] [--force] [-j N] [--dist] [--writer native]
+"""
+
+import argparse
+import glob
+import os
+import time
+from pathlib import Path
+
+import markdown
+import pymdownx
+
+import build_docx
+import convert
+from bookindex import TERMS_MD
+from buildcache import BASE_DIR, CACHE_DIR, load_json, save_json
+from buildstats import BuildStats
+from highlight import HIGHLIGHTER_KEY
+from merge import aggregates, merge_all
+from taskgraph import Task, critical_path, dependencies, run_tasks
+from toc import LIST_MD, all_chapters, load_toc
+
+# Intermediate DOCX file between the pandoc and front matter tasks
+PANDOC_DOCX = os.path.join(CACHE_DIR, "docx", "pandoc.docx")
+
+TARGETS = {"html": "html", "docx": "front matter"}
+NATIVE_TARGETS = {"html": "html", "docx": "native writer"}
+
+
+def _code(*modules):
+    """Source files of the given modules, as task inputs."""
+    return [os.path.join(BASE_DIR, f"{module}.py") for module in modules]
+
+
+# ============================================================
+# Task bodies (module level, so worker processes can run them)
+# ============================================================
+def render_chapter(file_id, md_path):
+    """Render one chapter body. Returns (file_id, body key, html)."""
+    with open(md_path, "r", encoding="utf-8") as f:
+        md_text = f.read()
+    return file_id, convert.body_key(md_text), convert.convert_md_to_html(md_text)
+
+
+def run_html(dist):
+    """convert.py's build; every chapter body is already rendered.
+
+    With --force the page manifest was cleared, so every page is rewritten
+    without rendering the bodies again.
+    """
+    args = argparse.Namespace(force=False, dist=dist)
+    rebuilt, total = convert.build(args, 1, BuildStats("convert"))
+    print(f"html: {rebuilt} of {total} files rebuilt")
+
+
+def run_reference():
+    build_docx.build_reference(build_docx.reference_key())
+
+
+def run_pandoc():
+    os.makedirs(os.path.dirname(PANDOC_DOCX), exist_ok=True)
+    if not build_docx.run_pandoc(Path(PANDOC_DOCX)):
+        raise RuntimeError("pandoc failed")
+
+
+def run_front_matter():
+    doc = build_docx.DocxPackage.open(PANDOC_DOCX)
+    build_docx.add_front_matter(doc)
+    build_docx.add_book_index(doc)
+    doc.save(build_docx.OUTPUT_DOCX)
+
+
+def run_native():
+    build_docx.write_native(build_docx.OUTPUT_DOCX)
+
+
+# ============================================================
+# Graph
+# ============================================================
+def make_tasks(force=False, dist=False, writer="pandoc"):
+    """Every task of both builds, with its inputs and outputs."""
+    chapters = [(c.file_id, os.path.join(convert.PARTS_DIR, f"{c.file_id}.md"))
+                for c in all_chapters(load_toc())]
+    chapter_paths = [path for _, path in chapters]
+    merged = [out_path for out_path, _ in aggregates()]
+    manifest = {} if force else load_json(convert.MANIFEST_PATH)
+
+    def save_body(result):
+        file_id, key, body_html = result
+        convert.save_fragment(file_id, body_html, key, manifest)
+        save_json(convert.MANIFEST_PATH, manifest)
+
+    def save_index(index_html):
+        key = convert.content_hash(index_html)
+        if not convert.is_current("index.html", key, manifest):
+            convert.write_output("index.html", index_html, key, manifest)
+            save_json(convert.MANIFEST_PATH, manifest)
+
+    renders = []
+    for file_id, md_path in chapters:
+        renders.append(Task(
+            f"render {file_id}", render_chapter, (file_id, md_path),
+            inputs=[md_path, *_code("convert", "highlight")],
+            outputs=[os.path.join(convert.FRAGMENTS_DIR, f"{file_id}.html")],
+            params=(convert.RENDER_VERSION, markdown.__version__, pymdownx.__version__, HIGHLIGHTER_KEY),
+            pool="process", done=save_body))
+    fragments = [path for task in renders for path in task.outputs]
+    pages = [os.path.join(convert.CONTENTS_DIR, f"{file_id}.html") for file_id, _ in chapters]
+    html_inputs = [LIST_MD, TERMS_MD, convert.CSS_FILE, *sorted(glob.glob(os.path.join(BASE_DIR, "js", "*.js")))]
+    html_inputs += sorted(glob.glob(os.path.join(BASE_DIR, "fonts", "src", "*")))
+    docx_ref = str(build_docx.OUTPUT_REF)
+    if writer == "native":
+        docx_tasks = [
+            Task("native writer", run_native,
+                 inputs=[str(build_docx.BOOKS_MD), docx_ref, LIST_MD, TERMS_MD, *chapter_paths,
+                         *_code("build_docx", "docxwriter", "bookindex", "toc")],
+                 outputs=[str(build_docx.OUTPUT_DOCX)]),
+        ]
+    else:
+        docx_tasks = [
+            Task("pandoc", run_pandoc,
+                 inputs=[str(build_docx.BOOKS_MD), docx_ref, str(build_docx.TABLE_FILTER)],
+                 outputs=[PANDOC_DOCX], params=tuple(build_docx.PANDOC_OPTIONS + build_docx.TOC_OPTIONS)),
+            Task("front matter", run_front_matter,
+                 inputs=[PANDOC_DOCX, LIST_MD, TERMS_MD, *chapter_paths,
+                         *_code("build_docx", "bookindex", "toc")],
+                 outputs=[str(build_docx.OUTPUT_DOCX)]),
+        ]
+
+    return [
+        Task("merge", merge_all, inputs=[LIST_MD, *chapter_paths, *_code("merge", "toc")],
+             outputs=merged),
+        *renders,
+        Task("index page", lambda: convert.build_index_html(load_toc()),
+             inputs=[LIST_MD, *chapter_paths, *_code("convert", "toc")],
+             outputs=[os.path.join(BASE_DIR, "index.html")], done=save_index),
+        Task("html", run_html, (dist,),
+             inputs=[*html_inputs, *chapter_paths, *fragments, os.path.join(BASE_DIR, "index.html"),
+                     *_code("convert", "bookindex", "search", "fonts", "offline", "dist")],
+             outputs=[*pages, os.path.join(BASE_DIR, "sw.js")], params=(str(dist),),
+             deps=["merge"]),
+        Task("reference doc", run_reference, inputs=_code("build_docx"),
+             outputs=[docx_ref], params=(build_docx.reference_key(),)),
+        *docx_tasks,
+    ]
+
+
+def needed(tasks, targets):
+    """The tasks the target tasks need, in their original order."""
+    deps = dependencies(tasks)
+    keep, todo = set(), list(targets)
+    while todo:
+        name = todo.pop()
+        if name not in keep:
+            keep.add(name)
+            todo.extend(deps[name])
+    return [task for task in tasks if task.name in keep]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("targets", nargs="*", metavar="{html,docx}",
+                        help="what to build (default: both)")
+    parser.add_argument("--force", action="store_true", help="run every task even if its inputs are unchanged")
+    parser.add_argument("-j", "--jobs", type=int, default=0,
+                        help="worker processes for rendering (default: CPU count)")
+    parser.add_argument("--dist", action="store_true", help="also write dist/ (see convert.py --dist)")
+    parser.add_argument("--writer", choices=["pandoc", "native"], default="pandoc",
+                        help="DOCX writer (see build_docx.py --writer)")
+    args = parser.parse_args(argv)
+    unknown = [t for t in args.targets if t not in TARGETS]
+    if unknown:
+        parser.error(f"unknown target: {', '.join(unknown)} (choose from {', '.join(TARGETS)})")
+    names = NATIVE_TARGETS if args.writer == "native" else TARGETS
+    targets = [names[t] for t in (args.targets or TARGETS)]
+    jobs = args.jobs or os.cpu_count() or 1
+
+    start = time.perf_counter()
+    tasks = needed(make_tasks(args.force, args.dist, args.writer), targets)
+    results = run_tasks(tasks, jobs=jobs, force=args.force)
+    elapsed = time.perf_counter() - start
+
+    counts = {status: sum(r.status == status for r in results.values()) for status in ("ran", "skipped", "failed")}
+    print(f"\n{len(tasks)} tasks: {counts['ran']} ran, {counts['skipped']} skipped, "
+          f"{counts['failed']} failed in {elapsed:.2f}s")
+    path = critical_path(tasks, results)
+    steps = [f"{name} {results[name].end - results[name].start:.2f}s"
+             + (" (skipped)" if results[name].status == "skipped" else "") for name in path]
+    print(f"Critical path: {' → '.join(steps)}")
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
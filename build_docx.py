@@ -5,7 +5,11 @@ Spring Boot WebFlux + MongoDB 책 DOCX 빌드 스크립트
 B5(46배판) 부크크 서식으로 books.md → DOCX 변환
 
 사용법:
-    python3 build_docx.py
+    python3 build_docx.py [--force] [--per-chapter | --only CHAPTERS] [-j N]
+                          [--writer {pandoc,native}] [--report [PATH]] [--profile PATH]
+
+books.md는 빌드 시작 시 merge.py로 챕터 파일에서 자동 재병합된다
+(원본이 바뀌지 않았으면 건너뜀).
 
 필수 의존성:
     pip3 install lxml
@@ -16,20 +20,59 @@ B5(46배판) 부크크 서식으로 books.md → DOCX 변환
     2. 테마 폰트를 부크크 폰트로 변경
     3. 스타일 수정 (본문 10pt, 코드 7.5pt, 제목 부크크 고딕)
     4. B5 페이지 크기 및 여백 설정
-    5. pandoc으로 markdown → docx 변환
-    6. 테이블 후처리 (테두리, 컬럼 너비, 고정 레이아웃)
-    7. 앞부분 추가 (속표지, 판권, 목차)
+    5. pandoc으로 markdown → docx 변환 (docx_tables.lua로 표 열 너비 고정)
+    6. 앞부분 추가 (속표지, 판권, 목차), 찾아보기 추가
+
+표 테두리, 셀 여백, 머리글 행 음영은 3단계에서 reference doc의 Table 스타일에
+넣고, 열 너비(합계 PAGE_CONTENT_WIDTH, pandoc에 -M table_width로 전달)와 고정
+레이아웃은 pandoc이 변환하면서 Lua 필터로 정한다. pandoc 뒤에 남은 표 후처리는
+하나뿐이다: pandoc이 비율로 쓴 표 너비(tblW)를 6단계에서 앞부분을 넣을 때
+절대값(dxa)으로 바꾸고, 비율 너비가 남으면 빌드를 실패시킨다.
+
+1~4단계 결과(bookk_ref.docx)는 .build_cache/에 캐시되며, pandoc 버전과
+폰트/페이지/여백 설정이 같으면 다음 빌드에서 그대로 재사용된다.
+--force를 주면 다시 만든다.
+
+--per-chapter를 주면 5단계에서 챕터마다 pandoc을 병렬로 실행하고 결과를
+하나의 문서로 병합한다. 변환된 챕터는 .build_cache/docx_chapters/에 캐시되어
+원고가 바뀐 챕터만 다시 변환한다.
+
+--only ch08 (또는 ch08-ch11, ch01,appendix_a)을 주면 지정한 챕터만
+빌드한다. books.md의 챕터 경계 바이트 오프셋 색인(.build_cache/
+books_index.json, books.md가 바뀔 때만 다시 스캔)으로 해당 구간만 읽어
+pandoc에 넘기고, 같은 reference doc과 앞부분(목차는 선택한 챕터만)을
+적용해 SpringBoot_WebFlux_MongoDB_B5_ch08.docx처럼 따로 저장한다.
+
+--writer native를 주면 5~6단계를 pandoc 없이 한 번에 처리한다. docxwriter.py가
+원고의 Markdown을 직접 파싱해 pandoc과 같은 구조의 document.xml을 쓰고, 표
+서식과 앞부분도 같은 단계에서 넣는다. reference doc이 캐시되어 있으면 pandoc을
+전혀 실행하지 않는다 (--per-chapter와는 함께 쓸 수 없음).
+
+찾아보기: bookindex.py가 index_terms.md의 용어가 나오는 절을 찾고(원고나 용어
+목록이 바뀐 챕터만 다시 스캔), 6단계에서 그 절 제목마다 XE 색인 항목 필드를,
+문서 끝에 찾아보기 제목과 INDEX 필드를 넣는다. 쪽 번호는 Word에서 필드를
+업데이트할 때 채워진다. --only 빌드에는 선택한 챕터의 항목만 들어간다.
 """
 
-import zipfile
-import shutil
+import argparse
+import html
+import io
 import os
+import zipfile
+import zlib
 import re
+import sys
+import struct
 import subprocess
-import tempfile
 from pathlib import Path
 from lxml import etree
 
+from bookindex import load_index
+from buildcache import CACHE_DIR, content_hash, load_json, save_json, source_state
+from buildstats import BuildStats, default_report_path, profiled, timed_call
+from merge import merge_all
+from toc import all_chapters, chapter_heading, load_toc
+
 # ============================================================
 # 설정 (필요에 따라 수정)
 # ============================================================
@@ -41,12 +84,22 @@ PUB_DATE = "2026년 02월"
 # 경로 설정 - 스크립트 위치 기준 상대 경로
 SCRIPT_DIR = Path(__file__).resolve().parent
 BOOKS_MD = SCRIPT_DIR / "books.md"
+PARTS_DIR = SCRIPT_DIR / "parts"
 OUTPUT_DOCX = SCRIPT_DIR / "SpringBoot_WebFlux_MongoDB_B5.docx"
+# 표 열 너비를 정하는 pandoc Lua 필터
+TABLE_FILTER = SCRIPT_DIR / "docx_tables.lua"
 
-# 임시 작업 디렉토리 (빌드 중 사용, 빌드 후 자동 삭제)
-WORK_DIR = SCRIPT_DIR / ".build_tmp"
-REF_UNPACKED = WORK_DIR / "unpacked_ref"
-OUTPUT_REF = WORK_DIR / "bookk_ref.docx"
+# 수정된 reference doc 캐시 (pandoc 버전과 폰트/페이지 설정이 같으면 재사용)
+OUTPUT_REF = Path(CACHE_DIR) / "bookk_ref.docx"
+REF_KEY_PATH = Path(CACHE_DIR) / "bookk_ref.json"
+# Step 2~4의 수정 내용을 바꾸면 올려서 캐시를 무효화
+REFERENCE_VERSION = "2"
+
+# 챕터별 모드(--per-chapter)의 챕터 DOCX 조각 캐시
+CHAPTER_CACHE_DIR = Path(CACHE_DIR) / "docx_chapters"
+CHAPTER_MANIFEST_PATH = Path(CACHE_DIR) / "docx_chapters.json"
+# 챕터 변환 방식을 바꾸면 올려서 조각 캐시를 무효화
+CHAPTER_CACHE_VERSION = "1"
 
 # 폰트 설정
 BODY_FONT = "부크크 명조 Light"
@@ -66,12 +119,23 @@ MARGIN_GUTTER = "284"
 # 콘텐츠 너비: 10660 - 1418 - 1418 - 284 = 7540 DXA
 PAGE_CONTENT_WIDTH = 7540
 
+# 표 서식 (reference doc의 Table 스타일, 네이티브 모드의 표)
+TABLE_BORDER_COLOR = "999999"
+# Header row: thicker, darker bottom border and shading
+TABLE_HEADER_BORDER = ("8", "666666")
+TABLE_HEADER_FILL = "E8E8E8"
+# Cell margins in DXA
+TABLE_CELL_MARGINS = [("top", "40"), ("left", "80"), ("bottom", "40"), ("right", "80")]
+
 # ============================================================
 # XML 네임스페이스
 # ============================================================
 W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
 A_NS = "http://schemas.openxmlformats.org/drawingml/2006/main"
 R_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+WP_NS = "http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing"
+PR_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+CT_NS = "http://schemas.openxmlformats.org/package/2006/content-types"
 
 
 def qn(ns, tag):
@@ -79,41 +143,136 @@ def qn(ns, tag):
     return f"{{{ns}}}{tag}"
 
 
+# ============================================================
+# 메모리 내 DOCX 패키지
+# ============================================================
+class DocxPackage:
+    """A DOCX (zip) archive held in memory.
+
+    The archive is read once; build stages read and replace parts such as
+    word/document.xml as bytes. save() writes the archive once: replaced
+    parts are deflated, every other member's compressed bytes are copied
+    from the source as is.
+    """
+
+    def __init__(self, data):
+        self._raw = bytes(data)
+        with zipfile.ZipFile(io.BytesIO(self._raw)) as zf:
+            self._infos = zf.infolist()
+        self._parts = {}  # name -> new uncompressed bytes
+
+    @classmethod
+    def open(cls, path):
+        return cls(Path(path).read_bytes())
+
+    def __contains__(self, name):
+        return name in self._parts or any(i.filename == name for i in self._infos)
+
+    def read(self, name):
+        """Uncompressed bytes of a part."""
+        if name in self._parts:
+            return self._parts[name]
+        with zipfile.ZipFile(io.BytesIO(self._raw)) as zf:
+            return zf.read(name)
+
+    def size(self, name):
+        """Uncompressed size of a part in bytes."""
+        if name in self._parts:
+            return len(self._parts[name])
+        return next(i.file_size for i in self._infos if i.filename == name)
+
+    def read_xml(self, name):
+        """Parse a part into an lxml element."""
+        return etree.fromstring(self.read(name))
+
+    def write(self, name, data):
+        """Replace (or add) a part."""
+        self._parts[name] = data
+
+    def write_xml(self, name, root):
+        self.write(name, etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True))
+
+    def save(self, path):
+        """Write the archive to path."""
+        members = []  # (name, flag_bits, method, date_time, crc, compressed, size, external_attr)
+        seen = set()
+        for info in self._infos:
+            seen.add(info.filename)
+            if info.filename in self._parts:
+                members.append(_deflate_member(info.filename, self._parts[info.filename],
+                                               info.date_time, info.external_attr))
+            else:
+                members.append((info.filename, info.flag_bits & ~0x08, info.compress_type,
+                                info.date_time, info.CRC, self._raw_member(info),
+                                info.file_size, info.external_attr))
+        for name, data in self._parts.items():
+            if name not in seen:
+                members.append(_deflate_member(name, data, (1980, 1, 1, 0, 0, 0), 0o644 << 16))
+        Path(path).write_bytes(_zip_bytes(members))
+
+    def _raw_member(self, info):
+        """Compressed bytes of an unmodified member, read from the source archive."""
+        offset = info.header_offset
+        name_len, extra_len = struct.unpack("<HH", self._raw[offset + 26:offset + 30])
+        start = offset + 30 + name_len + extra_len
+        return self._raw[start:start + info.compress_size]
+
+
+def _deflate_member(name, data, date_time, external_attr):
+    """Build a deflated zip member tuple for DocxPackage.save."""
+    comp = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    compressed = comp.compress(data) + comp.flush()
+    return (name, 0x800, zipfile.ZIP_DEFLATED, date_time, zlib.crc32(data),
+            compressed, len(data), external_attr)
+
+
+def _zip_bytes(members):
+    """Serialize zip members (see DocxPackage.save) into archive bytes."""
+    out = io.BytesIO()
+    central = []
+    for name, flags, method, date_time, crc, compressed, size, external_attr in members:
+        fname = name.encode("utf-8")
+        dos_time = (date_time[3] << 11) | (date_time[4] << 5) | (date_time[5] // 2)
+        dos_date = ((date_time[0] - 1980) << 9) | (date_time[1] << 5) | date_time[2]
+        offset = out.tell()
+        out.write(struct.pack("<IHHHHHIIIHH", 0x04034B50, 20, flags, method, dos_time, dos_date,
+                              crc, len(compressed), size, len(fname), 0))
+        out.write(fname)
+        out.write(compressed)
+        central.append(struct.pack("<IHHHHHHIIIHHHHHII", 0x02014B50, 20, 20, flags, method,
+                                   dos_time, dos_date, crc, len(compressed), size, len(fname),
+                                   0, 0, 0, 0, external_attr, offset) + fname)
+    cd_offset = out.tell()
+    for entry in central:
+        out.write(entry)
+    out.write(struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, len(central), len(central),
+                          out.tell() - cd_offset, cd_offset, 0))
+    return out.getvalue()
+
+
 # ============================================================
 # Step 1: pandoc 기본 reference.docx 추출
 # ============================================================
 def extract_pandoc_reference():
-    """Extract pandoc's default reference.docx for modification."""
-    if WORK_DIR.exists():
-        shutil.rmtree(str(WORK_DIR))
-    WORK_DIR.mkdir(parents=True)
-    REF_UNPACKED.mkdir()
-
-    # Export pandoc default reference
-    default_ref = WORK_DIR / "default_ref.docx"
+    """Load pandoc's default reference.docx for modification."""
     result = subprocess.run(
         ["pandoc", "--print-default-data-file", "reference.docx"],
         capture_output=True
     )
     if result.returncode != 0:
         raise RuntimeError(f"Failed to extract pandoc reference: {result.stderr.decode()}")
-    default_ref.write_bytes(result.stdout)
-
-    # Unpack
-    with zipfile.ZipFile(str(default_ref), 'r') as zf:
-        zf.extractall(str(REF_UNPACKED))
 
     print("✓ Pandoc default reference extracted")
+    return DocxPackage(result.stdout)
 
 
 # ============================================================
 # Step 2: 테마 폰트 수정
 # ============================================================
-def modify_theme():
+def modify_theme(ref):
     """Change theme fonts to 부크크 fonts."""
-    theme_path = REF_UNPACKED / "word/theme/theme1.xml"
-    tree = etree.parse(str(theme_path))
-    root = tree.getroot()
+    theme_part = "word/theme/theme1.xml"
+    root = ref.read_xml(theme_part)
     nsmap = {"a": A_NS}
 
     # Major font (headings) -> 부크크 고딕 Light
@@ -142,18 +301,17 @@ def modify_theme():
             if font.get("script") == "Hang":
                 font.set("typeface", BODY_FONT)
 
-    tree.write(str(theme_path), xml_declaration=True, encoding="UTF-8", standalone=True)
+    ref.write_xml(theme_part, root)
     print("✓ Theme fonts updated to 부크크")
 
 
 # ============================================================
 # Step 3: 스타일 수정
 # ============================================================
-def modify_styles():
+def modify_styles(ref):
     """Modify styles.xml for B5 book formatting."""
-    styles_path = REF_UNPACKED / "word/styles.xml"
-    tree = etree.parse(str(styles_path))
-    root = tree.getroot()
+    styles_part = "word/styles.xml"
+    root = ref.read_xml(styles_part)
     nsmap = {"w": W_NS}
 
     # 1. Default font size 10pt, Korean language
@@ -243,7 +401,7 @@ def modify_styles():
     # 9. Update BlockText for blockquotes
     _update_blocktext_style(root, nsmap)
 
-    tree.write(str(styles_path), xml_declaration=True, encoding="UTF-8", standalone=True)
+    ref.write_xml(styles_part, root)
     print("✓ Styles updated")
 
 
@@ -311,7 +469,11 @@ def _add_source_code_style(root, nsmap):
 
 
 def _update_table_style(root, nsmap):
-    """Update Table style with borders."""
+    """Table style: borders, cell margins and a shaded header row.
+
+    pandoc's tables use this style; docx_tables.lua supplies fixed,
+    equal-width columns over PAGE_CONTENT_WIDTH.
+    """
     for style in root.findall("w:style", nsmap):
         if style.get(qn(W_NS, "styleId")) == "Table":
             tblPr = style.find("w:tblPr", nsmap)
@@ -327,7 +489,34 @@ def _update_table_style(root, nsmap):
                 bdr.set(qn(W_NS, "val"), "single")
                 bdr.set(qn(W_NS, "sz"), "4")
                 bdr.set(qn(W_NS, "space"), "0")
-                bdr.set(qn(W_NS, "color"), "999999")
+                bdr.set(qn(W_NS, "color"), TABLE_BORDER_COLOR)
+
+            tblCellMar = tblPr.find("w:tblCellMar", nsmap)
+            if tblCellMar is not None:
+                tblPr.remove(tblCellMar)
+            tblCellMar = etree.SubElement(tblPr, qn(W_NS, "tblCellMar"))
+            for side, val in TABLE_CELL_MARGINS:
+                mar = etree.SubElement(tblCellMar, qn(W_NS, side))
+                mar.set(qn(W_NS, "w"), val)
+                mar.set(qn(W_NS, "type"), "dxa")
+
+            # Header row (pandoc sets tblLook firstRow): replaces pandoc's
+            # bottom-aligned header with a darker bottom border and shading
+            for old in style.findall("w:tblStylePr[@w:type='firstRow']", nsmap):
+                style.remove(old)
+            first_row = etree.SubElement(style, qn(W_NS, "tblStylePr"))
+            first_row.set(qn(W_NS, "type"), "firstRow")
+            tcPr = etree.SubElement(first_row, qn(W_NS, "tcPr"))
+            bottom = etree.SubElement(etree.SubElement(tcPr, qn(W_NS, "tcBorders")), qn(W_NS, "bottom"))
+            bottom.set(qn(W_NS, "val"), "single")
+            bottom.set(qn(W_NS, "sz"), TABLE_HEADER_BORDER[0])
+            bottom.set(qn(W_NS, "space"), "0")
+            bottom.set(qn(W_NS, "color"), TABLE_HEADER_BORDER[1])
+            shd = etree.SubElement(tcPr, qn(W_NS, "shd"))
+            shd.set(qn(W_NS, "val"), "clear")
+            shd.set(qn(W_NS, "color"), "auto")
+            shd.set(qn(W_NS, "fill"), TABLE_HEADER_FILL)
+
             semi = style.find("w:semiHidden", nsmap)
             if semi is not None:
                 style.remove(semi)
@@ -361,11 +550,11 @@ def _update_blocktext_style(root, nsmap):
 # ============================================================
 # Step 4: B5 페이지 크기 및 여백 설정
 # ============================================================
-def modify_document_settings():
+def modify_document_settings(ref):
     """Set B5 page size and margins in document.xml."""
-    doc_path = REF_UNPACKED / "word/document.xml"
+    doc_part = "word/document.xml"
 
-    if not doc_path.exists():
+    if doc_part not in ref:
         doc_content = f'''<?xml version="1.0" encoding="UTF-8"?>
 <w:document xmlns:w="{W_NS}" xmlns:r="{R_NS}">
   <w:body>
@@ -376,10 +565,9 @@ def modify_document_settings():
     </w:sectPr>
   </w:body>
 </w:document>'''
-        doc_path.write_text(doc_content, encoding="utf-8")
+        ref.write(doc_part, doc_content.encode("utf-8"))
     else:
-        tree = etree.parse(str(doc_path))
-        root = tree.getroot()
+        root = ref.read_xml(doc_part)
         nsmap = {"w": W_NS}
         body = root.find("w:body", nsmap)
         if body is not None:
@@ -402,189 +590,531 @@ def modify_document_settings():
             if cols is None:
                 cols = etree.SubElement(sectPr, qn(W_NS, "cols"))
             cols.set(qn(W_NS, "space"), "720")
-        tree.write(str(doc_path), xml_declaration=True, encoding="UTF-8", standalone=True)
+        ref.write_xml(doc_part, root)
     print(f"✓ Page: B5 ({PAGE_W}x{PAGE_H} DXA)")
 
 
 # ============================================================
-# Step 5: Reference doc 패킹 및 pandoc 실행
+# Step 5: Reference doc 패킹(캐시) 및 pandoc 실행
 # ============================================================
-def repack_docx():
-    """Pack modified reference directory into DOCX."""
-    if OUTPUT_REF.exists():
-        OUTPUT_REF.unlink()
-    with zipfile.ZipFile(str(OUTPUT_REF), 'w', zipfile.ZIP_DEFLATED) as zf:
-        for root_dir, dirs, files in os.walk(str(REF_UNPACKED)):
-            for file in files:
-                file_path = Path(root_dir) / file
-                arcname = file_path.relative_to(REF_UNPACKED)
-                zf.write(str(file_path), str(arcname))
+def repack_docx(ref, key):
+    """Write the modified reference doc for pandoc and record its cache key."""
+    OUTPUT_REF.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = OUTPUT_REF.with_suffix(".docx.tmp")
+    ref.save(tmp_path)
+    tmp_path.replace(OUTPUT_REF)
+    save_json(str(REF_KEY_PATH), {"key": key, "pandoc": pandoc_version()})
     print(f"✓ Reference doc: {OUTPUT_REF.stat().st_size / 1024:.1f} KB")
 
 
-def run_pandoc():
-    """Convert books.md to DOCX using modified reference."""
+def pandoc_version():
+    """First line of `pandoc --version`."""
+    result = subprocess.run(["pandoc", "--version"], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Failed to run pandoc: {result.stderr}")
+    return result.stdout.splitlines()[0]
+
+
+def reference_key(version=None):
+    """Cache key of the reference doc: pandoc version plus every setting steps 1-4 use.
+
+    version defaults to the installed pandoc's; the native writer passes
+    the one recorded with the cached reference doc, so it does not start
+    pandoc at all while the cache is valid.
+    """
+    if version is None:
+        version = pandoc_version()
+    return content_hash(REFERENCE_VERSION, version, BODY_FONT, HEAD_FONT,
+                        PAGE_W, PAGE_H, MARGIN_TOP, MARGIN_RIGHT, MARGIN_BOTTOM,
+                        MARGIN_LEFT, MARGIN_HEADER, MARGIN_FOOTER, MARGIN_GUTTER)
+
+
+def build_reference(key):
+    """Steps 1-4: write the modified reference doc to OUTPUT_REF."""
+    print("\n[1/6] Extracting pandoc reference...")
+    ref = extract_pandoc_reference()
+
+    print("\n[2/6] Modifying theme fonts...")
+    modify_theme(ref)
+
+    print("\n[3/6] Modifying styles...")
+    modify_styles(ref)
+
+    print("\n[4/6] Setting page size...")
+    modify_document_settings(ref)
+    repack_docx(ref, key)
+
+
+def reference_is_cached(key):
+    """True if the cached reference doc was built with the same key."""
+    return OUTPUT_REF.exists() and load_json(str(REF_KEY_PATH)).get("key") == key
+
+
+PANDOC_OPTIONS = [
+    "--highlight-style=tango", "--wrap=none",
+    "-f", "markdown+smart+pipe_tables+fenced_code_blocks+backtick_code_blocks+header_attributes",
+    f"--lua-filter={TABLE_FILTER}", "-M", f"table_width={PAGE_CONTENT_WIDTH}",
+]
+TOC_DEPTH = 3
+TOC_OPTIONS = ["--toc", f"--toc-depth={TOC_DEPTH}"]
+
+
+def run_pandoc(output=OUTPUT_DOCX, md_bytes=None):
+    """Convert books.md (or md_bytes, a slice of it) to DOCX using modified reference."""
     cmd = [
-        "pandoc", str(BOOKS_MD),
-        "-o", str(OUTPUT_DOCX),
+        "pandoc", *([] if md_bytes is not None else [str(BOOKS_MD)]),
+        "-o", str(output),
         f"--reference-doc={OUTPUT_REF}",
-        "--highlight-style=tango",
-        "--toc", "--toc-depth=3", "--wrap=none",
-        "-f", "markdown+smart+pipe_tables+fenced_code_blocks+backtick_code_blocks+header_attributes",
+        *TOC_OPTIONS, *PANDOC_OPTIONS,
     ]
-    print(f"\n  pandoc: {BOOKS_MD.name} → {OUTPUT_DOCX.name}")
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    source = BOOKS_MD.name if md_bytes is None else f"{BOOKS_MD.name} ({len(md_bytes) / 1024:.0f} KB slice)"
+    print(f"\n  pandoc: {source} → {output.name}")
+    result = subprocess.run(cmd, input=md_bytes, capture_output=True)
+    stderr = result.stderr.decode(errors="replace")
     if result.returncode != 0:
-        print(f"✗ Pandoc error:\n{result.stderr}")
+        print(f"✗ Pandoc error:\n{stderr}")
         return False
-    if result.stderr:
-        print(f"  Warnings: {result.stderr[:300]}")
-    print(f"✓ DOCX generated: {OUTPUT_DOCX.stat().st_size / 1024:.0f} KB")
+    if stderr:
+        print(f"  Warnings: {stderr[:300]}")
+    print(f"✓ DOCX generated: {output.stat().st_size / 1024:.0f} KB")
     return True
 
 
 # ============================================================
-# Step 6: 테이블 후처리
+# Step 5 (부분 빌드, --only): books.md 챕터 색인
 # ============================================================
-def postprocess_tables():
-    """Fix table widths, column grids, and add explicit cell borders."""
-    BORDER_COLOR = "999999"
-    tmp_dir = Path(tempfile.mkdtemp())
+BOOKS_INDEX_PATH = Path(CACHE_DIR) / "books_index.json"
+
+# Bump when the scan below changes
+BOOKS_INDEX_VERSION = "2"
+
+FENCE_RE = re.compile(rb"^(`{3,}|~{3,})")
+
+
+def scan_chapter_offsets(expected):
+    """Byte offsets of the chapter headings in books.md, in one pass.
+
+    expected is [(file_id, heading line without the newline)] in book
+    order; a heading matches a whole line. Headings inside fenced code
+    blocks are ignored (shell comments look like headings). Returns
+    [(file_id, start, end)], or None if a heading was not found.
+    """
+    starts = []
+    offset = 0
+    fence = None
+    with open(BOOKS_MD, "rb") as f:
+        for line in f:
+            m = FENCE_RE.match(line)
+            if m:
+                if fence is None:
+                    fence = m.group(1)
+                elif line.startswith(fence) and not line[len(fence):].strip():
+                    fence = None
+            elif fence is None and len(starts) < len(expected):
+                if line.rstrip(b"\r\n") == expected[len(starts)][1]:
+                    starts.append(offset)
+            offset += len(line)
+    if len(starts) < len(expected):
+        print(f"✗ Heading not found in {BOOKS_MD.name}: {expected[len(starts)][1].decode()}")
+        return None
+    ends = starts[1:] + [offset]
+    return [(file_id, start, end) for (file_id, _), start, end in zip(expected, starts, ends)]
+
+
+def chapter_index():
+    """{file_id: (start, end)} byte ranges of every chapter in books.md.
+
+    Cached in .build_cache/books_index.json and rescanned only when
+    books.md or the chapter headings change. Returns None if the scan fails.
+    """
+    expected = [(c.file_id, f"# {chapter_heading(c)}".encode("utf-8"))
+                for c in all_chapters(load_toc())]
+    cached = load_json(str(BOOKS_INDEX_PATH))
+    source = source_state(str(BOOKS_MD), cached.get("source"))
+    key = content_hash(BOOKS_INDEX_VERSION, source[2], *(heading for _, heading in expected))
+    if cached.get("key") != key:
+        chapters = scan_chapter_offsets(expected)
+        if chapters is None:
+            return None
+        cached = {"source": source, "key": key, "chapters": chapters}
+        save_json(str(BOOKS_INDEX_PATH), cached)
+        print(f"  Indexed {len(chapters)} chapters in {BOOKS_MD.name}")
+    return {file_id: (start, end) for file_id, start, end in cached["chapters"]}
+
+
+def select_chapters(spec, file_ids):
+    """file_ids (in book order) selected by spec, e.g. "ch08", "ch08-ch11" or "ch01,appendix_a".
+
+    Raises ValueError for unknown ids or a reversed range.
+    """
+    selected = []
+    for item in spec.split(","):
+        first, _, last = item.strip().partition("-")
+        last = last or first
+        for file_id in (first, last):
+            if file_id not in file_ids:
+                raise ValueError(f"unknown chapter: {file_id} (expected e.g. {file_ids[0]})")
+        start, end = file_ids.index(first), file_ids.index(last)
+        if start > end:
+            raise ValueError(f"empty range: {item}")
+        selected += [file_id for file_id in file_ids[start:end + 1] if file_id not in selected]
+    return [file_id for file_id in file_ids if file_id in selected]
+
+
+def read_chapters(index, file_ids):
+    """The markdown of the given chapters, read from books.md by byte range."""
+    parts = []
+    with open(BOOKS_MD, "rb") as f:
+        for file_id in file_ids:
+            start, end = index[file_id]
+            f.seek(start)
+            part = f.read(end - start)
+            parts.append(part if part.endswith(b"\n") else part + b"\n")
+    return b"\n".join(parts)
+
+
+def partial_output(spec):
+    """Output path of a partial build, e.g. SpringBoot_..._B5_ch08-ch11.docx."""
+    label = re.sub(r"[^\w-]+", "_", spec)
+    return OUTPUT_DOCX.with_name(f"{OUTPUT_DOCX.stem}_{label}{OUTPUT_DOCX.suffix}")
 
-    with zipfile.ZipFile(str(OUTPUT_DOCX), 'r') as zf:
-        zf.extractall(str(tmp_dir))
 
-    doc_path = tmp_dir / "word" / "document.xml"
-    tree = etree.parse(str(doc_path))
-    root = tree.getroot()
-    nsmap = {"w": W_NS}
+# ============================================================
+# Step 5 (챕터별 모드): 챕터별 pandoc 변환 및 병합
+# ============================================================
+DOC_RELS = "word/_rels/document.xml.rels"
+FOOTNOTE_RELS = "word/_rels/footnotes.xml.rels"
 
-    def make_border(parent, side, color=BORDER_COLOR, sz="4"):
-        bdr = etree.SubElement(parent, qn(W_NS, side))
-        bdr.set(qn(W_NS, "val"), "single")
-        bdr.set(qn(W_NS, "sz"), sz)
-        bdr.set(qn(W_NS, "space"), "0")
-        bdr.set(qn(W_NS, "color"), color)
-        return bdr
-
-    tables = root.findall(".//w:tbl", nsmap)
-    fixed = 0
-
-    for tbl in tables:
-        tblPr = tbl.find("w:tblPr", nsmap)
-        if tblPr is None:
-            continue
-
-        # Table width (absolute DXA)
-        tblW = tblPr.find("w:tblW", nsmap)
-        if tblW is None:
-            tblW = etree.SubElement(tblPr, qn(W_NS, "tblW"))
-        tblW.set(qn(W_NS, "w"), str(PAGE_CONTENT_WIDTH))
-        tblW.set(qn(W_NS, "type"), "dxa")
-
-        # Fixed layout
-        tblLayout = tblPr.find("w:tblLayout", nsmap)
-        if tblLayout is None:
-            tblLayout = etree.SubElement(tblPr, qn(W_NS, "tblLayout"))
-        tblLayout.set(qn(W_NS, "type"), "fixed")
-
-        # Table borders
-        tblBorders = tblPr.find("w:tblBorders", nsmap)
-        if tblBorders is not None:
-            tblPr.remove(tblBorders)
-        tblBorders = etree.SubElement(tblPr, qn(W_NS, "tblBorders"))
-        for side in ["top", "left", "bottom", "right", "insideH", "insideV"]:
-            make_border(tblBorders, side)
-
-        # Cell margins
-        tblCellMar = tblPr.find("w:tblCellMar", nsmap)
-        if tblCellMar is not None:
-            tblPr.remove(tblCellMar)
-        tblCellMar = etree.SubElement(tblPr, qn(W_NS, "tblCellMar"))
-        for sn, val in [("top", "40"), ("left", "80"), ("bottom", "40"), ("right", "80")]:
-            m = etree.SubElement(tblCellMar, qn(W_NS, sn))
-            m.set(qn(W_NS, "w"), val)
-            m.set(qn(W_NS, "type"), "dxa")
-
-        # Remove tblLook
-        tblLook = tblPr.find("w:tblLook", nsmap)
-        if tblLook is not None:
-            tblPr.remove(tblLook)
-
-        # Column grid
-        first_tr = tbl.find("w:tr", nsmap)
-        if first_tr is None:
-            continue
-        num_cols = len(first_tr.findall("w:tc", nsmap))
-        if num_cols == 0:
-            continue
-        col_width = PAGE_CONTENT_WIDTH // num_cols
-
-        tblGrid = tbl.find("w:tblGrid", nsmap)
-        if tblGrid is not None:
-            tbl.remove(tblGrid)
-        new_grid = etree.Element(qn(W_NS, "tblGrid"))
-        for _ in range(num_cols):
-            etree.SubElement(new_grid, qn(W_NS, "gridCol")).set(qn(W_NS, "w"), str(col_width))
-        tbl.insert(list(tbl).index(tblPr) + 1, new_grid)
-
-        # Fix each cell
-        for row_idx, tr in enumerate(tbl.findall("w:tr", nsmap)):
-            trPr = tr.find("w:trPr", nsmap)
-            if trPr is not None:
-                cnf = trPr.find("w:cnfStyle", nsmap)
-                if cnf is not None:
-                    trPr.remove(cnf)
-
-            for tc in tr.findall("w:tc", nsmap):
-                tcPr = tc.find("w:tcPr", nsmap)
-                if tcPr is None:
-                    tcPr = etree.SubElement(tc, qn(W_NS, "tcPr"))
-                    tc.remove(tcPr)
-                    tc.insert(0, tcPr)
-
-                tcW = tcPr.find("w:tcW", nsmap)
-                if tcW is None:
-                    tcW = etree.SubElement(tcPr, qn(W_NS, "tcW"))
-                tcW.set(qn(W_NS, "w"), str(col_width))
-                tcW.set(qn(W_NS, "type"), "dxa")
-
-                tcBorders = tcPr.find("w:tcBorders", nsmap)
-                if tcBorders is not None:
-                    tcPr.remove(tcBorders)
-                tcBorders = etree.SubElement(tcPr, qn(W_NS, "tcBorders"))
-                for side in ["top", "left", "bottom", "right"]:
-                    make_border(tcBorders, side)
-
-                if row_idx == 0:
-                    bottom = tcBorders.find("w:bottom", nsmap)
-                    if bottom is not None:
-                        bottom.set(qn(W_NS, "sz"), "8")
-                        bottom.set(qn(W_NS, "color"), "666666")
-                    shd = tcPr.find("w:shd", nsmap)
-                    if shd is None:
-                        shd = etree.SubElement(tcPr, qn(W_NS, "shd"))
-                    shd.set(qn(W_NS, "val"), "clear")
-                    shd.set(qn(W_NS, "color"), "auto")
-                    shd.set(qn(W_NS, "fill"), "E8E8E8")
-
-                vAlign = tcPr.find("w:vAlign", nsmap)
-                if vAlign is not None:
-                    tcPr.remove(vAlign)
-
-        fixed += 1
-
-    tree.write(str(doc_path), xml_declaration=True, encoding="UTF-8", standalone=True)
-    _repack_output(tmp_dir)
-    shutil.rmtree(str(tmp_dir))
-    print(f"✓ Fixed {fixed} tables")
+
+def chapter_sources():
+    """[(file_id, markdown path)] for every chapter and appendix, in book order."""
+    return [(c.file_id, PARTS_DIR / f"{c.file_id}.md") for c in all_chapters(load_toc())]
+
+
+def convert_chapter(md_path, with_toc):
+    """Run pandoc on one chapter file and return (docx bytes, warnings).
+
+    Only the first chapter gets --toc, so the TOC field stays at the front
+    of the merged document.
+    """
+    cmd = ["pandoc", str(md_path), "-t", "docx", f"--reference-doc={OUTPUT_REF}", *PANDOC_OPTIONS]
+    if with_toc:
+        cmd += TOC_OPTIONS
+    result = subprocess.run(cmd, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{md_path.name}: {result.stderr.decode(errors='replace')}")
+    return result.stdout, result.stderr.decode(errors="replace")
+
+
+def run_pandoc_chapters(ref_key, jobs=0, force=False, stats=None):
+    """Convert each chapter with pandoc in a worker pool.
+
+    Converted chapters are cached in .build_cache/docx_chapters/ and reused
+    while the chapter text, its position (first or not) and the reference
+    doc are unchanged. Each pandoc run is recorded in stats (wall time and
+    bytes; pandoc's CPU time shows up in the stage's child CPU). Returns the
+    fragments (DocxPackage) in book order, or None if pandoc failed.
+    """
+    chapters = chapter_sources()
+    missing = [md_path.name for _, md_path in chapters if not md_path.exists()]
+    if missing:
+        print(f"✗ Chapter files not found: {', '.join(missing)}")
+        return None
+
+    manifest = {} if force else load_json(str(CHAPTER_MANIFEST_PATH))
+    filter_key = content_hash(TABLE_FILTER.read_bytes())
+    entries = {}
+    fragments = {}
+    stale = []
+    for index, (file_id, md_path) in enumerate(chapters):
+        previous = manifest.get(file_id, {})
+        source = source_state(str(md_path), previous.get("source"))
+        key = content_hash(CHAPTER_CACHE_VERSION, source[2], ref_key, str(index == 0),
+                           *PANDOC_OPTIONS, *TOC_OPTIONS, filter_key)
+        entries[file_id] = {"source": source, "key": key}
+        cache_path = CHAPTER_CACHE_DIR / f"{file_id}.docx"
+        if previous.get("key") == key and cache_path.exists():
+            fragments[file_id] = DocxPackage.open(cache_path)
+        else:
+            stale.append((file_id, md_path, index == 0))
+
+    jobs = jobs or os.cpu_count() or 1
+    print(f"  {len(chapters)} chapters: {len(chapters) - len(stale)} cached, "
+          f"{len(stale)} to convert ({jobs} jobs)")
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    CHAPTER_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    failed = False
+    seen_warnings = set()
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = [(file_id, md_path, pool.submit(timed_call, convert_chapter, md_path, with_toc))
+                   for file_id, md_path, with_toc in stale]
+        for file_id, md_path, future in futures:
+            try:
+                (data, warnings), wall_s, _ = future.result()
+            except RuntimeError as e:
+                print(f"✗ Pandoc error:\n{e}")
+                del entries[file_id]
+                failed = True
+                continue
+            if warnings and warnings not in seen_warnings:
+                seen_warnings.add(warnings)
+                print(f"  Warnings ({file_id}): {warnings[:300]}")
+            cache_path = CHAPTER_CACHE_DIR / f"{file_id}.docx"
+            tmp_path = cache_path.with_suffix(".docx.tmp")
+            tmp_path.write_bytes(data)
+            tmp_path.replace(cache_path)
+            fragments[file_id] = DocxPackage(data)
+            if stats is not None:
+                stats.add_file(file_id, wall_s, None, bytes_read=md_path.stat().st_size,
+                               bytes_written=len(data))
+            print(f"  ✓ {file_id}")
+
+    # Keep entries of unchanged chapters that were not listed this time
+    save_json(str(CHAPTER_MANIFEST_PATH), {**manifest, **entries})
+    if failed:
+        return None
+    return [fragments[file_id] for file_id, _ in chapters]
+
+
+def merge_chapter_docx(fragments, names):
+    """Merge per-chapter DOCX fragments into one DocxPackage.
+
+    The first fragment supplies the package (theme, settings, TOC field and
+    the final section properties) and every fragment's w:body content is
+    appended in order. The merged document.xml is assembled from bytes,
+    so only one chapter tree is held at a time.
+    """
+    merger = _ChapterMerger(fragments[0])
+    doc_xml = fragments[0].read("word/document.xml")
+    head = doc_xml[:doc_xml.index(b"<w:body>") + len(b"<w:body>")]
+    tail = doc_xml[doc_xml.rindex(b"<w:sectPr"):]
+    bodies = [merger.add(fragment, name) for fragment, name in zip(fragments, names)]
+    merger.finish()
+    merger.pkg.write("word/document.xml", head + b"".join(bodies) + tail)
+    print(f"✓ Merged {len(fragments)} chapters")
+    return merger.pkg
+
+
+class _ChapterMerger:
+    """Collects numbering, styles, relationships and footnotes of fragments.
+
+    pandoc numbers these per run, so every fragment's ids are renumbered to
+    stay unique across the book: list definitions (abstractNum/num),
+    relationship ids (hyperlinks, images), media file names, footnotes,
+    bookmarks (names get a "-N" suffix like pandoc's own de-duplication)
+    and drawing ids.
+    """
+
+    def __init__(self, pkg):
+        self.pkg = pkg
+        self.rels = pkg.read_xml(DOC_RELS)
+        self.rel_ids = {}  # (type, target, mode) -> id
+        for rel in self.rels:
+            self.rel_ids[(rel.get("Type"), rel.get("Target"), rel.get("TargetMode"))] = rel.get("Id")
+        self.next_rel = 1 + max((int(i[3:]) for i in self.rel_ids.values() if i[3:].isdigit()),
+                                default=0)
+        self.content_types = pkg.read_xml("[Content_Types].xml")
+
+        self.styles = pkg.read_xml("word/styles.xml")
+        self.style_ids = {s.get(qn(W_NS, "styleId")) for s in self.styles.iter(qn(W_NS, "style"))}
+
+        self.numbering = pkg.read_xml("word/numbering.xml")
+        for el in self.numbering.findall("w:abstractNum", {"w": W_NS}) + \
+                self.numbering.findall("w:num", {"w": W_NS}):
+            self.numbering.remove(el)
+        self.abstract_nums, self.nums = [], []
+
+        self.footnotes = pkg.read_xml("word/footnotes.xml")
+        for note in list(self.footnotes):
+            if int(note.get(qn(W_NS, "id"))) > 0:
+                self.footnotes.remove(note)
+        self.footnote_rels = etree.Element(qn(PR_NS, "Relationships"), nsmap={None: PR_NS})
+        self.footnote_rel_ids = {}  # (type, target, mode) -> id in footnotes.xml.rels
+
+        self.bookmark_names = set()
+        self.next_bookmark = 0
+        self.next_docpr = 1
+        self.next_footnote = 1
+
+    def add(self, fragment, name):
+        """Renumber one fragment and return its serialized body content."""
+        root = fragment.read_xml("word/document.xml")
+        body = root.find(qn(W_NS, "body"))
+        if len(body) and body[-1].tag == qn(W_NS, "sectPr"):
+            body.remove(body[-1])
+
+        rel_map = self._add_rels(fragment, name)
+        num_map = self._add_numbering(fragment)
+        self._add_styles(fragment)
+        footnote_map = self._add_footnotes(fragment, name)
+        bookmark_ids, bookmark_names = self._bookmark_maps(body)
+
+        w_val, w_id = qn(W_NS, "val"), qn(W_NS, "id")
+        for el in body.iter():
+            tag = el.tag
+            if tag == qn(W_NS, "numId"):
+                el.set(w_val, num_map.get(el.get(w_val), el.get(w_val)))
+            elif tag in (qn(W_NS, "bookmarkStart"), qn(W_NS, "bookmarkEnd")):
+                el.set(w_id, bookmark_ids.get(el.get(w_id), el.get(w_id)))
+                if tag == qn(W_NS, "bookmarkStart"):
+                    el.set(qn(W_NS, "name"), bookmark_names[el.get(qn(W_NS, "name"))])
+            elif tag == qn(W_NS, "hyperlink") and el.get(qn(W_NS, "anchor")) in bookmark_names:
+                el.set(qn(W_NS, "anchor"), bookmark_names[el.get(qn(W_NS, "anchor"))])
+            elif tag == qn(W_NS, "footnoteReference"):
+                el.set(w_id, footnote_map.get(el.get(w_id), el.get(w_id)))
+            elif tag == qn(WP_NS, "docPr"):
+                el.set("id", str(self.next_docpr))
+                self.next_docpr += 1
+            _remap_rel_attrs(el, rel_map)
+
+        if not len(body):
+            return b""
+        out = etree.tostring(body, encoding="UTF-8")
+        return out[out.index(b">") + 1:out.rindex(b"</")]
+
+    def finish(self):
+        """Write the merged shared parts back into the package."""
+        self.numbering.extend(self.abstract_nums + self.nums)
+        self.pkg.write_xml("word/numbering.xml", self.numbering)
+        self.pkg.write_xml("word/styles.xml", self.styles)
+        self.pkg.write_xml("word/footnotes.xml", self.footnotes)
+        self.pkg.write_xml(FOOTNOTE_RELS, self.footnote_rels)
+        self.pkg.write_xml(DOC_RELS, self.rels)
+        self.pkg.write_xml("[Content_Types].xml", self.content_types)
+
+    def _add_rels(self, fragment, name):
+        """Add the fragment's relationships and media; returns {old id: new id}."""
+        rel_map = {}
+        for rel in fragment.read_xml(DOC_RELS):
+            target, mode = rel.get("Target"), rel.get("TargetMode")
+            if mode != "External" and target.startswith("media/"):
+                target = self._add_media(fragment, target, name)
+            key = (rel.get("Type"), target, mode)
+            if key not in self.rel_ids:
+                new = etree.SubElement(self.rels, qn(PR_NS, "Relationship"), dict(rel.attrib))
+                new.set("Id", f"rId{self.next_rel}")
+                new.set("Target", target)
+                self.next_rel += 1
+                self.rel_ids[key] = new.get("Id")
+            rel_map[rel.get("Id")] = self.rel_ids[key]
+        return rel_map
+
+    def _add_media(self, fragment, target, name):
+        """Copy a media part, renaming it if the name is taken; returns the new target."""
+        data = fragment.read(f"word/{target}")
+        new_target = target
+        if f"word/{target}" in self.pkg and self.pkg.read(f"word/{target}") != data:
+            new_target = f"media/{name}_{target[len('media/'):]}"
+        if f"word/{new_target}" not in self.pkg:
+            self.pkg.write(f"word/{new_target}", data)
+            for override in fragment.read_xml("[Content_Types].xml"):
+                if override.get("PartName") == f"/word/{target}":
+                    etree.SubElement(self.content_types, qn(CT_NS, "Override"), {
+                        "PartName": f"/word/{new_target}",
+                        "ContentType": override.get("ContentType"),
+                    })
+        return new_target
+
+    def _add_numbering(self, fragment):
+        """Renumber and collect list definitions; returns {old numId: new numId}."""
+        if "word/numbering.xml" not in fragment:
+            return {}
+        nsmap = {"w": W_NS}
+        root = fragment.read_xml("word/numbering.xml")
+        abstract_map = {}
+        for abstract in root.findall("w:abstractNum", nsmap):
+            new_id = len(self.abstract_nums) + 1
+            abstract_map[abstract.get(qn(W_NS, "abstractNumId"))] = str(new_id)
+            abstract.set(qn(W_NS, "abstractNumId"), str(new_id))
+            nsid = abstract.find("w:nsid", nsmap)
+            if nsid is not None:
+                nsid.set(qn(W_NS, "val"), f"{new_id:08X}")
+            self.abstract_nums.append(abstract)
+        num_map = {}
+        for num in root.findall("w:num", nsmap):
+            new_id = str(len(self.nums) + 1)
+            num_map[num.get(qn(W_NS, "numId"))] = new_id
+            num.set(qn(W_NS, "numId"), new_id)
+            ref = num.find("w:abstractNumId", nsmap)
+            ref.set(qn(W_NS, "val"), abstract_map[ref.get(qn(W_NS, "val"))])
+            self.nums.append(num)
+        return num_map
+
+    def _add_styles(self, fragment):
+        """Add styles the merged document does not define yet."""
+        for style in fragment.read_xml("word/styles.xml").findall(qn(W_NS, "style")):
+            style_id = style.get(qn(W_NS, "styleId"))
+            if style_id not in self.style_ids:
+                self.style_ids.add(style_id)
+                self.styles.append(style)
+
+    def _add_footnotes(self, fragment, name):
+        """Renumber and collect footnotes; returns {old id: new id}."""
+        footnote_map = {}
+        if "word/footnotes.xml" not in fragment:
+            return footnote_map
+        notes = [note for note in fragment.read_xml("word/footnotes.xml")
+                 if int(note.get(qn(W_NS, "id"))) > 0]  # not the separators
+        # Footnotes refer to ids of their own rels part, not document.xml's
+        rel_map = self._add_footnote_rels(fragment, name) if notes and FOOTNOTE_RELS in fragment else {}
+        for note in notes:
+            footnote_map[note.get(qn(W_NS, "id"))] = str(self.next_footnote)
+            note.set(qn(W_NS, "id"), str(self.next_footnote))
+            self.next_footnote += 1
+            for el in note.iter():
+                _remap_rel_attrs(el, rel_map)
+            self.footnotes.append(note)
+        return footnote_map
+
+    def _add_footnote_rels(self, fragment, name):
+        """Add the relationships of the fragment's footnotes; returns {old id: new id}."""
+        rel_map = {}
+        for rel in fragment.read_xml(FOOTNOTE_RELS):
+            target, mode = rel.get("Target"), rel.get("TargetMode")
+            if mode != "External" and target.startswith("media/"):
+                target = self._add_media(fragment, target, name)
+            key = (rel.get("Type"), target, mode)
+            if key not in self.footnote_rel_ids:
+                new = etree.SubElement(self.footnote_rels, qn(PR_NS, "Relationship"), dict(rel.attrib))
+                new.set("Id", f"rId{len(self.footnote_rel_ids) + 1}")
+                new.set("Target", target)
+                self.footnote_rel_ids[key] = new.get("Id")
+            rel_map[rel.get("Id")] = self.footnote_rel_ids[key]
+        return rel_map
+
+    def _bookmark_maps(self, body):
+        """Return ({old id: new id}, {old name: new name}) for the fragment's bookmarks."""
+        ids, names = {}, {}
+        for start in body.iter(qn(W_NS, "bookmarkStart")):
+            ids[start.get(qn(W_NS, "id"))] = str(self.next_bookmark)
+            self.next_bookmark += 1
+            name = new_name = start.get(qn(W_NS, "name"))
+            n = 0
+            while new_name in self.bookmark_names:
+                n += 1
+                new_name = f"{name}-{n}"
+            self.bookmark_names.add(new_name)
+            names[name] = new_name
+        return ids, names
+
+
+def _remap_rel_attrs(el, rel_map):
+    """Point r:id / r:embed / r:link attributes at the merged relationship ids."""
+    for attr, value in el.attrib.items():
+        if attr.startswith(f"{{{R_NS}}}") and value in rel_map:
+            el.set(attr, rel_map[value])
 
 
 # ============================================================
-# Step 7: 앞부분 추가 (속표지, 판권, 목차)
+# Step 6: 앞부분 추가 (속표지, 판권, 목차)
 # ============================================================
-def add_front_matter():
-    """Add title page, copyright page, and TOC."""
+def front_matter_xml(file_ids=None):
+    """Title page, copyright page, and TOC (of file_ids only, if given).
+
+    Returns (XML for the start of <w:body>, number of TOC items).
+    """
 
     def p(text, font=BODY_FONT, sz="20", bold=False, center=False,
           spacing_before="0", spacing_after="0"):
@@ -642,7 +1172,7 @@ def add_front_matter():
     parts.append(page_break())
 
     # --- TOC ---
-    toc_items = _get_toc_items()
+    toc_items = _get_toc_items(file_ids)
     parts.append(p("목  차", font=HEAD_FONT, sz="28", bold=True, center=True, spacing_after="300"))
     parts.append(empty_p(1))
     for level, title in toc_items:
@@ -656,174 +1186,370 @@ def add_front_matter():
                 f'w:hAnsi="{BODY_FONT}"/><w:sz w:val="18"/></w:rPr>'
                 f'<w:t xml:space="preserve">{title}</w:t></w:r></w:p>')
     parts.append(page_break())
+    return '\n'.join(parts), len(toc_items)
+
+
+# pandoc writes the width of docx_tables.lua's tables as a percentage of its
+# own text width; their column grid already adds up to PAGE_CONTENT_WIDTH.
+PANDOC_TBL_W_RE = re.compile(r'<w:tblW [^>]*w:type="pct"[^>]*/>')
+TBL_W_PCT_RE = re.compile(r"<w:tblW\b[^>]*\bw:type=[\"']pct[\"']")
+
+
+def fix_table_widths(content):
+    """The one table fix-up left after pandoc: absolute tblW for every table.
+
+    docx_tables.lua can only give pandoc relative column widths, so pandoc
+    writes tblW as a percentage; this sets PAGE_CONTENT_WIDTH in dxa, the
+    sum of the column grid. Raises RuntimeError if a percentage width is
+    left, so a change in pandoc's output fails the build instead of
+    leaving tables at the wrong width.
+    """
+    content = PANDOC_TBL_W_RE.sub(f'<w:tblW w:w="{PAGE_CONTENT_WIDTH}" w:type="dxa"/>', content)
+    left = len(TBL_W_PCT_RE.findall(content))
+    if left:
+        raise RuntimeError(f"{left} tables still have a percentage width (tblW type=\"pct\")")
+    return content
+
 
-    # --- Insert into DOCX ---
-    tmp_dir = Path(tempfile.mkdtemp())
-    with zipfile.ZipFile(str(OUTPUT_DOCX), 'r') as zf:
-        zf.extractall(str(tmp_dir))
+def add_front_matter(doc, file_ids=None):
+    """Insert the front matter (see front_matter_xml) at the start of the body.
 
-    doc_path = tmp_dir / "word" / "document.xml"
-    content = doc_path.read_text(encoding='utf-8')
-    front_xml = '\n'.join(parts)
+    Tables get their absolute width in the same pass (fix_table_widths).
+    """
+    front_xml, toc_count = front_matter_xml(file_ids)
+    content = doc.read("word/document.xml").decode("utf-8")
     content = content.replace('<w:body>', f'<w:body>\n{front_xml}\n', 1)
-    doc_path.write_text(content, encoding='utf-8')
-
-    _repack_output(tmp_dir)
-    shutil.rmtree(str(tmp_dir))
-    print(f"✓ Added front matter ({len(toc_items)} TOC items)")
-
-
-def _get_toc_items():
-    """Return list of (level, title) for table of contents."""
-    return [
-        (0, "Chapter 1. 리액티브 프로그래밍 소개"),
-        (1, "1.1 리액티브 프로그래밍이란?"), (1, "1.2 명령형 프로그래밍 vs 리액티브 프로그래밍"),
-        (1, "1.3 리액티브 스트림(Reactive Streams) 표준"), (1, "1.4 배압(Backpressure)의 개념"),
-        (1, "1.5 왜 리액티브가 필요한가?"),
-        (0, "Chapter 2. Spring WebFlux 개요"),
-        (1, "2.1 Spring MVC와 Spring WebFlux 비교"), (1, "2.2 WebFlux의 내부 구조와 Netty"),
-        (1, "2.3 논블로킹 I/O의 원리"), (1, "2.4 WebFlux를 선택해야 하는 경우"),
-        (1, "2.5 WebFlux의 두 가지 프로그래밍 모델"),
-        (0, "Chapter 3. Project Reactor 핵심"),
-        (1, "3.1 Mono와 Flux 이해하기"), (1, "3.2 Reactor의 주요 연산자"),
-        (1, "3.3 에러 처리 전략"), (1, "3.4 스케줄러와 스레드 모델"),
-        (1, "3.5 Cold vs Hot Publisher"), (1, "3.6 Reactor 디버깅 기법"),
-        (0, "Chapter 4. MongoDB 소개"),
-        (1, "4.1 NoSQL과 MongoDB의 특징"), (1, "4.2 도큐먼트 모델과 컬렉션"),
-        (1, "4.3 MongoDB 설치 및 기본 CRUD"), (1, "4.4 인덱싱과 쿼리 최적화 기초"),
-        (1, "4.5 MongoDB와 리액티브 드라이버"),
-        (0, "Chapter 5. 개발 환경 구성"),
-        (1, "5.1 JDK, IDE, Docker 설치"), (1, "5.2 Spring Initializr로 프로젝트 생성"),
-        (1, "5.3 주요 의존성 설정"), (1, "5.4 application.yml 설정"),
-        (1, "5.5 MongoDB Docker 컨테이너 구성"), (1, "5.6 프로젝트 구조 설계"),
-        (0, "Chapter 6. 어노테이션 기반 REST API 구현"),
-        (1, "6.1 도메인 모델 정의"), (1, "6.2 ReactiveMongoRepository 활용"),
-        (1, "6.3 서비스 계층 구현"), (1, "6.4 @RestController로 CRUD API"),
-        (1, "6.5 요청/응답 DTO 설계"), (1, "6.6 API 테스트"),
-        (0, "Chapter 7. 함수형 엔드포인트 (Router Functions)"),
-        (1, "7.1 HandlerFunction과 RouterFunction"), (1, "7.2 RouterFunction으로 라우팅 정의"),
-        (1, "7.3 HandlerFunction 구현"), (1, "7.4 요청 파라미터 및 바디 처리"),
-        (1, "7.5 어노테이션 방식과 함수형 방식 비교"),
-        (0, "Chapter 8. MongoDB 리액티브 데이터 접근 심화"),
-        (1, "8.1 ReactiveMongoTemplate 활용"), (1, "8.2 커스텀 쿼리와 Criteria API"),
-        (1, "8.3 Aggregation Pipeline"), (1, "8.4 변경 스트림(Change Streams)"),
-        (1, "8.5 트랜잭션 처리"), (1, "8.6 인덱스 관리와 쿼리 성능 최적화"),
-        (0, "Chapter 9. 데이터 검증과 예외 처리"),
-        (1, "9.1 Bean Validation"), (1, "9.2 커스텀 Validator"),
-        (1, "9.3 글로벌 예외 처리"), (1, "9.4 ErrorWebExceptionHandler"),
-        (1, "9.5 에러 응답 표준화"),
-        (0, "Chapter 10. WebFlux 필터와 인터셉터"),
-        (1, "10.1 WebFilter 구현"), (1, "10.2 HandlerFilterFunction 활용"),
-        (1, "10.3 요청/응답 로깅"), (1, "10.4 CORS 설정"),
-        (1, "10.5 요청 속도 제한(Rate Limiting)"),
-        (0, "Chapter 11. 리액티브 보안 (Spring Security WebFlux)"),
-        (1, "11.1 Spring Security Reactive 설정"), (1, "11.2 SecurityWebFilterChain 구성"),
-        (1, "11.3 인증과 인가 구현"), (1, "11.4 JWT 기반 인증"),
-        (1, "11.5 SecurityContext 관리"), (1, "11.6 OAuth2 / OpenID Connect"),
-        (0, "Chapter 12. Server-Sent Events (SSE)"),
-        (1, "12.1 SSE란 무엇인가?"), (1, "12.2 Flux를 활용한 SSE 엔드포인트"),
-        (1, "12.3 실시간 알림 시스템 구축"), (1, "12.4 MongoDB Change Streams + SSE"),
-        (0, "Chapter 13. WebSocket"),
-        (1, "13.1 WebSocket 프로토콜 이해"), (1, "13.2 WebSocket 핸들러 구현"),
-        (1, "13.3 실시간 채팅 애플리케이션"), (1, "13.4 WebSocket 세션 관리"),
-        (0, "Chapter 14. WebClient: 리액티브 HTTP 클라이언트"),
-        (1, "14.1 WebClient 설정과 기본 사용법"), (1, "14.2 요청/응답 처리"),
-        (1, "14.3 에러 핸들링과 재시도"), (1, "14.4 타임아웃 설정"),
-        (1, "14.5 외부 API 연동"), (1, "14.6 WebClient 필터와 인터셉터"),
-        (0, "Chapter 15. R2DBC와의 통합"),
-        (1, "15.1 R2DBC란?"), (1, "15.2 멀티 데이터소스 구성"),
-        (1, "15.3 여러 데이터소스 조합하기"),
-        (0, "Chapter 16. 리액티브 테스트 전략"),
-        (1, "16.1 StepVerifier 단위 테스트"), (1, "16.2 WebTestClient 통합 테스트"),
-        (1, "16.3 Embedded MongoDB 테스트"), (1, "16.4 Testcontainers"),
-        (1, "16.5 MockWebServer 외부 API 모킹"), (1, "16.6 테스트 슬라이스"),
-        (0, "Chapter 17. 문서화와 API 관리"),
-        (1, "17.1 SpringDoc OpenAPI 연동"), (1, "17.2 API 문서 자동 생성"),
-        (1, "17.3 API 버전 관리 전략"),
-        (0, "Chapter 18. 모니터링과 관측 가능성"),
-        (1, "18.1 Spring Boot Actuator"), (1, "18.2 Micrometer와 Prometheus"),
-        (1, "18.3 Grafana 대시보드"), (1, "18.4 리액티브 스트림 메트릭"),
-        (1, "18.5 분산 추적"), (1, "18.6 구조화된 로깅"),
-        (0, "Chapter 19. 성능 최적화"),
-        (1, "19.1 성능 측정"), (1, "19.2 MongoDB 커넥션 풀 튜닝"),
-        (1, "19.3 Netty 이벤트 루프 최적화"), (1, "19.4 캐싱 전략"),
-        (1, "19.5 블로킹 코드 탐지 (BlockHound)"), (1, "19.6 부하 테스트"),
-        (0, "Chapter 20. 컨테이너화와 배포"),
-        (1, "20.1 Docker 이미지 빌드"), (1, "20.2 Docker Compose 전체 스택"),
-        (1, "20.3 Kubernetes 배포"), (1, "20.4 MongoDB Atlas 연동"),
-        (1, "20.5 CI/CD 파이프라인"), (1, "20.6 GraalVM Native Image"),
-        (0, "Chapter 21. 종합 프로젝트: 리액티브 게시판"),
-        (1, "21.1 요구사항 분석 및 설계"), (1, "21.2 사용자 관리"),
-        (1, "21.3 게시글 CRUD API"), (1, "21.4 댓글 시스템"),
-        (1, "21.5 실시간 알림 (SSE)"), (1, "21.6 페이징과 검색"),
-        (1, "21.7 파일 업로드 (GridFS)"), (1, "21.8 전체 테스트"),
-        (1, "21.9 Docker Compose로 배포"),
-        (0, "부록 A. Reactor 주요 연산자 레퍼런스"),
-        (0, "부록 B. MongoDB 쿼리 연산자 정리"),
-        (0, "부록 C. 자주 발생하는 문제와 해결 방법 (FAQ)"),
-        (0, "부록 D. 참고 자료 및 추천 학습 경로"),
-    ]
+    content = fix_table_widths(content)
+    doc.write("word/document.xml", content.encode("utf-8"))
+    print(f"✓ Added front matter ({toc_count} TOC items)")
+
+
+def _get_toc_items(file_ids=None):
+    """Return list of (level, title) for table of contents.
+
+    Built from the shared TOC model (list.md + chapter headings, see toc.py);
+    titles are XML-escaped for direct use in <w:t>. file_ids limits it to
+    the chapters of a partial build.
+    """
+    book = load_toc()
+    items = []
+    for part in book.parts:
+        for chapter in part.chapters:
+            if file_ids is not None and chapter.file_id not in file_ids:
+                continue
+            items.append((0, html.escape(chapter_heading(chapter), quote=False)))
+            items.extend((1, html.escape(section, quote=False)) for section in chapter.sections)
+    items.extend((0, html.escape(chapter_heading(chapter), quote=False)) for chapter in book.appendices
+                 if file_ids is None or chapter.file_id in file_ids)
+    return items
 
 
 # ============================================================
-# 유틸리티
+# Step 6: 찾아보기 (XE 색인 항목, INDEX 필드)
 # ============================================================
-def _repack_output(tmp_dir):
-    """Repack tmp_dir into OUTPUT_DOCX."""
-    if OUTPUT_DOCX.exists():
-        OUTPUT_DOCX.unlink()
-    with zipfile.ZipFile(str(OUTPUT_DOCX), 'w', zipfile.ZIP_DEFLATED) as zf:
-        for root_dir, dirs, files in os.walk(str(tmp_dir)):
-            for file in files:
-                file_path = Path(root_dir) / file
-                arcname = file_path.relative_to(tmp_dir)
-                zf.write(str(file_path), str(arcname))
+HEADING_P_RE = re.compile(r'(<w:p><w:pPr><w:pStyle w:val="Heading[1-3]" ?/>.*?)(</w:p>)', re.S)
+INDEX_TITLE = "찾아보기"
+
+
+def xe_field_xml(name):
+    """An XE (index entry) field for name, on the page of the paragraph it is in."""
+    text = name.replace("\\", "\\\\").replace('"', '\\"').replace(":", "\\:")
+    return ('<w:r><w:fldChar w:fldCharType="begin" /></w:r>'
+            f'<w:r><w:instrText xml:space="preserve"> XE &quot;{html.escape(text, quote=False)}&quot; </w:instrText></w:r>'
+            '<w:r><w:fldChar w:fldCharType="end" /></w:r>')
+
+
+def index_page_xml():
+    """The 찾아보기 heading and the INDEX field Word fills in from the XE fields."""
+    return (f'<w:p><w:pPr><w:pStyle w:val="Heading1" /></w:pPr>'
+            f'<w:r><w:t xml:space="preserve">{INDEX_TITLE}</w:t></w:r></w:p>'
+            '<w:p><w:r><w:fldChar w:fldCharType="begin" w:dirty="true" />'
+            '<w:instrText xml:space="preserve">INDEX \\h &quot;A&quot; \\c &quot;2&quot; \\z &quot;1042&quot;</w:instrText>'
+            '<w:fldChar w:fldCharType="separate" /><w:fldChar w:fldCharType="end" /></w:r></w:p>')
+
+
+def index_fields(body, file_ids=None):
+    """body with XE fields on the headings of the sections each term occurs in.
+
+    The h1-h3 heading paragraphs of body are the section headings
+    bookindex.py found, in book order (of file_ids only, if given).
+    Returns (body, number of XE fields); body is returned unchanged if the
+    headings do not line up.
+    """
+    index = load_index()
+    file_ids = [file_id for file_id in index.sections if file_ids is None or file_id in file_ids]
+    marks = {}
+    for entry in index.entries:
+        for file_id, section in entry.locations:
+            # Section 0 is the text before a chapter's first heading
+            if section and file_id in file_ids:
+                marks.setdefault((file_id, section), []).append(entry.term.name)
+    headings = [(file_id, i) for file_id in file_ids for i in range(1, len(index.sections[file_id]))]
+    found = len(HEADING_P_RE.findall(body))
+    if found != len(headings):
+        print(f"✗ Index skipped: {found} headings in the document, {len(headings)} in the sources")
+        return body, 0
+
+    sections = iter(headings)
+
+    def mark(m):
+        names = marks.get(next(sections), ())
+        return m.group(1) + "".join(xe_field_xml(name) for name in names) + m.group(2)
+
+    return HEADING_P_RE.sub(mark, body), sum(len(names) for names in marks.values())
+
+
+def add_book_index(doc, file_ids=None):
+    """Mark the index entries (see index_fields) and add the 찾아보기 page at the end."""
+    content = doc.read("word/document.xml").decode("utf-8")
+    content, count = index_fields(content, file_ids)
+    if count:
+        end = content.rindex("<w:sectPr")
+        content = content[:end] + index_page_xml() + content[end:]
+        doc.write("word/document.xml", content.encode("utf-8"))
+    print(f"✓ Added index ({count} entries)")
 
 
-def cleanup():
-    """Remove temporary build directory."""
-    if WORK_DIR.exists():
-        shutil.rmtree(str(WORK_DIR))
+# ============================================================
+# Step 5~6 (네이티브 모드, --writer native): pandoc 없이 변환
+# ============================================================
+def _border_xml(side, sz="4", color=TABLE_BORDER_COLOR):
+    return f'<w:{side} w:val="single" w:sz="{sz}" w:space="0" w:color="{color}"/>'
+
+
+def table_parts(num_cols):
+    """Table layout for docxwriter, written out on each table.
+
+    The same rules as the reference doc's Table style plus docx_tables.lua
+    in pandoc mode: fixed layout, equal columns over PAGE_CONTENT_WIDTH,
+    borders, cell margins and the header row's border and shading.
+    Returns (tblPr, tblGrid, header cell tcPr, body cell tcPr).
+    """
+    col_width = PAGE_CONTENT_WIDTH // num_cols
+    borders = "".join(_border_xml(side) for side in ["top", "left", "bottom", "right", "insideH", "insideV"])
+    margins = "".join(f'<w:{side} w:w="{val}" w:type="dxa"/>' for side, val in TABLE_CELL_MARGINS)
+    tbl_pr = (f'<w:tblPr><w:tblStyle w:val="Table"/><w:tblW w:w="{PAGE_CONTENT_WIDTH}" w:type="dxa"/>'
+              f'<w:tblLayout w:type="fixed"/><w:tblBorders>{borders}</w:tblBorders>'
+              f'<w:tblCellMar>{margins}</w:tblCellMar></w:tblPr>')
+    grid_col = f'<w:gridCol w:w="{col_width}"/>'
+    grid = f'<w:tblGrid>{grid_col * num_cols}</w:tblGrid>'
+    cell_w = f'<w:tcW w:w="{col_width}" w:type="dxa"/>'
+    header_borders = (_border_xml("top") + _border_xml("left") + _border_xml("bottom", *TABLE_HEADER_BORDER)
+                      + _border_xml("right"))
+    header = (f'<w:tcPr>{cell_w}<w:tcBorders>{header_borders}</w:tcBorders>'
+              f'<w:shd w:val="clear" w:color="auto" w:fill="{TABLE_HEADER_FILL}"/></w:tcPr>')
+    body_borders = "".join(_border_xml(side) for side in ["top", "left", "bottom", "right"])
+    body = f'<w:tcPr>{cell_w}<w:tcBorders>{body_borders}</w:tcBorders></w:tcPr>'
+    return tbl_pr, grid, header, body
+
+
+# Root element of pandoc's document.xml, with the namespaces its body XML uses
+DOCUMENT_OPEN = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n<w:document'
+    f' xmlns:w="{W_NS}"'
+    ' xmlns:m="http://schemas.openxmlformats.org/officeDocument/2006/math"'
+    f' xmlns:r="{R_NS}"'
+    ' xmlns:o="urn:schemas-microsoft-com:office:office"'
+    ' xmlns:v="urn:schemas-microsoft-com:vml"'
+    ' xmlns:w10="urn:schemas-microsoft-com:office:word"'
+    f' xmlns:a="{A_NS}"'
+    ' xmlns:pic="http://schemas.openxmlformats.org/drawingml/2006/picture"'
+    f' xmlns:wp="{WP_NS}">'
+)
+HYPERLINK_REL = f"{R_NS}/hyperlink"
+SECT_PR_RE = re.compile(rb"<w:sectPr\b.*</w:sectPr>", re.S)
+
+
+def toc_field_xml():
+    """The TOC field --toc writes; Word fills it in when fields are updated."""
+    return ('<w:sdt><w:sdtPr><w:docPartObj><w:docPartGallery w:val="Table of Contents" />'
+            '<w:docPartUnique /></w:docPartObj></w:sdtPr><w:sdtContent>'
+            '<w:p><w:pPr><w:pStyle w:val="TOCHeading" /></w:pPr>'
+            '<w:r><w:t xml:space="preserve">Table of Contents</w:t></w:r></w:p>'
+            '<w:p><w:r><w:fldChar w:fldCharType="begin" w:dirty="true" />'
+            f'<w:instrText xml:space="preserve">TOC \\o &quot;1-{TOC_DEPTH}&quot; \\h \\z \\u</w:instrText>'
+            '<w:fldChar w:fldCharType="separate" /><w:fldChar w:fldCharType="end" /></w:r></w:p>'
+            '</w:sdtContent></w:sdt>')
+
+
+def write_native(output, md_bytes=None, file_ids=None):
+    """Steps 5-6 in one pass: write the DOCX from books.md (or md_bytes) without pandoc.
+
+    docxwriter renders the body with tables already laid out (see
+    table_parts), the front matter is placed before it and the index
+    (see index_fields) is added to it. Every
+    other part (styles, theme, settings, page setup) comes from the
+    reference doc; numbering, hyperlink relationships and the code token
+    styles are added the way pandoc adds them.
+    """
+    import docxwriter
+
+    md_text = (BOOKS_MD.read_bytes() if md_bytes is None else md_bytes).decode("utf-8")
+    rendered = docxwriter.render(md_text, table_parts)
+    front_xml, toc_count = front_matter_xml(file_ids)
+    body_xml, index_count = index_fields(rendered.body, file_ids)
+
+    doc = DocxPackage.open(OUTPUT_REF)
+    sect_pr = SECT_PR_RE.search(doc.read("word/document.xml")).group(0).decode("utf-8")
+    index_xml = index_page_xml() if index_count else ""
+    body = "\n".join([front_xml, toc_field_xml(), body_xml, index_xml, sect_pr])
+    doc.write("word/document.xml", f"{DOCUMENT_OPEN}\n<w:body>\n{body}\n</w:body>\n</w:document>".encode("utf-8"))
+    doc.write("word/numbering.xml", docxwriter.numbering_xml(rendered.lists))
+
+    styles = doc.read("word/styles.xml")
+    if b'w:styleId="KeywordTok"' not in styles:
+        styles = styles.replace(b"</w:styles>", docxwriter.token_styles_xml().encode("utf-8") + b"</w:styles>")
+        doc.write("word/styles.xml", styles)
+
+    # The reference doc's sample hyperlink is replaced by the book's links
+    rels = doc.read_xml(DOC_RELS)
+    for rel in rels.findall(qn(PR_NS, "Relationship")):
+        if rel.get("Type") == HYPERLINK_REL:
+            rels.remove(rel)
+    for index, target in enumerate(rendered.links):
+        etree.SubElement(rels, qn(PR_NS, "Relationship"), Id=docxwriter.link_rid(index),
+                         Type=HYPERLINK_REL, Target=target, TargetMode="External")
+    doc.write_xml(DOC_RELS, rels)
+
+    doc.save(output)
+    print(f"✓ DOCX written: {output.stat().st_size / 1024:.0f} KB "
+          f"({len(rendered.lists)} lists, {len(rendered.links)} links)")
+    print(f"✓ Added front matter ({toc_count} TOC items)")
+    print(f"✓ Added index ({index_count} entries)")
+    return True
 
 
 # ============================================================
 # 메인 실행
 # ============================================================
-if __name__ == "__main__":
+def build(args, stats):
+    """Run the build steps. Returns the written DOCX path, or None on failure."""
+    with stats.stage("merge"):
+        print("\nMerging parts/books.md...")
+        merge_all()
+
+    only = None
+    output = OUTPUT_DOCX
+    if args.only:
+        with stats.stage("chapter index") as stage:
+            index = chapter_index()
+            if index is None:
+                return None
+            try:
+                only = select_chapters(args.only, list(index))
+            except ValueError as e:
+                print(f"✗ --only: {e}")
+                return None
+            output = partial_output(args.only)
+            stage["bytes_read"] = sum(index[file_id][1] - index[file_id][0] for file_id in only)
+
+    with stats.stage("reference doc") as stage:
+        recorded = load_json(str(REF_KEY_PATH)).get("pandoc") if args.writer == "native" else None
+        ref_key = reference_key(recorded)
+        if not args.force and reference_is_cached(ref_key):
+            print("\n[1-4/6] Reference doc unchanged, using cache")
+            print(f"✓ Reference doc: {OUTPUT_REF.relative_to(SCRIPT_DIR)}")
+        else:
+            build_reference(ref_key)
+            stage["bytes_written"] = OUTPUT_REF.stat().st_size
+
+    if args.writer == "native":
+        with stats.stage("native writer") as stage:
+            print("\n[5-6/6] Writing DOCX (native writer)...")
+            md_bytes = read_chapters(index, only) if only else None
+            if not write_native(output, md_bytes, only):
+                return None
+            stage["bytes_read"] = len(md_bytes) if only else BOOKS_MD.stat().st_size
+            stage["bytes_written"] = output.stat().st_size
+        return output
+
+    if only:
+        with stats.stage("pandoc"):
+            print(f"\n[5/6] Running pandoc on {', '.join(only)}...")
+            with stats.file(args.only) as f:
+                md_bytes = read_chapters(index, only)
+                if not run_pandoc(output, md_bytes):
+                    return None
+                f["bytes_read"] = len(md_bytes)
+                f["bytes_written"] = output.stat().st_size
+        doc = DocxPackage.open(output)
+    elif args.per_chapter:
+        with stats.stage("pandoc"):
+            print("\n[5/6] Running pandoc per chapter...")
+            fragments = run_pandoc_chapters(ref_key, jobs=args.jobs, force=args.force, stats=stats)
+        if fragments is None:
+            return None
+        with stats.stage("merge chapters") as stage:
+            names = [file_id for file_id, _ in chapter_sources()]
+            doc = merge_chapter_docx(fragments, names)
+            stage["bytes_written"] = doc.size("word/document.xml")
+    else:
+        with stats.stage("pandoc"):
+            print("\n[5/6] Running pandoc...")
+            with stats.file(BOOKS_MD.name) as f:
+                if not run_pandoc():
+                    return None
+                f["bytes_read"] = BOOKS_MD.stat().st_size
+                f["bytes_written"] = OUTPUT_DOCX.stat().st_size
+        doc = DocxPackage.open(OUTPUT_DOCX)
+
+    with stats.stage("front matter") as stage:
+        print("\n[6/6] Adding front matter and index...")
+        stage["bytes_read"] = doc.size("word/document.xml")
+        add_front_matter(doc, only)
+        add_book_index(doc, only)
+        stage["bytes_written"] = doc.size("word/document.xml")
+
+    with stats.stage("save") as stage:
+        doc.save(output)
+        stage["bytes_written"] = output.stat().st_size
+    return output
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="B5 부크크 DOCX 빌드")
+    parser.add_argument("--force", action="store_true",
+                        help="rebuild the reference doc and chapter fragments even if cached")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--per-chapter", action="store_true",
+                      help="run pandoc per chapter in parallel and merge the results")
+    mode.add_argument("--only", metavar="CHAPTERS",
+                      help="build only these chapters, e.g. ch08, ch08-ch11 or ch01,appendix_a "
+                      "(written next to the full book with the selection as a suffix)")
+    parser.add_argument("--writer", choices=["pandoc", "native"], default="pandoc",
+                        help="native: write document.xml with docxwriter.py instead of pandoc "
+                        "(tables and front matter in the same pass)")
+    parser.add_argument("-j", "--jobs", type=int, default=0,
+                        help="pandoc processes for --per-chapter (default: CPU count)")
+    parser.add_argument("--report", nargs="?", const=default_report_path("build_docx"),
+                        metavar="PATH", help="write a JSON timing report "
+                        "(default: .build_cache/reports/build_docx-<time>.json)")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="write a cProfile dump of the build to PATH")
+    args = parser.parse_args(argv)
+    if args.writer == "native" and args.per_chapter:
+        parser.error("--per-chapter runs pandoc; it cannot be combined with --writer native")
+
     print("=" * 60)
     print(f"  {BOOK_TITLE}")
     print(f"  B5 부크크 DOCX 빌드")
     print("=" * 60)
 
-    try:
-        print("\n[1/7] Extracting pandoc reference...")
-        extract_pandoc_reference()
+    stats = BuildStats("build_docx", argv)
+    with profiled(args.profile):
+        output = build(args, stats)
 
-        print("\n[2/7] Modifying theme fonts...")
-        modify_theme()
-
-        print("\n[3/7] Modifying styles...")
-        modify_styles()
-
-        print("\n[4/7] Setting page size...")
-        modify_document_settings()
-
-        print("\n[5/7] Running pandoc...")
-        repack_docx()
-        success = run_pandoc()
-
-        if success:
-            print("\n[6/7] Post-processing tables...")
-            postprocess_tables()
+    if output:
+        print("\n" + "=" * 60)
+        size = output.stat().st_size / 1024
+        print(f"  ✓ 빌드 완료: {output.name} ({size:.0f} KB)")
+        print("=" * 60)
+    else:
+        print("\n✗ 빌드 실패!")
+    if args.report:
+        stats.save(args.report)
+    return 0 if output else 1
 
-            print("\n[7/7] Adding front matter...")
-            add_front_matter()
 
-            print("\n" + "=" * 60)
-            size = OUTPUT_DOCX.stat().st_size / 1024
-            print(f"  ✓ 빌드 완료: {OUTPUT_DOCX.name} ({size:.0f} KB)")
-            print("=" * 60)
-        else:
-            print("\n✗ 빌드 실패!")
-    finally:
-        cleanup()
+if __name__ == "__main__":
+    sys.exit(main())
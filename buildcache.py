@@ -0,0 +1,57 @@
+"""Shared helpers for the build caches under .build_cache/ (safe to delete)."""
+
+import hashlib
+import json
+import os
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, ".build_cache")
+
+
+def content_hash(*parts):
+    """Return a SHA-256 hex digest over the given str/bytes parts."""
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        h.update(len(part).to_bytes(8, "big"))
+        h.update(part)
+    return h.hexdigest()
+
+
+def file_sha256(path):
+    """SHA-256 of a file, read in chunks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def source_state(path, previous=None):
+    """Return [mtime_ns, size, sha256] for path.
+
+    The file is only re-hashed if its mtime or size differ from previous.
+    """
+    st = os.stat(path)
+    if previous and previous[0] == st.st_mtime_ns and previous[1] == st.st_size:
+        return previous
+    return [st.st_mtime_ns, st.st_size, file_sha256(path)]
+
+
+def load_json(path):
+    """Load a JSON cache file, or {} if it is missing or unreadable."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_json(path, data):
+    """Atomically write a JSON cache file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""Build daemon: keeps convert.py and build_docx.py loaded between builds.
+
+Every one-shot run pays for interpreter startup and imports before any
+work starts. The daemon imports the build scripts once and runs builds
+sent to it over a Unix socket (.build_cache/buildd.sock), so they reuse
+the loaded modules, convert.py's Markdown instance and the in-memory
+highlight cache. The client half of this script only uses the standard
+library and forwards its arguments; the build output is streamed back and
+the client exits with the build's status.
+
+Usage:
+    python3 buildd.py serve               # run the daemon (Ctrl+C or `stop` to end)
+    python3 buildd.py convert [options]   # python3 convert.py [options], in the daemon
+    python3 buildd.py docx [options]      # python3 build_docx.py [options], in the daemon
+    python3 buildd.py stop
+
+Requests run one at a time, in the working directory of the client. When
+a build script changes, the daemon restarts itself before the next build.
+Without a running daemon, the client runs the build in its own process.
+"""
+
+import contextlib
+import json
+import os
+import socket
+import socketserver
+import sys
+import time
+import traceback
+
+from buildcache import BASE_DIR, CACHE_DIR
+
+SOCKET_PATH = os.path.join(CACHE_DIR, "buildd.sock")
+
+# Commands run in the daemon: name -> module whose main(argv) runs the build
+COMMANDS = {"convert": "convert", "docx": "build_docx"}
+
+# Seconds the client waits for a restarting daemon to listen again
+RESTART_TIMEOUT = 10.0
+
+
+# ============================================================
+# Daemon
+# ============================================================
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def loaded_sources():
+    """{path: mtime_ns} of the repo's modules loaded in this process."""
+    sources = {}
+    for module in list(sys.modules.values()):
+        path = getattr(module, "__file__", None)
+        if path and os.path.dirname(os.path.abspath(path)) == BASE_DIR:
+            sources[path] = _mtime(path)
+    return sources
+
+
+class _Stream:
+    """File-like object sending written text to the client as {"out": text} lines.
+
+    Writes after the client went away are dropped so the build still
+    finishes and saves its manifests.
+    """
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self.closed_by_client = False
+
+    def write(self, text):
+        if text and not self.closed_by_client:
+            try:
+                self.wfile.write(json.dumps({"out": text}).encode("utf-8") + b"\n")
+                self.wfile.flush()
+            except OSError:
+                self.closed_by_client = True
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:  # a liveness check from `serve`
+            return
+        request = json.loads(line)
+        command = request["command"]
+        if command == "stop":
+            self.server.stopping = True
+            self.reply({"exit": 0})
+            return
+        if any(_mtime(path) != mtime for path, mtime in self.server.sources.items()):
+            # Unlinked before replying, so the client's retry reaches the new process
+            os.unlink(SOCKET_PATH)
+            self.server.restarting = True
+            self.reply({"restart": True})
+            return
+
+        stream = _Stream(self.wfile)
+        start = time.perf_counter()
+        code = 0
+        cwd, saved_argv = os.getcwd(), sys.argv
+        module = sys.modules[COMMANDS[command]]
+        try:
+            os.chdir(request["cwd"])
+            sys.argv = [os.path.basename(module.__file__)] + request["argv"]  # argparse's prog
+            with contextlib.redirect_stdout(stream), contextlib.redirect_stderr(stream):
+                try:
+                    code = module.main(request["argv"]) or 0
+                except SystemExit as e:  # argparse errors and --help
+                    code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+                    if isinstance(e.code, str):
+                        print(e.code, file=sys.stderr)
+                except Exception:
+                    traceback.print_exc()
+                    code = 1
+        finally:
+            os.chdir(cwd)
+            sys.argv = saved_argv
+        # Modules the build imported on first use (dist.py, ...) are watched from now on
+        for path, mtime in loaded_sources().items():
+            self.server.sources.setdefault(path, mtime)
+        print(f"{command} {' '.join(request['argv'])}: exit {code} "
+              f"in {time.perf_counter() - start:.2f}s", flush=True)
+        self.reply({"exit": code})
+
+    def reply(self, message):
+        try:
+            self.wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+        except OSError:
+            pass
+
+
+class _Server(socketserver.UnixStreamServer):
+    def __init__(self, path):
+        super().__init__(path, _Handler)
+        self.stopping = False
+        self.restarting = False
+        self.sources = loaded_sources()
+
+
+def serve():
+    """Load the build scripts and handle requests until stopped."""
+    for module in COMMANDS.values():
+        __import__(module)
+    import convert
+    convert.convert_md_to_html("")  # create the Markdown instance now, not in the first build
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    if os.path.exists(SOCKET_PATH):
+        if _connect() is not None:
+            raise SystemExit(f"buildd is already running ({os.path.relpath(SOCKET_PATH)})")
+        os.unlink(SOCKET_PATH)
+    server = _Server(SOCKET_PATH)
+    print(f"buildd listening on {os.path.relpath(SOCKET_PATH)} (pid {os.getpid()})", flush=True)
+    try:
+        while not (server.stopping or server.restarting):
+            server.handle_request()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if not server.restarting:
+            os.unlink(SOCKET_PATH)
+    if server.restarting:
+        print("Build scripts changed; restarting.", flush=True)
+        os.execv(sys.executable, [sys.executable, os.path.abspath(__file__), "serve"])
+    print("buildd stopped.")
+
+
+# ============================================================
+# Client
+# ============================================================
+def _connect():
+    """A socket connected to the daemon, or None if none is listening."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(SOCKET_PATH)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def request(command, argv=()):
+    """Send one request and stream its output. Returns the exit code, or None without a daemon."""
+    deadline = None
+    while True:
+        sock = _connect()
+        if sock is None:
+            if deadline is None or time.monotonic() > deadline:
+                return None
+            time.sleep(0.05)
+            continue
+        with sock, sock.makefile("rb") as replies:
+            message = {"command": command, "argv": list(argv), "cwd": os.getcwd()}
+            sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+            for line in replies:
+                reply = json.loads(line)
+                if "out" in reply:
+                    sys.stdout.write(reply["out"])
+                    sys.stdout.flush()
+                elif "exit" in reply:
+                    return reply["exit"]
+                elif reply.get("restart"):
+                    break
+            else:
+                print("buildd: connection closed during the build", file=sys.stderr)
+                return 1
+        deadline = time.monotonic() + RESTART_TIMEOUT  # wait for the restarted daemon
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in {"serve", "stop", *COMMANDS}:
+        print(__doc__.split("Usage:")[1].rstrip(), file=sys.stderr)
+        return 2
+    command, args = argv[0], argv[1:]
+    if command == "serve":
+        serve()
+        return 0
+    if command == "convert" and "--watch" in args:
+        print("buildd: run `python3 convert.py --watch` directly; it already stays loaded",
+              file=sys.stderr)
+        return 2
+
+    code = request(command, args)
+    if command == "stop":
+        print("buildd stopped." if code is not None else "buildd is not running.")
+        return 0
+    if code is not None:
+        return code
+    # No daemon: run the build here
+    module = __import__(COMMANDS[command])
+    return module.main(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""Build timing/profiling report shared by convert.py and build_docx.py.
+
+Each build stage is timed with BuildStats.stage(); per-file work inside a
+stage (a chapter render, a pandoc run, a written page) with
+BuildStats.file(). For every stage and file the report records wall time,
+CPU time and bytes read/written; stages also record the CPU time of child
+processes (pandoc, render workers) and the peak RSS of the build process
+and its children. The report is saved as JSON, and a cProfile dump of the
+whole build can be written alongside it.
+"""
+
+import cProfile
+import os
+import platform
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from buildcache import CACHE_DIR, save_json
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+REPORTS_DIR = os.path.join(CACHE_DIR, "reports")
+
+# Bump when the report layout changes
+REPORT_VERSION = "1"
+
+
+def default_report_path(pipeline):
+    """.build_cache/reports/<pipeline>-<timestamp>.json"""
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    return os.path.join(REPORTS_DIR, f"{pipeline}-{stamp}.json")
+
+
+def _usage():
+    """(cpu seconds of this process, of waited-for children, peak RSS KB, children peak RSS KB)."""
+    if resource is None:
+        return time.process_time(), 0.0, None, None
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # ru_maxrss is KB on Linux, bytes on macOS
+    scale = 1024 if sys.platform == "darwin" else 1
+    return (own.ru_utime + own.ru_stime, children.ru_utime + children.ru_stime,
+            own.ru_maxrss // scale, children.ru_maxrss // scale)
+
+
+def timed_call(fn, *args):
+    """Return (fn(*args), wall seconds, CPU seconds), measured in this process.
+
+    Used for work that runs in a worker process, where the parent's
+    BuildStats cannot see the CPU time until the worker exits.
+    """
+    wall, cpu = time.perf_counter(), time.process_time()
+    result = fn(*args)
+    return result, time.perf_counter() - wall, time.process_time() - cpu
+
+
+class BuildStats:
+    """Collects per-stage and per-file measurements for one build."""
+
+    def __init__(self, pipeline, argv=None):
+        self.pipeline = pipeline
+        self.meta = {
+            "argv": list(sys.argv[1:] if argv is None else argv),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        }
+        self.stages = []
+        self._current = None
+        self._started = datetime.now().isoformat(timespec="seconds")
+        self._wall = time.perf_counter()
+        self._usage = _usage()
+
+    @contextmanager
+    def stage(self, name):
+        """Time a build stage; yields its record (bytes_read/bytes_written can be added)."""
+        record = {"name": name, "bytes_read": 0, "bytes_written": 0, "files": []}
+        outer, self._current = self._current, record
+        wall = time.perf_counter()
+        cpu, children_cpu, _, _ = _usage()
+        try:
+            yield record
+        finally:
+            end_cpu, end_children_cpu, rss, children_rss = _usage()
+            record["wall_s"] = round(time.perf_counter() - wall, 4)
+            record["cpu_s"] = round(end_cpu - cpu, 4)
+            record["children_cpu_s"] = round(end_children_cpu - children_cpu, 4)
+            record["peak_rss_kb"] = rss
+            record["children_peak_rss_kb"] = children_rss
+            self._current = outer
+            self.stages.append(record)
+
+    @contextmanager
+    def file(self, name):
+        """Time one file's work inside the current stage; yields its record."""
+        wall, cpu = time.perf_counter(), time.process_time()
+        record = {"name": name, "bytes_read": 0, "bytes_written": 0}
+        try:
+            yield record
+        finally:
+            record["wall_s"] = round(time.perf_counter() - wall, 4)
+            record["cpu_s"] = round(time.process_time() - cpu, 4)
+            self._add(record)
+
+    def add_file(self, name, wall_s, cpu_s, bytes_read=0, bytes_written=0):
+        """Record a file measured elsewhere (e.g. with timed_call in a worker).
+
+        cpu_s may be None when the work ran in a thread or child process and
+        cannot be attributed to the file.
+        """
+        self._add({"name": name, "bytes_read": bytes_read, "bytes_written": bytes_written,
+                   "wall_s": round(wall_s, 4),
+                   "cpu_s": None if cpu_s is None else round(cpu_s, 4)})
+
+    def _add(self, record):
+        if self._current is None:
+            raise RuntimeError("BuildStats.file() used outside of a stage")
+        self._current["files"].append(record)
+        self._current["bytes_read"] += record["bytes_read"]
+        self._current["bytes_written"] += record["bytes_written"]
+
+    def report(self):
+        """The report as a JSON-serializable dict."""
+        cpu, children_cpu, rss, children_rss = _usage()
+        return {
+            "version": REPORT_VERSION,
+            "pipeline": self.pipeline,
+            "started": self._started,
+            "meta": self.meta,
+            "total": {
+                "wall_s": round(time.perf_counter() - self._wall, 4),
+                "cpu_s": round(cpu - self._usage[0], 4),
+                "children_cpu_s": round(children_cpu - self._usage[1], 4),
+                "peak_rss_kb": rss,
+                "children_peak_rss_kb": children_rss,
+                "bytes_read": sum(s["bytes_read"] for s in self.stages),
+                "bytes_written": sum(s["bytes_written"] for s in self.stages),
+            },
+            "stages": self.stages,
+        }
+
+    def save(self, path):
+        """Write the JSON report and print a per-stage summary."""
+        report = self.report()
+        save_json(path, report)
+        print(f"\n{'stage':<24}{'wall':>9}{'cpu':>9}{'child cpu':>11}{'files':>7}")
+        for s in report["stages"]:
+            print(f"{s['name']:<24}{s['wall_s']:>8.2f}s{s['cpu_s']:>8.2f}s"
+                  f"{s['children_cpu_s']:>10.2f}s{len(s['files']):>7}")
+        total = report["total"]
+        print(f"{'total':<24}{total['wall_s']:>8.2f}s{total['cpu_s']:>8.2f}s"
+              f"{total['children_cpu_s']:>10.2f}s")
+        print(f"Report: {path}")
+
+
+@contextmanager
+def profiled(path):
+    """Run the block under cProfile and dump the stats to path (no-op if path is None)."""
+    if path is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        profiler.dump_stats(path)
+        print(f"Profile: {path} (view with: python3 -m pstats {path})")
@@ -1,94 +1,225 @@
 #!/usr/bin/env python3
 """Markdown to HTML converter for the WebFlux book."""
 
+import argparse
+import json
 import os
+import posixpath
+import re
+import sys
+import time
+import traceback
+from collections import namedtuple
+from html import escape
 import markdown
-from markdown.extensions.tables import TableExtension
-from markdown.extensions.fenced_code import FencedCodeExtension
-from markdown.extensions.codehilite import CodeHiliteExtension
-from markdown.extensions.toc import TocExtension
+import pymdownx
+from markdown.extensions.toc import unique
+
+from bookindex import TERMS_MD, group_label, load_index, section_label
+from buildcache import CACHE_DIR, content_hash, file_sha256, load_json, save_json, source_state
+from buildstats import BuildStats, default_report_path, profiled, timed_call
+from fonts import (FONTS_CSS_REL, FONTS_VERSION, FLAVOR, SOURCE_STATE_PATH, available_faces,
+                   collect_glyphs, face_rel, font_face_css, fonttools_version, head_links, source_path,
+                   subset_face)
+from highlight import HIGHLIGHTER_KEY, highlight_fence
+from search import (INDEX_REL, SEARCH_DIR_REL, SEARCH_VERSION, build_index, build_shard, dumps,
+                    shard_rel)
+from merge import merge_all
+from offline import SW_REL, register_script, service_worker
+from toc import LIST_MD, all_chapters, load_toc, nav_order, part_chapters, part_files
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 PARTS_DIR = os.path.join(BASE_DIR, "parts")
 CONTENTS_DIR = os.path.join(BASE_DIR, "contents")
 CSS_PATH_FROM_ROOT = "css/style.css"
 CSS_PATH_FROM_CONTENTS = "../css/style.css"
+CSS_FILE = os.path.join(BASE_DIR, CSS_PATH_FROM_ROOT)
+SEARCH_JS_PATH_FROM_ROOT = "js/search.js"
+SEARCH_JS_FILE = os.path.join(BASE_DIR, SEARCH_JS_PATH_FROM_ROOT)
+PART_JS_PATH_FROM_ROOT = "js/part.js"
+# Later chapters of a part page, loaded on demand by js/part.js
+CHUNKS_DIR_REL = "contents/chunks"
+TERMS_REL = "contents/terms.html"
+
+# Incremental build state (not committed, safe to delete)
+MANIFEST_PATH = os.path.join(CACHE_DIR, "html_manifest.json")
+FRAGMENTS_DIR = os.path.join(CACHE_DIR, "fragments")
+
+# Bump when the markdown extension setup changes to force a full re-render
+RENDER_VERSION = "2"
+
+# --watch: seconds between polls, and quiet time before rebuilding after a save
+WATCH_INTERVAL = 0.2
+WATCH_DEBOUNCE = 0.3
 
 BOOK_TITLE = "Spring Boot + WebFlux + JPA (MongoDB)"
 
-# Chapter navigation order
-NAV_ORDER = [
-    ("ch01", "Chapter 1. 리액티브 프로그래밍 소개"),
-    ("ch02", "Chapter 2. Spring WebFlux 개요"),
-    ("ch03", "Chapter 3. Project Reactor 핵심"),
-    ("ch04", "Chapter 4. MongoDB 소개"),
-    ("ch05", "Chapter 5. 개발 환경 구성"),
-    ("ch06", "Chapter 6. 어노테이션 기반 REST API 구현"),
-    ("ch07", "Chapter 7. 함수형 엔드포인트"),
-    ("ch08", "Chapter 8. MongoDB 리액티브 데이터 접근 심화"),
-    ("ch09", "Chapter 9. 데이터 검증과 예외 처리"),
-    ("ch10", "Chapter 10. WebFlux 필터와 인터셉터"),
-    ("ch11", "Chapter 11. 리액티브 보안"),
-    ("ch12", "Chapter 12. Server-Sent Events (SSE)"),
-    ("ch13", "Chapter 13. WebSocket"),
-    ("ch14", "Chapter 14. WebClient"),
-    ("ch15", "Chapter 15. R2DBC와의 통합"),
-    ("ch16", "Chapter 16. 리액티브 테스트 전략"),
-    ("ch17", "Chapter 17. 문서화와 API 관리"),
-    ("ch18", "Chapter 18. 모니터링과 관측 가능성"),
-    ("ch19", "Chapter 19. 성능 최적화"),
-    ("ch20", "Chapter 20. 컨테이너화와 배포"),
-    ("ch21", "Chapter 21. 실전 프로젝트: 실시간 게시판 서비스"),
-    ("appendix_a", "부록 A. Reactor 주요 연산자 레퍼런스"),
-    ("appendix_b", "부록 B. MongoDB 쿼리 연산자 정리"),
-    ("appendix_c", "부록 C. 자주 발생하는 문제와 해결 방법 (FAQ)"),
-    ("appendix_d", "부록 D. 참고 자료 및 추천 학습 경로"),
-]
-
-# Part files (separate)
-PART_FILES = [
-    ("part1", "Part 1. 기초 다지기 (Ch.1-4)"),
-    ("part2", "Part 2. 프로젝트 시작하기 (Ch.5-7)"),
-    ("part3", "Part 3. 심화 개발 (Ch.8-11)"),
-    ("part4", "Part 4. 실시간 통신과 고급 기능 (Ch.12-15)"),
-    ("part5", "Part 5. 테스트와 품질 (Ch.16-17)"),
-    ("part6", "Part 6. 운영과 배포 (Ch.18-20)"),
-    ("part7", "Part 7. 실전 프로젝트 (Ch.21)"),
-]
-
-md = markdown.Markdown(
-    extensions=[
-        TableExtension(),
-        FencedCodeExtension(),
-        TocExtension(permalink=False),
-        "pymdownx.superfences",
-    ],
-    output_format="html5",
-)
+HEADING_ID_RE = re.compile(r'(<h[1-6] id=")([^"]*)(")')
+HEADING_RE = re.compile(r'<h([1-6]) id="([^"]*)">(.*?)</h\1>', re.S)
+
+# An output page and the chapter bodies it is assembled from; chunked pages
+# (the parts) inline the first chapter and load the others from chunk files
+Page = namedtuple("Page", ["out_rel", "title", "nav_html", "next_href", "chapters", "chunked", "key"])
+
+
+def create_markdown():
+    """Create a Markdown instance with the book's extension setup.
+
+    superfences handles every fenced block, so markdown's own fenced_code
+    extension (which pulls in codehilite and Pygments) is not loaded.
+    """
+    from markdown.extensions.tables import TableExtension
+    from markdown.extensions.toc import TocExtension
+
+    return markdown.Markdown(
+        extensions=[
+            TableExtension(),
+            TocExtension(permalink=False),
+            "pymdownx.superfences",
+        ],
+        extension_configs={
+            # Every fenced block goes through the cached Pygments highlighter
+            "pymdownx.superfences": {
+                "custom_fences": [{"name": "*", "class": "highlight", "format": highlight_fence}],
+            },
+        },
+        output_format="html5",
+    )
+
+
+# Created on first use: builds with nothing to render never load the extensions
+md = None
 
 
 def convert_md_to_html(md_text):
     """Convert markdown text to HTML body."""
+    global md
+    if md is None:
+        md = create_markdown()
     md.reset()
     return md.convert(md_text)
 
 
-def make_page(title, body_html, css_path, nav_html="", is_index=False):
-    """Wrap body HTML in a full HTML page."""
+def body_key(md_text):
+    """Hash every input of a rendered chapter body (superfences output varies with pymdownx)."""
+    return content_hash(RENDER_VERSION, markdown.__version__, pymdownx.__version__, HIGHLIGHTER_KEY, md_text)
+
+
+def page_key(body_keys, title, css_path, nav_html, next_href="", chunked=False):
+    """Hash every input of a page built from the given chapter bodies.
+
+    The page frame (make_page with an empty body) covers the title,
+    BOOK_TITLE, CSS path, the prev/next links from make_nav, the
+    prefetch hint for the next page and the chunk loader script. A chunked
+    page's chunk files are built from the same inputs and share its key.
+    """
+    frame = make_page(title, "", css_path, nav_html, next_href=next_href, chunked=chunked)
+    if chunked:
+        frame += chunk_placeholder("", "", "", "")
+    return content_hash(frame, *body_keys)
+
+
+def shard_key(body_key, title):
+    """Hash every input of a chapter's search shard."""
+    return content_hash(SEARCH_VERSION, body_key, title)
+
+
+def dedupe_ids(fragments):
+    """Chapter body fragments with heading ids made unique across all of them.
+
+    Heading ids are only unique within a chapter, so repeated ids get the
+    same _1, _2... suffixes the toc extension would give a single document.
+    """
+    seen = set()
+
+    def rename(m):
+        return m.group(1) + unique(m.group(2), seen) + m.group(3)
+
+    return [HEADING_ID_RE.sub(rename, fragment) for fragment in fragments]
+
+
+def join_fragments(fragments):
+    """Concatenate chapter body fragments into one part body."""
+    return "\n".join(dedupe_ids(fragments))
+
+
+def chunk_rel(page_id, file_id):
+    """Path of a part page's chapter chunk, relative to BASE_DIR."""
+    return f"{CHUNKS_DIR_REL}/{page_id}-{file_id}.html"
+
+
+def page_outputs(out_rel, chapters, chunked):
+    """Files written for a page: the page, then its chapter chunks if chunked."""
+    if not chunked:
+        return [out_rel]
+    page_id = posixpath.splitext(posixpath.basename(out_rel))[0]
+    return [out_rel] + [chunk_rel(page_id, ch) for ch in chapters[1:]]
+
+
+def chunk_placeholder(src, file_id, chapter_html, chunk_html):
+    """Stand-in for a chapter of a part page until js/part.js loads its chunk.
+
+    src is the chunk URL relative to the page and chunk_html the chapter
+    body with the part's heading ids; data-anchors lists those ids so a
+    link into the chapter loads the right chunk. The chapter heading is
+    kept, and without JavaScript the placeholder links to the chapter page
+    and its sections there (chapter_html has the chapter page's ids).
+    """
+    title = HEADING_RE.search(chunk_html)
+    anchors = " ".join(m.group(2) for m in HEADING_RE.finditer(chunk_html))
+    sections = "".join(f'\n    <li><a href="{file_id}.html#{m.group(2)}">{m.group(3)}</a></li>'
+                       for m in HEADING_RE.finditer(chapter_html) if m.group(1) == "2")
+    return f"""<section class="part-chunk" data-src="{src}" data-anchors="{anchors}">
+  {title.group(0) if title else ""}
+  <p class="chunk-fallback"><a href="{file_id}.html">이 장 읽기</a></p>
+  <ul class="chunk-sections">{sections}
+  </ul>
+</section>"""
+
+
+def part_body(page_id, chapters, fragments):
+    """Body of a chunked part page and its chunks as [(chunk rel, html)].
+
+    The first chapter is inlined so the page paints like a chapter page;
+    every other chapter is a placeholder for its chunk.
+    """
+    unique_fragments = dedupe_ids(fragments)
+    body = [unique_fragments[0]]
+    chunks = []
+    for file_id, chapter_html, chunk_html in zip(chapters[1:], fragments[1:], unique_fragments[1:]):
+        rel = chunk_rel(page_id, file_id)
+        src = posixpath.relpath(rel, "contents")
+        body.append(chunk_placeholder(src, file_id, chapter_html, chunk_html))
+        chunks.append((rel, chunk_html))
+    return "\n".join(body), chunks
+
+
+def make_page(title, body_html, css_path, nav_html="", is_index=False, next_href="", chunked=False):
+    """Wrap body HTML in a full HTML page.
+
+    next_href is the page a reader most likely opens next; it is prefetched.
+    chunked pages get the loader for their chapter chunks (see part_body).
+    """
     content_class = "index-content" if is_index else "content"
+    root = "" if is_index else "../"
+    scripts = f'\n  <script src="{root}{PART_JS_PATH_FROM_ROOT}" defer></script>' if chunked else ""
+    prefetch = f'\n  <link rel="prefetch" href="{next_href}">' if next_href else ""
     return f"""<!DOCTYPE html>
 <html lang="ko">
 <head>
   <meta charset="UTF-8">
   <meta name="viewport" content="width=device-width, initial-scale=1.0">
-  <title>{title} | {BOOK_TITLE}</title>
-  <link rel="stylesheet" href="{css_path}">
-  <link rel="preconnect" href="https://fonts.googleapis.com">
-  <link href="https://fonts.googleapis.com/css2?family=Noto+Sans+KR:wght@300;400;500;600;700;800&family=JetBrains+Mono:wght@400;500;600&display=swap" rel="stylesheet">
+  <title>{escape(title, quote=False)} | {BOOK_TITLE}</title>
+  <link rel="stylesheet" href="{css_path}">{head_links(root)}
+  <script src="{root}{SEARCH_JS_PATH_FROM_ROOT}" defer></script>{scripts}{prefetch}
 </head>
 <body>
   <header class="site-header">
-    <h1><a href="{"index.html" if is_index else "../index.html"}">{BOOK_TITLE}</a></h1>
+    <h1><a href="{root}index.html">{BOOK_TITLE}</a></h1>
+    <form class="search" role="search" data-base="{"contents/" if is_index else ""}" hidden>
+      <input type="search" placeholder="본문 검색" aria-label="본문 검색" autocomplete="off">
+      <ol class="search-results"></ol>
+    </form>
   </header>
   {nav_html}
   <div class="wrapper">
@@ -99,6 +230,7 @@ def make_page(title, body_html, css_path, nav_html="", is_index=False):
       &copy; 2024 Spring Boot + WebFlux + JPA (MongoDB) Book
     </footer>
   </div>
+  {register_script(root)}
 </body>
 </html>"""
 
@@ -109,12 +241,12 @@ def make_nav(prev_item, next_item, is_contents=True):
     home = "../index.html" if is_contents else "index.html"
 
     if prev_item:
-        prev_link = f'<a href="{prefix}{prev_item[0]}.html">&larr; {prev_item[1]}</a>'
+        prev_link = f'<a href="{prefix}{prev_item[0]}.html">&larr; {escape(prev_item[1], quote=False)}</a>'
     else:
         prev_link = '<span class="disabled">&larr; 이전</span>'
 
     if next_item:
-        next_link = f'<a href="{prefix}{next_item[0]}.html">{next_item[1]} &rarr;</a>'
+        next_link = f'<a href="{prefix}{next_item[0]}.html">{escape(next_item[1], quote=False)} &rarr;</a>'
     else:
         next_link = '<span class="disabled">다음 &rarr;</span>'
 
@@ -125,222 +257,25 @@ def make_nav(prev_item, next_item, is_contents=True):
   </nav>"""
 
 
-def build_index_html():
-    """Build the index.html from list.md structure."""
-    parts = [
-        {
-            "title": "Part 1. 기초 다지기",
-            "chapters": [
-                ("ch01", "Chapter 1", "리액티브 프로그래밍 소개", [
-                    "1.1 리액티브 프로그래밍이란?",
-                    "1.2 명령형 프로그래밍 vs 리액티브 프로그래밍",
-                    "1.3 리액티브 스트림(Reactive Streams) 표준",
-                    "1.4 배압(Backpressure)의 개념",
-                    "1.5 왜 리액티브가 필요한가?",
-                ]),
-                ("ch02", "Chapter 2", "Spring WebFlux 개요", [
-                    "2.1 Spring MVC와 Spring WebFlux 비교",
-                    "2.2 WebFlux의 내부 구조와 Netty",
-                    "2.3 논블로킹 I/O의 원리",
-                    "2.4 WebFlux를 선택해야 하는 경우와 그렇지 않은 경우",
-                    "2.5 WebFlux의 두 가지 프로그래밍 모델",
-                ]),
-                ("ch03", "Chapter 3", "Project Reactor 핵심", [
-                    "3.1 Mono와 Flux 이해하기",
-                    "3.2 Reactor의 주요 연산자",
-                    "3.3 에러 처리 전략",
-                    "3.4 스케줄러와 스레드 모델",
-                    "3.5 Cold vs Hot Publisher",
-                    "3.6 Reactor 디버깅 기법",
-                ]),
-                ("ch04", "Chapter 4", "MongoDB 소개", [
-                    "4.1 NoSQL과 MongoDB의 특징",
-                    "4.2 도큐먼트 모델과 컬렉션",
-                    "4.3 MongoDB 설치 및 기본 CRUD",
-                    "4.4 인덱싱과 쿼리 최적화 기초",
-                    "4.5 MongoDB와 리액티브 드라이버",
-                ]),
-            ],
-        },
-        {
-            "title": "Part 2. 프로젝트 시작하기",
-            "chapters": [
-                ("ch05", "Chapter 5", "개발 환경 구성", [
-                    "5.1 JDK, IDE, Docker 설치",
-                    "5.2 Spring Initializr로 프로젝트 생성",
-                    "5.3 주요 의존성 설정",
-                    "5.4 application.yml 설정",
-                    "5.5 MongoDB Docker 컨테이너 구성",
-                    "5.6 프로젝트 구조 설계",
-                ]),
-                ("ch06", "Chapter 6", "어노테이션 기반 REST API 구현", [
-                    "6.1 도메인 모델(Document) 정의",
-                    "6.2 ReactiveMongoRepository 활용",
-                    "6.3 서비스 계층 구현",
-                    "6.4 @RestController로 CRUD API 만들기",
-                    "6.5 요청/응답 DTO 설계",
-                    "6.6 API 테스트",
-                ]),
-                ("ch07", "Chapter 7", "함수형 엔드포인트 (Router Functions)", [
-                    "7.1 HandlerFunction과 RouterFunction 이해",
-                    "7.2 RouterFunction으로 라우팅 정의하기",
-                    "7.3 HandlerFunction 구현",
-                    "7.4 요청 파라미터 및 바디 처리",
-                    "7.5 어노테이션 방식과 함수형 방식 비교",
-                ]),
-            ],
-        },
-        {
-            "title": "Part 3. 심화 개발",
-            "chapters": [
-                ("ch08", "Chapter 8", "MongoDB 리액티브 데이터 접근 심화", [
-                    "8.1 ReactiveMongoTemplate 활용",
-                    "8.2 커스텀 쿼리와 Criteria API",
-                    "8.3 Aggregation Pipeline 사용",
-                    "8.4 변경 스트림(Change Streams) 활용",
-                    "8.5 트랜잭션 처리",
-                    "8.6 인덱스 관리와 쿼리 성능 최적화",
-                ]),
-                ("ch09", "Chapter 9", "데이터 검증과 예외 처리", [
-                    "9.1 Bean Validation을 활용한 입력 검증",
-                    "9.2 커스텀 Validator 구현",
-                    "9.3 글로벌 예외 처리 (@ControllerAdvice)",
-                    "9.4 ErrorWebExceptionHandler 활용",
-                    "9.5 에러 응답 표준화 (Problem Details)",
-                ]),
-                ("ch10", "Chapter 10", "WebFlux 필터와 인터셉터", [
-                    "10.1 WebFilter 구현",
-                    "10.2 HandlerFilterFunction 활용",
-                    "10.3 요청/응답 로깅",
-                    "10.4 CORS 설정",
-                    "10.5 요청 속도 제한(Rate Limiting)",
-                ]),
-                ("ch11", "Chapter 11", "리액티브 보안 (Spring Security WebFlux)", [
-                    "11.1 Spring Security Reactive 설정",
-                    "11.2 SecurityWebFilterChain 구성",
-                    "11.3 인증과 인가 구현",
-                    "11.4 JWT 기반 인증 구현",
-                    "11.5 리액티브 환경에서의 SecurityContext 관리",
-                    "11.6 OAuth2 / OpenID Connect 연동",
-                ]),
-            ],
-        },
-        {
-            "title": "Part 4. 실시간 통신과 고급 기능",
-            "chapters": [
-                ("ch12", "Chapter 12", "Server-Sent Events (SSE)", [
-                    "12.1 SSE란 무엇인가?",
-                    "12.2 Flux를 활용한 SSE 엔드포인트 구현",
-                    "12.3 실시간 알림 시스템 구축",
-                    "12.4 MongoDB Change Streams + SSE 연동",
-                ]),
-                ("ch13", "Chapter 13", "WebSocket", [
-                    "13.1 WebSocket 프로토콜 이해",
-                    "13.2 WebFlux에서 WebSocket 핸들러 구현",
-                    "13.3 실시간 채팅 애플리케이션 구축",
-                    "13.4 WebSocket 세션 관리",
-                ]),
-                ("ch14", "Chapter 14", "WebClient: 리액티브 HTTP 클라이언트", [
-                    "14.1 WebClient 설정과 기본 사용법",
-                    "14.2 요청/응답 처리",
-                    "14.3 에러 핸들링과 재시도 전략",
-                    "14.4 타임아웃 설정",
-                    "14.5 외부 API 연동 실전 예제",
-                    "14.6 WebClient 필터와 인터셉터",
-                ]),
-                ("ch15", "Chapter 15", "R2DBC와의 통합 (보너스)", [
-                    "15.1 R2DBC란?",
-                    "15.2 MongoDB + R2DBC 멀티 데이터소스 구성",
-                    "15.3 리액티브 환경에서 여러 데이터소스 조합하기",
-                ]),
-            ],
-        },
-        {
-            "title": "Part 5. 테스트와 품질",
-            "chapters": [
-                ("ch16", "Chapter 16", "리액티브 테스트 전략", [
-                    "16.1 StepVerifier를 활용한 단위 테스트",
-                    "16.2 WebTestClient를 활용한 통합 테스트",
-                    "16.3 Embedded MongoDB를 활용한 리포지토리 테스트",
-                    "16.4 Testcontainers로 MongoDB 테스트 환경 구성",
-                    "16.5 MockWebServer를 활용한 외부 API 모킹",
-                    "16.6 테스트 슬라이스",
-                ]),
-                ("ch17", "Chapter 17", "문서화와 API 관리", [
-                    "17.1 SpringDoc OpenAPI(Swagger) 연동",
-                    "17.2 리액티브 API 문서 자동 생성",
-                    "17.3 API 버전 관리 전략",
-                ]),
-            ],
-        },
-        {
-            "title": "Part 6. 운영과 배포",
-            "chapters": [
-                ("ch18", "Chapter 18", "모니터링과 관측 가능성", [
-                    "18.1 Spring Boot Actuator 설정",
-                    "18.2 Micrometer와 Prometheus 연동",
-                    "18.3 Grafana 대시보드 구성",
-                    "18.4 리액티브 스트림 메트릭 수집",
-                    "18.5 분산 추적 (Zipkin / Jaeger)",
-                    "18.6 구조화된 로깅 (Logback + MDC)",
-                ]),
-                ("ch19", "Chapter 19", "성능 최적화", [
-                    "19.1 리액티브 애플리케이션 성능 측정",
-                    "19.2 MongoDB 커넥션 풀 튜닝",
-                    "19.3 Netty 이벤트 루프 최적화",
-                    "19.4 캐싱 전략 (Caffeine, Redis)",
-                    "19.5 블로킹 코드 탐지 및 제거 (BlockHound)",
-                    "19.6 부하 테스트 (Gatling, k6)",
-                ]),
-                ("ch20", "Chapter 20", "컨테이너화와 배포", [
-                    "20.1 Docker 이미지 빌드 (Jib, Buildpacks)",
-                    "20.2 Docker Compose로 전체 스택 구성",
-                    "20.3 Kubernetes 배포 기초",
-                    "20.4 MongoDB Atlas 클라우드 연동",
-                    "20.5 CI/CD 파이프라인 구성 (GitHub Actions)",
-                    "20.6 GraalVM Native Image 빌드",
-                ]),
-            ],
-        },
-        {
-            "title": "Part 7. 실전 프로젝트",
-            "chapters": [
-                ("ch21", "Chapter 21", "실전 프로젝트: 실시간 게시판 서비스", [
-                    "21.1 요구사항 분석 및 설계",
-                    "21.2 사용자 관리 (회원가입, 로그인, JWT)",
-                    "21.3 게시글 CRUD API 구현",
-                    "21.4 댓글 시스템",
-                    "21.5 실시간 알림 (SSE)",
-                    "21.6 페이징과 검색 기능",
-                    "21.7 파일 업로드 (GridFS)",
-                    "21.8 전체 테스트 작성",
-                    "21.9 Docker Compose로 배포",
-                ]),
-            ],
-        },
-    ]
-
-    appendices = [
-        ("appendix_a", "부록 A", "Reactor 주요 연산자 레퍼런스"),
-        ("appendix_b", "부록 B", "MongoDB 쿼리 연산자 정리"),
-        ("appendix_c", "부록 C", "자주 발생하는 문제와 해결 방법 (FAQ)"),
-        ("appendix_d", "부록 D", "참고 자료 및 추천 학습 경로"),
-    ]
+def build_index_html(toc):
+    """Build the index.html from the table of contents (see toc.py).
 
+    Titles come from list.md and the chapter headings, so they are escaped.
+    """
     body = f'<h1>{BOOK_TITLE}</h1>\n'
 
-    for part in parts:
+    for part in toc.parts:
         body += f'<div class="part-section">\n'
-        body += f'  <div class="part-title">{part["title"]}</div>\n'
+        body += f'  <div class="part-title">{escape(part.label, quote=False)}. {escape(part.title, quote=False)}</div>\n'
         body += f'  <ul class="chapter-list">\n'
-        for file_id, ch_num, ch_title, sections in part["chapters"]:
+        for chapter in part.chapters:
             body += f'    <li>\n'
-            body += f'      <a href="contents/{file_id}.html">'
-            body += f'<span class="chapter-number">{ch_num.split(".")[0].replace("Chapter ", "Ch.")}</span> '
-            body += f'{ch_title}</a>\n'
+            body += f'      <a href="contents/{chapter.file_id}.html">'
+            body += f'<span class="chapter-number">{escape(chapter.label.replace("Chapter ", "Ch."), quote=False)}</span> '
+            body += f'{escape(chapter.title, quote=False)}</a>\n'
             body += f'      <ul class="section-items">\n'
-            for sec in sections:
-                body += f"        <li>{sec}</li>\n"
+            for sec in chapter.sections:
+                body += f"        <li>{escape(sec, quote=False)}</li>\n"
             body += f"      </ul>\n"
             body += f"    </li>\n"
         body += f"  </ul>\n"
@@ -350,10 +285,10 @@ def build_index_html():
     body += '<div class="part-section">\n'
     body += '  <div class="part-title">부록</div>\n'
     body += '  <ul class="chapter-list">\n'
-    for file_id, label, title in appendices:
-        body += f'    <li><a href="contents/{file_id}.html">'
-        body += f'<span class="chapter-number">{label.split(".")[0].replace("부록 ", "")}</span> '
-        body += f"{title}</a></li>\n"
+    for chapter in toc.appendices:
+        body += f'    <li><a href="contents/{chapter.file_id}.html">'
+        body += f'<span class="chapter-number">{escape(chapter.label.replace("부록 ", ""), quote=False)}</span> '
+        body += f"{escape(chapter.title, quote=False)}</a></li>\n"
     body += "  </ul>\n"
     body += "</div>\n"
 
@@ -361,71 +296,445 @@ def build_index_html():
     body += '<div class="part-section">\n'
     body += '  <div class="part-title">파트별 통합본</div>\n'
     body += '  <ul class="chapter-list">\n'
-    for file_id, title in PART_FILES:
-        body += f'    <li><a href="contents/{file_id}.html">{title}</a></li>\n'
+    for file_id, title in part_files(toc):
+        body += f'    <li><a href="contents/{file_id}.html">{escape(title, quote=False)}</a></li>\n'
     body += "  </ul>\n"
     body += "</div>\n"
 
-    return make_page("목차", body, CSS_PATH_FROM_ROOT, is_index=True)
+    # Back-of-book index
+    body += '<div class="part-section">\n'
+    body += '  <div class="part-title">찾아보기</div>\n'
+    body += '  <ul class="chapter-list">\n'
+    body += f'    <li><a href="{TERMS_REL}">용어 찾아보기</a></li>\n'
+    body += "  </ul>\n"
+    body += "</div>\n"
 
+    first_page = nav_order(toc)[0][0]
+    return make_page("목차", body, CSS_PATH_FROM_ROOT, is_index=True,
+                     next_href=f"contents/{first_page}.html")
+
+
+def build_terms_html(index, toc):
+    """Build contents/terms.html, the back-of-book index (see bookindex.py).
+
+    Terms are grouped by initial (ㄱ-ㅎ, A-Z); each location links to its
+    section on the chapter page.
+    """
+    labels = {c.file_id: c.label.replace("Chapter ", "Ch.") for c in all_chapters(toc)}
+    groups = {}
+    for entry in index.entries:
+        groups.setdefault(group_label(entry.term.name), []).append(entry)
+
+    body = '<h1>찾아보기</h1>\n'
+    body += '<p class="index-groups">'
+    body += " ".join(f'<a href="#index-{group}">{group}</a>' for group in groups)
+    body += "</p>\n"
+    for group, entries in groups.items():
+        body += f'<h2 id="index-{group}">{group}</h2>\n'
+        body += '<dl class="book-index">\n'
+        for entry in entries:
+            links = []
+            for file_id, i in entry.locations:
+                section = index.sections[file_id][i]
+                href = f"{file_id}.html#{section.anchor}" if section.anchor else f"{file_id}.html"
+                label = section_label(section, labels[file_id])
+                links.append(f'<a href="{href}" title="{escape(section.title)}">{escape(label)}</a>')
+            body += f"  <dt>{escape(entry.term.name)}</dt>\n"
+            body += f"  <dd>{', '.join(links)}</dd>\n"
+        body += "</dl>\n"
+    if not groups:
+        body += "<p>index_terms.md에 색인할 용어가 없습니다.</p>\n"
+    return make_page("찾아보기", body, CSS_PATH_FROM_CONTENTS, make_nav(None, None))
+
+
+def is_current(out_rel, key, manifest):
+    """True if out_rel exists and was last built from inputs hashing to key."""
+    return manifest.get(out_rel) == key and os.path.exists(os.path.join(BASE_DIR, out_rel))
+
+
+def write_output(out_rel, html, key, manifest):
+    """Write html to BASE_DIR/out_rel and record its input hash. Returns bytes written."""
+    data = html.encode("utf-8")
+    with open(os.path.join(BASE_DIR, out_rel), "wb") as f:
+        f.write(data)
+    manifest[out_rel] = key
+    print(f"Created: {out_rel}")
+    return len(data)
+
+
+def fragment_rel(file_id):
+    """Path of a cached chapter body, relative to BASE_DIR."""
+    return os.path.relpath(os.path.join(FRAGMENTS_DIR, f"{file_id}.html"), BASE_DIR)
+
+
+def load_fragment(file_id, key, manifest):
+    """Return the cached body of file_id if it was rendered from key, else None."""
+    rel = fragment_rel(file_id)
+    if not is_current(rel, key, manifest):
+        return None
+    with open(os.path.join(BASE_DIR, rel), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def save_fragment(file_id, body_html, key, manifest):
+    """Cache a rendered chapter body for part pages of later builds."""
+    os.makedirs(FRAGMENTS_DIR, exist_ok=True)
+    rel = fragment_rel(file_id)
+    with open(os.path.join(BASE_DIR, rel), "w", encoding="utf-8") as f:
+        f.write(body_html)
+    manifest[rel] = key
+
+
+def _init_worker():
+    """Give each worker process its own Markdown instance."""
+    global md
+    md = create_markdown()
+
+
+def render_bodies(md_texts, num_jobs=1):
+    """Yield (body html, wall seconds, CPU seconds) for each markdown text, in order.
+
+    With num_jobs > 1 the texts are spread over worker processes, largest
+    first so the long chapters don't end up last in the queue. Times are
+    measured where the rendering runs.
+    """
+    if num_jobs <= 1 or len(md_texts) <= 1:
+        for md_text in md_texts:
+            yield timed_call(convert_md_to_html, md_text)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=min(num_jobs, len(md_texts)),
+                             initializer=_init_worker) as pool:
+        futures = {}
+        for i in sorted(range(len(md_texts)), key=lambda i: len(md_texts[i]), reverse=True):
+            futures[i] = pool.submit(timed_call, convert_md_to_html, md_texts[i])
+        for i in range(len(md_texts)):
+            yield futures[i].result()
+
+
+def subset_faces(faces, glyphs, num_jobs=1):
+    """Yield (bytes written, wall seconds, CPU seconds) for each subsetted face, in order.
+
+    CJK fonts take seconds each, so with num_jobs > 1 they are subset in
+    worker processes.
+    """
+    if num_jobs <= 1 or len(faces) <= 1:
+        for face in faces:
+            yield timed_call(subset_face, face, glyphs)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=min(num_jobs, len(faces))) as pool:
+        futures = [pool.submit(timed_call, subset_face, face, glyphs) for face in faces]
+        for future in futures:
+            yield future.result()
+
+
+def build(args, num_jobs, stats):
+    """Run the HTML build. Returns (files rebuilt, total files)."""
+    # 0. Refresh parts/partN.md and books.md from the chapters
+    with stats.stage("merge"):
+        merge_all()
 
-def main():
     os.makedirs(CONTENTS_DIR, exist_ok=True)
+    manifest = {} if args.force else load_json(MANIFEST_PATH)
+    rebuilt = 0
 
-    # 1. Build index.html
-    index_html = build_index_html()
-    with open(os.path.join(BASE_DIR, "index.html"), "w", encoding="utf-8") as f:
-        f.write(index_html)
-    print("Created: index.html")
-
-    # 2. Convert chapter/appendix files with navigation
-    for i, (file_id, title) in enumerate(NAV_ORDER):
-        md_path = os.path.join(PARTS_DIR, f"{file_id}.md")
-        if not os.path.exists(md_path):
-            print(f"SKIP (not found): {md_path}")
-            continue
-
-        with open(md_path, "r", encoding="utf-8") as f:
-            md_text = f.read()
-
-        body_html = convert_md_to_html(md_text)
-
-        prev_item = NAV_ORDER[i - 1] if i > 0 else None
-        next_item = NAV_ORDER[i + 1] if i < len(NAV_ORDER) - 1 else None
-        nav_html = make_nav(prev_item, next_item, is_contents=True)
-
-        html = make_page(title, body_html, CSS_PATH_FROM_CONTENTS, nav_html)
-
-        out_path = os.path.join(CONTENTS_DIR, f"{file_id}.html")
-        with open(out_path, "w", encoding="utf-8") as f:
-            f.write(html)
-        print(f"Created: contents/{file_id}.html")
+    with stats.stage("toc"):
+        toc = load_toc()
+        nav_pages = nav_order(toc)
+        part_pages = part_files(toc)
+        chapters_of = part_chapters(toc)
 
-    # 3. Convert part files (no chapter nav, just home link)
-    for i, (file_id, title) in enumerate(PART_FILES):
-        md_path = os.path.join(PARTS_DIR, f"{file_id}.md")
-        if not os.path.exists(md_path):
-            print(f"SKIP (not found): {md_path}")
-            continue
-
-        with open(md_path, "r", encoding="utf-8") as f:
-            md_text = f.read()
-
-        body_html = convert_md_to_html(md_text)
-
-        prev_part = PART_FILES[i - 1] if i > 0 else None
-        next_part = PART_FILES[i + 1] if i < len(PART_FILES) - 1 else None
-        nav_html = make_nav(prev_part, next_part, is_contents=True)
-
-        html = make_page(title, body_html, CSS_PATH_FROM_CONTENTS, nav_html)
-
-        out_path = os.path.join(CONTENTS_DIR, f"{file_id}.html")
-        with open(out_path, "w", encoding="utf-8") as f:
-            f.write(html)
-        print(f"Created: contents/{file_id}.html")
-
-    print("\nDone! All files converted.")
+    # 1. Build index.html
+    with stats.stage("index"):
+        index_html = build_index_html(toc)
+        index_key = content_hash(index_html)
+        if args.force or not is_current("index.html", index_key, manifest):
+            with stats.file("index.html") as f:
+                f["bytes_written"] = write_output("index.html", index_html, index_key, manifest)
+            rebuilt += 1
+
+    # 2. Read chapter/appendix sources
+    sources = {}
+    with stats.stage("read sources"):
+        for file_id, _ in nav_pages:
+            md_path = os.path.join(PARTS_DIR, f"{file_id}.md")
+            if not os.path.exists(md_path):
+                print(f"SKIP (not found): {md_path}")
+                continue
+            with stats.file(file_id) as f, open(md_path, "rb") as src:
+                data = src.read()
+                f["bytes_read"] = len(data)
+                sources[file_id] = data.decode("utf-8")
+        body_keys = {file_id: body_key(md_text) for file_id, md_text in sources.items()}
+
+    # 3. Plan chapter pages (prev/next nav) and part pages (assembled from chapters)
+    with stats.stage("plan"):
+        pages = []
+        for i, (file_id, title) in enumerate(nav_pages):
+            if file_id not in sources:
+                continue
+            prev_item = nav_pages[i - 1] if i > 0 else None
+            next_item = nav_pages[i + 1] if i < len(nav_pages) - 1 else None
+            nav_html = make_nav(prev_item, next_item, is_contents=True)
+            next_href = f"{next_item[0]}.html" if next_item else ""
+            pages.append((f"contents/{file_id}.html", title, nav_html, next_href, [file_id], False))
+
+        for i, (file_id, title) in enumerate(part_pages):
+            chapters = [ch for ch in chapters_of[file_id] if ch in sources]
+            if not chapters:
+                print(f"SKIP (no chapters): contents/{file_id}.html")
+                continue
+            prev_part = part_pages[i - 1] if i > 0 else None
+            next_part = part_pages[i + 1] if i < len(part_pages) - 1 else None
+            nav_html = make_nav(prev_part, next_part, is_contents=True)
+            next_href = f"{next_part[0]}.html" if next_part else ""
+            pages.append((f"contents/{file_id}.html", title, nav_html, next_href, chapters, True))
+
+        stale = []
+        for out_rel, title, nav_html, next_href, chapters, chunked in pages:
+            key = page_key([body_keys[ch] for ch in chapters], title, CSS_PATH_FROM_CONTENTS,
+                           nav_html, next_href, chunked)
+            out_rels = page_outputs(out_rel, chapters, chunked)
+            if args.force or not all(is_current(rel, key, manifest) for rel in out_rels):
+                stale.append(Page(out_rel, title, nav_html, next_href, chapters, chunked, key))
+        chunk_total = sum(len(page[4]) - 1 for page in pages if page[5])
+
+        shard_keys = {file_id: shard_key(body_keys[file_id], title)
+                      for file_id, title in nav_pages if file_id in sources}
+        stale_shards = [(file_id, title) for file_id, title in nav_pages if file_id in shard_keys
+                        and (args.force or not is_current(shard_rel(file_id), shard_keys[file_id], manifest))]
+
+    # 4. Render each chapter body a stale page or search shard needs, once, reusing cached bodies
+    with stats.stage("render"):
+        bodies = {}
+        needed = [file_id for page in stale for file_id in page.chapters]
+        needed += [file_id for file_id, _ in stale_shards]
+        for file_id in needed:
+            if file_id not in bodies:
+                bodies[file_id] = None if args.force else load_fragment(file_id, body_keys[file_id], manifest)
+        to_render = [file_id for file_id, body_html in bodies.items() if body_html is None]
+        rendered = render_bodies([sources[file_id] for file_id in to_render], num_jobs)
+        for file_id, (body_html, wall_s, cpu_s) in zip(to_render, rendered):
+            bodies[file_id] = body_html
+            save_fragment(file_id, body_html, body_keys[file_id], manifest)
+            stats.add_file(file_id, wall_s, cpu_s,
+                           bytes_read=len(sources[file_id].encode("utf-8")),
+                           bytes_written=len(body_html.encode("utf-8")))
+        rendered.close()  # shut the worker pool down within this stage
+
+    # 5. Assemble and write pages, in the order above
+    with stats.stage("write pages"):
+        os.makedirs(os.path.join(BASE_DIR, CHUNKS_DIR_REL), exist_ok=True)
+        for page in stale:
+            fragments = [bodies[file_id] for file_id in page.chapters]
+            chunks = []
+            if page.chunked:
+                page_id = posixpath.splitext(posixpath.basename(page.out_rel))[0]
+                body_html, chunks = part_body(page_id, page.chapters, fragments)
+            else:
+                body_html = join_fragments(fragments)
+            with stats.file(page.out_rel) as f:
+                html = make_page(page.title, body_html, CSS_PATH_FROM_CONTENTS, page.nav_html,
+                                 next_href=page.next_href, chunked=page.chunked)
+                f["bytes_written"] = write_output(page.out_rel, html, page.key, manifest)
+            rebuilt += 1
+            for rel, chunk_html in chunks:
+                with stats.file(rel) as f:
+                    f["bytes_written"] = write_output(rel, chunk_html, page.key, manifest)
+                rebuilt += 1
+
+    # 6. Search shards of changed chapters, then the term dictionary over all shards
+    with stats.stage("search index"):
+        os.makedirs(os.path.join(BASE_DIR, SEARCH_DIR_REL), exist_ok=True)
+        shards = {}
+        for file_id, title in stale_shards:
+            with stats.file(shard_rel(file_id)) as f:
+                shards[file_id] = build_shard(file_id, title, bodies[file_id])
+                f["bytes_written"] = write_output(shard_rel(file_id), dumps(shards[file_id]),
+                                                  shard_keys[file_id], manifest)
+            rebuilt += 1
+        search_key = content_hash(SEARCH_VERSION, *shard_keys.values())
+        if args.force or not is_current(INDEX_REL, search_key, manifest):
+            with stats.file(INDEX_REL) as f:
+                for file_id in shard_keys:
+                    if file_id not in shards:
+                        with open(os.path.join(BASE_DIR, shard_rel(file_id)), "rb") as src:
+                            data = src.read()
+                        f["bytes_read"] += len(data)
+                        shards[file_id] = json.loads(data)
+                index = build_index([shards[file_id] for file_id in shard_keys])
+                f["bytes_written"] = write_output(INDEX_REL, dumps(index), search_key, manifest)
+            rebuilt += 1
+
+    # 7. Back-of-book index page from the term list (sections rescanned only as needed)
+    with stats.stage("book index"):
+        terms_html = build_terms_html(load_index(args.force), toc)
+        terms_key = content_hash(terms_html)
+        if args.force or not is_current(TERMS_REL, terms_key, manifest):
+            with stats.file(TERMS_REL) as f:
+                f["bytes_written"] = write_output(TERMS_REL, terms_html, terms_key, manifest)
+            rebuilt += 1
+
+    # 8. Subset the self-hosted fonts to the characters the pages use
+    with stats.stage("fonts"):
+        faces = available_faces()
+        if faces:
+            # Part pages only repeat chapter text; index.html has the part titles
+            glyph_files = [os.path.join(BASE_DIR, "index.html"), os.path.join(BASE_DIR, TERMS_REL), SEARCH_JS_FILE]
+            glyph_files += [os.path.join(CONTENTS_DIR, f"{file_id}.html") for file_id in sources]
+            glyphs = collect_glyphs(glyph_files)
+            states = load_json(SOURCE_STATE_PATH)
+            font_keys = {}
+            for face in faces:
+                states[face.source] = source_state(source_path(face), states.get(face.source))
+                font_keys[face] = content_hash(FONTS_VERSION, fonttools_version(), FLAVOR,
+                                               states[face.source][2], glyphs)
+            save_json(SOURCE_STATE_PATH, states)
+            todo = [face for face in faces
+                    if args.force or not is_current(face_rel(face), font_keys[face], manifest)]
+            if todo:
+                print(f"Subsetting {len(todo)} font(s) to {len(glyphs)} characters...")
+            for face, (size, wall_s, cpu_s) in zip(todo, subset_faces(todo, glyphs, num_jobs)):
+                manifest[face_rel(face)] = font_keys[face]
+                stats.add_file(face_rel(face), wall_s, cpu_s,
+                               bytes_read=states[face.source][1], bytes_written=size)
+                print(f"Created: {face_rel(face)} ({size // 1024} KB)")
+                rebuilt += 1
+            css = font_face_css(faces)
+            css_key = content_hash(css)
+            if args.force or not is_current(FONTS_CSS_REL, css_key, manifest):
+                write_output(FONTS_CSS_REL, css, css_key, manifest)
+                rebuilt += 1
+
+    # 9. Service worker precaching the index, every page and part chunk and the assets for offline reading
+    with stats.stage("service worker"):
+        precache = ["index.html", TERMS_REL]
+        precache += [rel for page in pages for rel in page_outputs(page[0], page[4], page[5])]
+        precache += [CSS_PATH_FROM_ROOT, SEARCH_JS_PATH_FROM_ROOT, PART_JS_PATH_FROM_ROOT, INDEX_REL]
+        if faces:
+            precache += [FONTS_CSS_REL] + [face_rel(face) for face in faces]
+        entries = [(rel, file_sha256(os.path.join(BASE_DIR, rel))[:16]) for rel in precache]
+        sw = service_worker(entries)
+        sw_key = content_hash(sw)
+        if args.force or not is_current(SW_REL, sw_key, manifest):
+            with stats.file(SW_REL) as f:
+                f["bytes_written"] = write_output(SW_REL, sw, sw_key, manifest)
+            rebuilt += 1
+
+    save_json(MANIFEST_PATH, manifest)
+
+    # 10. Minified, precompressed copy with hashed assets for deployment
+    if args.dist:
+        from dist import build_dist
+
+        with stats.stage("dist"):
+            written, dist_total = build_dist(stats, precache, args.force)
+        print(f"dist/: {written} of {dist_total} files written.")
+
+    fonts_total = len(faces) + 1 if faces else 0
+    return rebuilt, 4 + 2 * len(nav_pages) + len(part_pages) + chunk_total + fonts_total
+
+
+def watch_paths():
+    """Files whose edits trigger a rebuild: list.md, the term list, the chapter files, the stylesheet.
+
+    The merged parts/partN.md and books.md are outputs of the build and are
+    not watched.
+    """
+    chapter_paths = [os.path.join(PARTS_DIR, f"{file_id}.md") for file_id, _ in nav_order(load_toc())]
+    return [LIST_MD, TERMS_MD, CSS_FILE] + chapter_paths
+
+
+def snapshot(paths):
+    """{path: (mtime_ns, size)}, None for missing files."""
+    state = {}
+    for path in paths:
+        try:
+            st = os.stat(path)
+            state[path] = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            state[path] = None
+    return state
+
+
+def watch(args, num_jobs):
+    """Rebuild whenever a watched file changes, until interrupted.
+
+    Saves are debounced: a rebuild starts once a poll sees no further change.
+    The build runs in this process, so the Markdown instance stays warm and
+    the incremental manifest limits the work to the affected pages.
+    """
+    paths = watch_paths()
+    state = snapshot(paths)
+    print(f"\nWatching {len(paths)} files for changes (Ctrl+C to stop)...")
+    try:
+        while True:
+            time.sleep(WATCH_INTERVAL)
+            current = snapshot(paths)
+            if current == state:
+                continue
+            while True:
+                time.sleep(WATCH_DEBOUNCE)
+                settled = snapshot(paths)
+                if settled == current:
+                    break
+                current = settled
+
+            changed = [p for p in paths if state.get(p) != current.get(p)]
+            saved_at = max((current[p][0] for p in changed if current[p]), default=None)
+            print(f"\nChanged: {', '.join(os.path.relpath(p, BASE_DIR) for p in changed)}")
+            stats = BuildStats("convert")
+            start = time.perf_counter()
+            try:
+                rebuilt, _ = build(args, num_jobs, stats)
+            except Exception:
+                traceback.print_exc()
+                print("Build failed; waiting for the next change.")
+            else:
+                elapsed = time.perf_counter() - start
+                render = next((s["wall_s"] for s in stats.stages if s["name"] == "render"), 0.0)
+                latency = f", {time.time() - saved_at / 1e9:.2f}s after save" if saved_at else ""
+                print(f"Rebuilt {rebuilt} file(s) in {elapsed * 1000:.0f} ms "
+                      f"(render {render * 1000:.0f} ms){latency}")
+            # The TOC may have gained or lost chapters
+            paths = watch_paths()
+            state = snapshot(paths)
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--force", action="store_true",
+                        help="ignore the build manifest and re-render every page")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="render chapters in N worker processes (0 = one per CPU)")
+    parser.add_argument("--report", nargs="?", const=default_report_path("convert"),
+                        metavar="PATH", help="write a JSON timing report "
+                        "(default: .build_cache/reports/convert-<time>.json)")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="write a cProfile dump of the build to PATH")
+    parser.add_argument("--dist", action="store_true",
+                        help="also write dist/: minified pages, hashed assets, .gz/.br siblings")
+    parser.add_argument("--watch", action="store_true",
+                        help="after building, rebuild affected pages whenever a source changes")
+    args = parser.parse_args(argv)
+    num_jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+
+    stats = BuildStats("convert", argv)
+    with profiled(args.profile):
+        rebuilt, total = build(args, num_jobs, stats)
+    print(f"\nDone! {rebuilt} of {total} files rebuilt.")
+    if args.report:
+        stats.save(args.report)
+
+    if args.watch:
+        args.force = False
+        watch(args, num_jobs)
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
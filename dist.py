@@ -0,0 +1,269 @@
+"""Deployable copy of the HTML edition in dist/ (convert.py --dist).
+
+contents/ and index.html stay readable (they are committed and reviewed as
+diffs); dist/ is what goes behind a CDN:
+
+- static assets (css/*.css, js/*.js, fonts/*) are copied to
+  dist/assets/<name>.<hash>.<ext> under a content hash, so they can be
+  served with immutable cache headers; dist/asset-manifest.json maps each
+  source path to its hashed name, and CSS url()s are rewritten to match
+- pages are rewritten to reference the hashed assets and minified
+  (whitespace inside <pre>, <textarea>, <script> and <style> is kept)
+- CSS is minified; every text file gets .gz and, with the brotli module,
+  .br siblings
+- sw.js (see offline.py) is regenerated with the dist/ names and revisions
+
+Outputs are keyed by their source content and the asset manifest in
+.build_cache/dist_manifest.json, so unchanged files are not rewritten.
+"""
+
+import glob
+import gzip
+import json
+import os
+import posixpath
+import re
+
+from buildcache import BASE_DIR, CACHE_DIR, content_hash, file_sha256, load_json, save_json
+from offline import SW_REL, service_worker
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DIST_DIR = os.path.join(BASE_DIR, "dist")
+ASSETS_REL = "assets"
+ASSET_MANIFEST_REL = "asset-manifest.json"
+DIST_MANIFEST_PATH = os.path.join(CACHE_DIR, "dist_manifest.json")
+
+# Bump when minification or the dist layout changes
+DIST_VERSION = "2"
+
+# Static assets, in dependency order: fonts before the CSS that references them
+ASSET_PATTERNS = ["fonts/*.woff2", "fonts/*.woff", "css/*.css", "js/*.js"]
+# Pages and data, copied to the same relative path
+PAGE_PATTERNS = ["index.html", "contents/*.html", "contents/chunks/*.html", "contents/search/*.json"]
+
+COMPRESSED_EXTS = (".html", ".css", ".js", ".json", ".svg")
+MIN_COMPRESS_SIZE = 512
+
+PRESERVE_RE = re.compile(r"(<(pre|textarea|script|style)\b.*?</\2>)", re.S | re.I)
+TAG_RE = re.compile(r"(<!--.*?-->|<[^>]+>)", re.S)
+TAG_NAME_RE = re.compile(r"</?([a-zA-Z][a-zA-Z0-9]*)")
+SPACE_RE = re.compile(r"\s+")
+# Whitespace next to these tags never renders
+BLOCK_TAGS = {
+    "html", "head", "body", "meta", "link", "title", "script", "style", "header", "nav",
+    "main", "footer", "section", "article", "div", "p", "h1", "h2", "h3", "h4", "h5", "h6",
+    "ul", "ol", "li", "table", "thead", "tbody", "tr", "th", "td", "pre", "blockquote",
+    "hr", "br", "form",
+}
+
+# Quoted strings, kept as written; comments are matched in the same pass so
+# a "/*" inside a string does not start one
+CSS_STRING_RE = re.compile(r"""("(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')""")
+CSS_COMMENT_RE = re.compile(CSS_STRING_RE.pattern + r"|/\*.*?\*/", re.S)
+CSS_PUNCT_RE = re.compile(r"\s*([{};,>])\s*")
+CSS_URL_RE = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+
+def _is_block(tag):
+    m = TAG_NAME_RE.match(tag)
+    return bool(m) and m.group(1).lower() in BLOCK_TAGS
+
+
+def _minify_markup(text):
+    """Collapse whitespace in markup without <pre>-like elements."""
+    tokens = TAG_RE.split(text)
+    out = []
+    for i, token in enumerate(tokens):
+        if i % 2:  # tag or comment
+            if not token.startswith("<!--"):
+                out.append(token)
+            continue
+        if not token:
+            continue
+        before = tokens[i - 1] if i > 0 else ""
+        after = tokens[i + 1] if i + 1 < len(tokens) else ""
+        token = SPACE_RE.sub(" ", token)
+        if not before or _is_block(before):
+            token = token.lstrip()
+        if not after or _is_block(after):
+            token = token.rstrip()
+        out.append(token)
+    return "".join(out)
+
+
+def minify_html(text):
+    """Minify a page, leaving <pre>, <textarea>, <script> and <style> content intact."""
+    parts = PRESERVE_RE.split(text)
+    out = []
+    # split() yields text, element, tag name, text, element, tag name, ...
+    for i in range(0, len(parts), 3):
+        out.append(_minify_markup(parts[i]))
+        if i + 1 < len(parts):
+            out.append(parts[i + 1])
+    return "".join(out)
+
+
+def _minify_css_code(text):
+    text = SPACE_RE.sub(" ", text)
+    text = CSS_PUNCT_RE.sub(r"\1", text)
+    return re.sub(r":\s+", ":", text)
+
+
+def minify_css(text):
+    """Minify a stylesheet, leaving quoted strings intact.
+
+    >>> minify_css('a::after { content: "a : b;  c" ; } /* x */')
+    'a::after{content:"a : b;  c"}'
+    >>> minify_css("p { content: '/* not a comment */' }")
+    "p{content:'/* not a comment */'}"
+    """
+    text = CSS_COMMENT_RE.sub(lambda m: m.group(1) or "", text)
+    # split() yields code, string, code, ...
+    tokens = CSS_STRING_RE.split(text)
+    out = [token if i % 2 else _minify_css_code(token) for i, token in enumerate(tokens)]
+    return "".join(out).replace(";}", "}").strip()
+
+
+def hashed_rel(rel, data):
+    """assets/<name>.<hash>.<ext> for an asset with the given content."""
+    stem, ext = os.path.splitext(posixpath.basename(rel))
+    return f"{ASSETS_REL}/{stem}.{content_hash(data)[:10]}{ext}"
+
+
+def rewrite_css_urls(css, rel, asset_map):
+    """Point url()s in the CSS at rel to the hashed assets (all in assets/)."""
+    def replace(m):
+        target = posixpath.normpath(posixpath.join(posixpath.dirname(rel), m.group(2)))
+        if target not in asset_map:
+            return m.group(0)
+        return f"url({posixpath.basename(asset_map[target])})"
+    return CSS_URL_RE.sub(replace, css)
+
+
+def rewrite_page_refs(html, rel, asset_map):
+    """Point href/src attributes of the page at rel to the hashed assets."""
+    page_dir = posixpath.dirname(rel)
+
+    def replace(m):
+        target = posixpath.normpath(posixpath.join(page_dir, m.group(3)))
+        if target not in asset_map:
+            return m.group(0)
+        return f'{m.group(1)}="{posixpath.relpath(asset_map[target], page_dir or ".")}"'
+    return re.sub(r'\b(href|src)=(")([^"#?]+)"', replace, html)
+
+
+def _compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def write_file(rel, data):
+    """Write dist/rel and its compressed siblings. Returns bytes written."""
+    path = os.path.join(DIST_DIR, *rel.split("/"))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    written = len(data)
+    encodings = {"gzip": ".gz", "br": ".br"} if brotli else {"gzip": ".gz"}
+    for encoding, suffix in encodings.items():
+        sibling = path + suffix
+        packed = _compress(data, encoding) if rel.endswith(COMPRESSED_EXTS) else None
+        if packed is not None and len(data) >= MIN_COMPRESS_SIZE and len(packed) < len(data):
+            with open(sibling, "wb") as f:
+                f.write(packed)
+            written += len(packed)
+        elif os.path.exists(sibling):
+            os.remove(sibling)
+    return written
+
+
+def remove_file(rel):
+    path = os.path.join(DIST_DIR, *rel.split("/"))
+    for p in (path, path + ".gz", path + ".br"):
+        if os.path.exists(p):
+            os.remove(p)
+
+
+def _sources(patterns):
+    rels = []
+    for pattern in patterns:
+        rels += sorted(os.path.relpath(p, BASE_DIR).replace(os.sep, "/")
+                       for p in glob.glob(os.path.join(BASE_DIR, pattern)))
+    return rels
+
+
+def build_dist(stats, precache, force=False):
+    """Update dist/ from the current build output. Returns (files written, total files).
+
+    precache lists the source paths the service worker precaches.
+    """
+    previous = load_json(DIST_MANIFEST_PATH)
+    manifest = {} if force else previous
+    current = {}
+    written = 0
+
+    # 1. Hashed assets; a hashed name already in dist/ is up to date by construction
+    asset_map = {}
+    for rel in _sources(ASSET_PATTERNS):
+        with open(os.path.join(BASE_DIR, rel), "rb") as f:
+            data = f.read()
+        if rel.endswith(".css"):
+            css = rewrite_css_urls(data.decode("utf-8"), rel, asset_map)
+            data = minify_css(css).encode("utf-8")
+        out_rel = hashed_rel(rel, data)
+        asset_map[rel] = out_rel
+        current[out_rel] = out_rel
+        if force or manifest.get(out_rel) != out_rel or not os.path.exists(os.path.join(DIST_DIR, out_rel)):
+            with stats.file(out_rel) as f:
+                f["bytes_read"] = len(data)
+                f["bytes_written"] = write_file(out_rel, data)
+            print(f"Created: dist/{out_rel}")
+            written += 1
+
+    asset_json = json.dumps(asset_map, indent=2, sort_keys=True) + "\n"
+    current[ASSET_MANIFEST_REL] = content_hash(asset_json)
+    if force or manifest.get(ASSET_MANIFEST_REL) != current[ASSET_MANIFEST_REL]:
+        write_file(ASSET_MANIFEST_REL, asset_json.encode("utf-8"))
+        written += 1
+
+    # 2. Pages (rewritten and minified) and search data (copied)
+    for rel in _sources(PAGE_PATTERNS):
+        with open(os.path.join(BASE_DIR, rel), "rb") as f:
+            data = f.read()
+        key = content_hash(DIST_VERSION, data, asset_json if rel.endswith(".html") else "")
+        current[rel] = key
+        if not force and manifest.get(rel) == key and os.path.exists(os.path.join(DIST_DIR, rel)):
+            continue
+        with stats.file(f"dist/{rel}") as f:
+            f["bytes_read"] = len(data)
+            if rel.endswith(".html"):
+                html = rewrite_page_refs(data.decode("utf-8"), rel, asset_map)
+                data = minify_html(html).encode("utf-8")
+            f["bytes_written"] = write_file(rel, data)
+        print(f"Created: dist/{rel}")
+        written += 1
+
+    # 3. Service worker over the dist/ names and contents
+    entries = []
+    for rel in precache:
+        out_rel = asset_map.get(rel, rel)
+        entries.append((out_rel, file_sha256(os.path.join(DIST_DIR, *out_rel.split("/")))[:16]))
+    sw = service_worker(entries)
+    current[SW_REL] = content_hash(sw)
+    if force or manifest.get(SW_REL) != current[SW_REL] or not os.path.exists(os.path.join(DIST_DIR, SW_REL)):
+        write_file(SW_REL, sw.encode("utf-8"))
+        print(f"Created: dist/{SW_REL}")
+        written += 1
+
+    # 4. Drop outputs whose source is gone and superseded asset versions
+    for rel in previous:
+        if rel not in current:
+            remove_file(rel)
+
+    save_json(DIST_MANIFEST_PATH, current)
+    return written, len(current)
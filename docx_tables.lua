@@ -0,0 +1,33 @@
+-- pandoc filter used by build_docx.py: equal column widths for every table.
+--
+-- Once a table has relative column widths, pandoc's docx writer gives it
+-- a fixed layout with a column grid of those fractions of its own text
+-- width, instead of an autofit table. build_docx.py passes the B5 text
+-- width as metadata (-M table_width=<PAGE_CONTENT_WIDTH>); the fractions
+-- here make the grid add up to it. pandoc still writes the table width
+-- as a percentage, which build_docx.py replaces with the same absolute
+-- width after conversion (add_front_matter). Borders, cell margins and
+-- the header row's border and shading come from the reference doc's
+-- Table style (build_docx.py, _update_table_style).
+
+-- Text width (twips) pandoc's docx writer scales relative column widths
+-- to; fixed in the writer, it does not read the reference doc's margins.
+local PANDOC_TEXT_WIDTH = 7920
+
+function Pandoc(doc)
+  local width = tonumber(pandoc.utils.stringify(doc.meta.table_width or ""))
+  if not width then
+    error("docx_tables.lua: pass the text width in twips with -M table_width=N")
+  end
+  -- Only an option for this filter; not a document property
+  doc.meta.table_width = nil
+  return doc:walk {
+    Table = function(tbl)
+      local n = #tbl.colspecs
+      for i, spec in ipairs(tbl.colspecs) do
+        tbl.colspecs[i] = {spec[1], width / PANDOC_TEXT_WIDTH / n}
+      end
+      return tbl
+    end
+  }
+end
@@ -0,0 +1,755 @@
+"""Native DOCX writer for the book's Markdown subset (build_docx.py --writer native).
+
+pandoc is a general converter, but the book only uses ATX headings,
+paragraphs, pipe tables, fenced code, block quotes, lists and horizontal
+rules, with code spans, bold/italic, links and smart punctuation inline.
+render() parses that subset and writes the WordprocessingML body directly,
+with the structure pandoc's docx writer gives it: the same paragraph and
+character styles, heading bookmarks, list numbering and code token
+styles, so the reference doc applies unchanged. It follows pandoc's
+Markdown rules where the book depends on them (a heading needs a blank
+line before it, a fence ends a paragraph, raw inline HTML is dropped).
+
+Differences from pandoc that do not change the printed page:
+- adjacent text with the same formatting is one run, not one per word;
+- code is tokenized by Pygments instead of skylighting and mapped to the
+  same token styles, so the split into tokens may differ;
+- tables carry their layout on each table and cell (table_parts())
+  rather than in the Table style and pandoc's fixed-width grid.
+"""
+
+import hashlib
+import html
+import os
+import re
+from collections import namedtuple
+
+from buildcache import CACHE_DIR, content_hash, load_json, save_json
+
+# The lexers are imported on the first highlighted block
+try:
+    import pygments
+    from pygments import token as pygments_token
+except ImportError:
+    pygments = None
+
+# ============================================================
+# Blocks
+# ============================================================
+Heading = namedtuple("Heading", ["level", "text"])
+# plain: a tight list item's paragraph (pandoc's Plain, style Compact)
+Para = namedtuple("Para", ["text", "plain"])
+Code = namedtuple("Code", ["lang", "code"])
+Table = namedtuple("Table", ["aligns", "header", "rows"])
+Quote = namedtuple("Quote", ["blocks"])
+# items: one block list per item
+ListBlock = namedtuple("ListBlock", ["ordered", "start", "items"])
+Rule = namedtuple("Rule", [])
+
+ATX_RE = re.compile(r"^ {0,3}(#{1,6})(?:[ \t]+(.*?))?(?:[ \t]+#+)?[ \t]*$")
+FENCE_RE = re.compile(r"^( {0,3})(`{3,}|~{3,})[ \t]*\{?\.?([\w+#-]*)")
+RULE_RE = re.compile(r"^ {0,3}([-*_])(?:[ \t]*\1){2,}[ \t]*$")
+LIST_RE = re.compile(r"^( *)([-*+]|(\d+)\.)(?:( +)(.*))?$")
+TABLE_SEP_RE = re.compile(r"^ {0,3}\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?\s*$")
+QUOTE_RE = re.compile(r"^ {0,3}> ?")
+
+
+def _indent(line):
+    return len(line) - len(line.lstrip(" "))
+
+
+def _is_blank(line):
+    return not line.strip()
+
+
+def parse_blocks(lines, in_list=False):
+    """Parse Markdown lines (no newlines) into a list of blocks.
+
+    in_list: the lines are a list item's content, where a list marker ends
+    a paragraph and a paragraph not followed by a blank line is Plain.
+    """
+    blocks = []
+    i, n = 0, len(lines)
+    while i < n:
+        line = lines[i]
+        if _is_blank(line):
+            i += 1
+            continue
+
+        m = FENCE_RE.match(line)
+        if m:
+            i, block = _parse_fence(lines, i, m)
+            blocks.append(block)
+            continue
+        m = ATX_RE.match(line)
+        if m:
+            blocks.append(Heading(len(m.group(1)), m.group(2) or ""))
+            i += 1
+            continue
+        if RULE_RE.match(line):
+            blocks.append(Rule())
+            i += 1
+            continue
+        if "|" in line and i + 1 < n and TABLE_SEP_RE.match(lines[i + 1]) and "-" in lines[i + 1]:
+            i, block = _parse_table(lines, i)
+            blocks.append(block)
+            continue
+        if QUOTE_RE.match(line):
+            i, block = _parse_quote(lines, i)
+            blocks.append(block)
+            continue
+        m = LIST_RE.match(line)
+        if m and (m.group(5) or "").strip():
+            i, block = _parse_list(lines, i)
+            blocks.append(block)
+            continue
+
+        # Paragraph: up to a blank line or a fence (or, in a list item, a nested list)
+        start = i
+        i += 1
+        while i < n and not _is_blank(lines[i]) and not FENCE_RE.match(lines[i]):
+            if in_list and LIST_RE.match(lines[i]) and (LIST_RE.match(lines[i]).group(5) or "").strip():
+                break
+            i += 1
+        plain = in_list and (i == n or (not _is_blank(lines[i]) and not FENCE_RE.match(lines[i])))
+        blocks.append(Para("\n".join(l.strip() for l in lines[start:i]), plain))
+    return blocks
+
+
+def _parse_fence(lines, i, m):
+    indent, fence, lang = len(m.group(1)), m.group(2), m.group(3)
+    code = []
+    i += 1
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+        if stripped.startswith(fence[0] * len(fence)) and not stripped.strip(fence[0]):
+            i += 1
+            break
+        # Content is dedented by the fence's own indentation
+        code.append(line[min(indent, _indent(line)):])
+        i += 1
+    # pandoc drops trailing blank lines
+    while code and _is_blank(code[-1]):
+        code.pop()
+    return i, Code(lang.lower(), "\n".join(code))
+
+
+def split_cells(row):
+    """Cells of a pipe table row; a backslash-escaped | stays in its cell."""
+    row = row.strip()
+    if row.startswith("|"):
+        row = row[1:]
+    if row.endswith("|") and not row.endswith("\\|"):
+        row = row[:-1]
+    return [cell.strip().replace("\\|", "|") for cell in re.split(r"(?<!\\)\|", row)]
+
+
+def _parse_table(lines, i):
+    header = split_cells(lines[i])
+    aligns = []
+    for sep in split_cells(lines[i + 1]):
+        left, right = sep.startswith(":"), sep.endswith(":")
+        aligns.append("center" if left and right else "right" if right else "left" if left else None)
+    rows = []
+    i += 2
+    while i < len(lines) and not _is_blank(lines[i]) and "|" in lines[i]:
+        cells = split_cells(lines[i])
+        rows.append((cells + [""] * len(header))[:len(header)])
+        i += 1
+    return i, Table(aligns[:len(header)], header, rows)
+
+
+def _parse_quote(lines, i):
+    content = []
+    while i < len(lines) and not _is_blank(lines[i]):
+        m = QUOTE_RE.match(lines[i])
+        content.append(lines[i][m.end():] if m else lines[i])  # lazy continuation
+        i += 1
+        # A blank line continues the quote only if the next line is quoted again
+        while (i + 1 < len(lines) and _is_blank(lines[i]) and QUOTE_RE.match(lines[i + 1])):
+            content.append("")
+            i += 1
+    return i, Quote(parse_blocks(content))
+
+
+def _parse_list(lines, i):
+    first = LIST_RE.match(lines[i])
+    base = len(first.group(1))
+    ordered = first.group(3) is not None
+    start = int(first.group(3)) if ordered else 1
+    items = []
+    n = len(lines)
+    while i < n:
+        m = LIST_RE.match(lines[i])
+        if (not m or len(m.group(1)) != base or (m.group(3) is not None) != ordered
+                or not (m.group(5) or "").strip()):
+            break
+        spaces = len(m.group(4))
+        content_col = base + len(m.group(2)) + (spaces if spaces <= 4 else 1)
+        item = [lines[i][content_col:] if spaces <= 4 else m.group(5)]
+        i += 1
+        while i < n:
+            line = lines[i]
+            if _is_blank(line):
+                item.append("")
+                i += 1
+                continue
+            indent = _indent(line)
+            after_blank = item[-1] == ""
+            if after_blank and indent < content_col and indent <= base:
+                break
+            if not after_blank and indent <= base and (LIST_RE.match(line) or FENCE_RE.match(line)):
+                break
+            item.append(line[min(indent, content_col):])
+            i += 1
+        items.append(item)
+
+    # A blank line after the last item makes it a Para, as in pandoc (see _compactify)
+    parsed = [parse_blocks(item, in_list=True) for item in items]
+    _compactify(parsed)
+    return i, ListBlock(ordered, start, parsed)
+
+
+def _compactify(items):
+    """pandoc's rule: a final Para that is the only Para in the list becomes Plain."""
+    paras = [b for blocks in items for b in blocks if isinstance(b, Para) and not b.plain]
+    if len(paras) == 1 and items[-1] and items[-1][-1] is paras[0]:
+        items[-1][-1] = paras[0]._replace(plain=True)
+
+
+# ============================================================
+# Inlines
+# ============================================================
+# Text runs: (text, bold, italic, code, link target or None)
+Run = namedtuple("Run", ["text", "bold", "italic", "code", "link"])
+
+INLINE_RE = re.compile(r"""
+    (?P<code>`+)
+  | (?P<escape>\\[!-/:-@\[-`{-~])
+  | (?P<html><!--.*?-->|</?[A-Za-z][A-Za-z0-9-]*(?:\s+[A-Za-z_:][-\w:.]*
+        (?:\s*=\s*(?:"[^"]*"|'[^']*'|[^\s"'=<>`]+))?)*\s*/?>)
+  | (?P<link>\[)
+  | (?P<delim>\*{1,3})
+  | (?P<quote>["'])
+""", re.X | re.S)
+LINK_TARGET_RE = re.compile(r"\(\s*<?([^)\s>]*)>?(?:\s+\"[^\"]*\")?\s*\)")
+SMART_DASHES = [("---", "—"), ("--", "–"), ("...", "…")]
+SPACE_RE = re.compile(r"[ \t\n]+")
+
+
+def _smart(text):
+    for src, dst in SMART_DASHES:
+        text = text.replace(src, dst)
+    return SPACE_RE.sub(" ", text)
+
+
+def _tokens(text):
+    """Split inline text into text, code, link and delimiter tokens."""
+    tokens = []
+    pos = 0
+
+    def add_text(s):
+        if s:
+            tokens.append(["text", _smart(s)])
+
+    while True:
+        m = INLINE_RE.search(text, pos)
+        if m is None:
+            add_text(text[pos:])
+            return tokens
+        add_text(text[pos:m.start()])
+        pos = m.end()
+        kind = m.lastgroup
+        if kind == "code":
+            close = re.compile(r"(?<!`)" + m.group() + r"(?!`)").search(text, pos)
+            if close is None:
+                add_text(m.group())
+                continue
+            tokens.append(["code", SPACE_RE.sub(" ", text[pos:close.start()]).strip()])
+            pos = close.end()
+        elif kind == "escape":
+            tokens.append(["text", m.group()[1]])
+        elif kind == "html":
+            pass  # raw HTML has no DOCX rendering; pandoc drops it too
+        elif kind == "link":
+            end = _closing_bracket(text, pos)
+            target = LINK_TARGET_RE.match(text, end + 1) if end >= 0 else None
+            if target is None:
+                add_text("[")
+                continue
+            tokens.append(["link", target.group(1), _tokens(text[pos:end])])
+            pos = target.end()
+        elif kind == "delim":
+            before = text[m.start() - 1] if m.start() else " "
+            after = text[pos] if pos < len(text) else " "
+            tokens.append(["delim", len(m.group()), not after.isspace(), not before.isspace()])
+        else:
+            before = text[m.start() - 1] if m.start() else " "
+            after = text[pos] if pos < len(text) else " "
+            if m.group() == '"':
+                tokens.append(["quote", '"', not after.isspace(), True])
+            else:
+                tokens.append(["quote", "'", not before.isalnum() and not after.isspace(),
+                               not after.isalnum()])
+
+
+def _closing_bracket(text, pos):
+    depth = 1
+    while pos < len(text):
+        c = text[pos]
+        if c == "\\":
+            pos += 2
+            continue
+        if c == "`":
+            run = re.match(r"`+", text[pos:]).group()
+            close = text.find(run, pos + len(run))
+            pos = close + len(run) if close >= 0 else pos + len(run)
+            continue
+        if c == "[":
+            depth += 1
+        elif c == "]":
+            depth -= 1
+            if depth == 0:
+                return pos
+        pos += 1
+    return -1
+
+
+QUOTE_MARKS = {'"': ("“", "”"), "'": ("‘", "’")}
+
+
+def _nest(tokens):
+    """Match emphasis delimiters and quotes into nested nodes.
+
+    Nodes: ("text", s), ("code", s), ("link", url, children),
+    ("emph", n, children) with n = 1 (italic), 2 (bold) or 3 (both),
+    ("quoted", mark, children).
+    """
+    out = []  # nodes, and openers: ("open", kind, value, index in out)
+    for token in tokens:
+        kind = token[0]
+        if kind == "text" or kind == "code":
+            out.append(tuple(token))
+        elif kind == "link":
+            out.append(("link", token[1], _nest(token[2])))
+        else:
+            value, can_open, can_close = token[1], token[2], token[3]
+            opener = None
+            if can_close:
+                for j in range(len(out) - 1, -1, -1):
+                    if out[j][0] == "open" and out[j][1] == kind and out[j][2] == value:
+                        opener = j
+                        break
+            if opener is not None:
+                children = _close_openers(out[opener + 1:])
+                del out[opener:]
+                out.append(("emph" if kind == "delim" else "quoted", value, children))
+            elif can_open:
+                out.append(("open", kind, value))
+            elif kind == "delim":
+                out.append(("text", "*" * value))
+            else:
+                out.append(("text", QUOTE_MARKS[value][1] if value == "'" else value))
+    return _close_openers(out)
+
+
+def _close_openers(nodes):
+    """Unmatched openers become literal text."""
+    result = []
+    for node in nodes:
+        if node[0] == "open":
+            if node[1] == "delim":
+                result.append(("text", "*" * node[2]))
+            else:
+                result.append(("text", QUOTE_MARKS["'"][1] if node[2] == "'" else node[2]))
+        else:
+            result.append(node)
+    return result
+
+
+def inline_runs(text):
+    """Runs of one paragraph's (or heading's, cell's) inline Markdown."""
+    runs = []
+
+    def walk(nodes, bold, italic, link):
+        for node in nodes:
+            kind = node[0]
+            if kind == "text":
+                runs.append(Run(node[1], bold, italic, False, link))
+            elif kind == "code":
+                runs.append(Run(node[1], bold, italic, True, link))
+            elif kind == "link":
+                walk(node[2], bold, italic, node[1])
+            elif kind == "emph":
+                walk(node[2], bold or node[1] >= 2, italic or node[1] != 2, link)
+            else:
+                open_mark, close_mark = QUOTE_MARKS[node[1]]
+                runs.append(Run(open_mark, bold, italic, False, link))
+                walk(node[2], bold, italic, link)
+                runs.append(Run(close_mark, bold, italic, False, link))
+
+    walk(_nest(_tokens(text.strip())), False, False, None)
+    # Merge neighbours with the same formatting; trim the paragraph's ends
+    merged = []
+    for run in runs:
+        if merged and merged[-1][1:] == run[1:]:
+            merged[-1] = merged[-1]._replace(text=merged[-1].text + run.text)
+        elif run.text:
+            merged.append(run)
+    if merged and not merged[0].code:
+        merged[0] = merged[0]._replace(text=merged[0].text.lstrip())
+    if merged and not merged[-1].code:
+        merged[-1] = merged[-1]._replace(text=merged[-1].text.rstrip())
+    return [run for run in merged if run.text]
+
+
+def plain_text(text):
+    """Inline Markdown without formatting (for heading identifiers)."""
+    return "".join(run.text for run in inline_runs(text))
+
+
+# ============================================================
+# Code highlighting
+# ============================================================
+# pandoc's tango highlight style: token style -> (colour, bold, italic)
+TOKEN_STYLES = {
+    "KeywordTok": ("204a87", True, False), "DataTypeTok": ("204a87", False, False),
+    "DecValTok": ("0000cf", False, False), "BaseNTok": ("0000cf", False, False),
+    "FloatTok": ("0000cf", False, False), "ConstantTok": ("8f5902", False, False),
+    "CharTok": ("4e9a06", False, False), "SpecialCharTok": ("ce5c00", True, False),
+    "StringTok": ("4e9a06", False, False), "VerbatimStringTok": ("4e9a06", False, False),
+    "SpecialStringTok": ("4e9a06", False, False), "ImportTok": (None, False, False),
+    "CommentTok": ("8f5902", False, True), "DocumentationTok": ("8f5902", True, True),
+    "AnnotationTok": ("8f5902", True, True), "CommentVarTok": ("8f5902", True, True),
+    "OtherTok": ("8f5902", False, False), "FunctionTok": ("204a87", True, False),
+    "VariableTok": ("000000", False, False), "ControlFlowTok": ("204a87", True, False),
+    "OperatorTok": ("ce5c00", True, False), "BuiltInTok": (None, False, False),
+    "ExtensionTok": (None, False, False), "PreprocessorTok": ("8f5902", False, True),
+    "AttributeTok": ("204a87", False, False), "RegionMarkerTok": (None, False, False),
+    "InformationTok": ("8f5902", True, True), "WarningTok": ("8f5902", True, True),
+    "AlertTok": ("ef2929", False, False), "ErrorTok": ("a40000", True, False),
+    "NormalTok": (None, False, False),
+}
+TOKEN_BACKGROUND = "f8f8f8"
+
+# Pygments token type (by name, most specific first) -> token style
+PYGMENTS_STYLES = {
+    "Keyword.Type": "DataTypeTok", "Keyword.Namespace": "ImportTok", "Keyword": "KeywordTok",
+    "Name.Function": "FunctionTok", "Name.Decorator": "AttributeTok", "Name.Attribute": "AttributeTok",
+    "Name.Builtin": "BuiltInTok", "Name.Constant": "ConstantTok", "Name.Variable": "VariableTok",
+    "Name.Tag": "KeywordTok", "Name.Exception": "NormalTok", "Name": "NormalTok",
+    "Literal.String.Char": "CharTok", "Literal.String.Escape": "SpecialCharTok",
+    "Literal.String.Doc": "DocumentationTok", "Literal.String.Interpol": "SpecialStringTok",
+    "Literal.String": "StringTok", "Literal.Number.Float": "FloatTok",
+    "Literal.Number.Hex": "BaseNTok", "Literal.Number.Bin": "BaseNTok", "Literal.Number.Oct": "BaseNTok",
+    "Literal.Number": "DecValTok", "Literal": "ConstantTok",
+    "Operator.Word": "KeywordTok", "Operator": "OperatorTok", "Punctuation": "OperatorTok",
+    "Comment.Preproc": "PreprocessorTok", "Comment.PreprocFile": "PreprocessorTok",
+    "Comment": "CommentTok", "Error": "ErrorTok",
+}
+# Keywords skylighting styles as control flow
+CONTROL_FLOW = frozenset("break case catch continue default do else finally for if return switch "
+                         "throw try when while yield".split())
+CALLABLE_NAMES = frozenset([pygments_token.Name, pygments_token.Name.Attribute, pygments_token.Name.Other]
+                           if pygments is not None else [])
+# Fence languages whose Pygments name differs
+LEXER_ALIASES = {"dockerfile": "docker", "properties": "properties", "promql": None}
+
+# Highlighted code paragraphs, by content hash; bump CODE_VERSION when
+# code_lines() or the run markup changes
+CODE_CACHE_PATH = os.path.join(CACHE_DIR, "docx_code.json")
+CODE_VERSION = "1"
+CODE_KEY = content_hash(CODE_VERSION, pygments.__version__ if pygments else "none")
+
+_lexers = {}
+_styles = {}  # Pygments token type -> token style
+
+
+def _token_style(ttype, value):
+    style = _styles.get(ttype)
+    if style is None:
+        parent = ttype
+        while parent is not None and str(parent)[6:] not in PYGMENTS_STYLES:  # "Token.Keyword" -> "Keyword"
+            parent = parent.parent
+        style = _styles[ttype] = PYGMENTS_STYLES[str(parent)[6:]] if parent is not None else "NormalTok"
+    if style == "KeywordTok" and value in CONTROL_FLOW:
+        return "ControlFlowTok"
+    return style
+
+
+def _lexer(lang):
+    if lang not in _lexers:
+        lexer = None
+        name = LEXER_ALIASES.get(lang, lang)
+        if pygments is not None and name:
+            from pygments.lexers import get_lexer_by_name
+            from pygments.util import ClassNotFound
+            try:
+                lexer = get_lexer_by_name(name, stripnl=False, ensurenl=False)
+            except ClassNotFound:
+                pass
+        _lexers[lang] = lexer
+    return _lexers[lang]
+
+
+def code_lines(lang, code):
+    """[[(token style or None, text)]] per line; None: no highlighting (VerbatimChar)."""
+    lexer = _lexer(lang) if lang else None
+    if lexer is None:
+        return [[(None, line)] if line else [] for line in code.split("\n")]
+    lines = [[]]
+    tokens = list(lexer.get_tokens(code))
+    for k, (ttype, value) in enumerate(tokens):
+        style = _token_style(ttype, value)
+        # skylighting marks calls (a name before "(") as functions
+        if ttype in CALLABLE_NAMES and k + 1 < len(tokens) and tokens[k + 1][1].startswith("("):
+            style = "FunctionTok"
+        for j, part in enumerate(value.split("\n")):
+            if j:
+                lines.append([])
+            if part:
+                line = lines[-1]
+                if line and line[-1][0] == style:
+                    line[-1] = (style, line[-1][1] + part)
+                else:
+                    line.append((style, part))
+    return lines
+
+
+def token_styles_xml():
+    """Character style definitions for the token styles (pandoc adds them to styles.xml)."""
+    styles = []
+    for name, (color, bold, italic) in TOKEN_STYLES.items():
+        props = ("<w:b />" if bold else "") + ("<w:i />" if italic else "")
+        props += f'<w:color w:val="{color}" />' if color else ""
+        styles.append(f'<w:style w:type="character" w:customStyle="1" w:styleId="{name}">'
+                      f'<w:name w:val="{name}" /><w:basedOn w:val="VerbatimChar" />'
+                      f'<w:rPr>{props}<w:shd w:val="clear" w:fill="{TOKEN_BACKGROUND}" /></w:rPr></w:style>')
+    return "".join(styles)
+
+
+# ============================================================
+# Numbering
+# ============================================================
+# pandoc's abstract numbering ids: list continuation paragraphs, bullets,
+# and decimal lists (one per start number)
+CONTINUATION_ABSTRACT = 990
+BULLET_ABSTRACT = 991
+CONTINUATION_NUM = 1000
+BULLET_MARKS = [("", "Symbol"), ("o", "Courier New"), ("", "Wingdings")]
+
+
+def _level(ilvl, body):
+    return (f'<w:lvl w:ilvl="{ilvl}">{body}<w:lvlJc w:val="left" />'
+            f'<w:pPr><w:ind w:left="{720 * (ilvl + 1)}" w:hanging="360" /></w:pPr>')
+
+
+def _abstract(abstract_id, levels):
+    return (f'<w:abstractNum w:abstractNumId="{abstract_id}"><w:nsid w:val="{"A" + str(abstract_id):0>8}" />'
+            f'<w:multiLevelType w:val="multilevel" />{"".join(levels)}</w:abstractNum>')
+
+
+def numbering_xml(lists):
+    """numbering.xml for [(numId, ordered, start)] in document order."""
+    abstracts = {CONTINUATION_ABSTRACT: _abstract(CONTINUATION_ABSTRACT, [
+        _level(i, '<w:numFmt w:val="bullet" /><w:lvlText w:val=" " />') + "</w:lvl>" for i in range(9)])}
+    nums = [f'<w:num w:numId="{CONTINUATION_NUM}"><w:abstractNumId w:val="{CONTINUATION_ABSTRACT}" /></w:num>']
+    for num_id, ordered, start in lists:
+        if ordered:
+            abstract_id = int(f"9941{start}")
+            abstracts.setdefault(abstract_id, _abstract(abstract_id, [
+                _level(i, f'<w:start w:val="{start}" /><w:numFmt w:val="decimal" />'
+                          f'<w:lvlText w:val="%{i + 1}." />') + "</w:lvl>" for i in range(9)]))
+            overrides = "".join(f'<w:lvlOverride w:ilvl="{i}"><w:startOverride w:val="{start}" />'
+                                f'</w:lvlOverride>' for i in range(9))
+        else:
+            abstract_id = BULLET_ABSTRACT
+            abstracts.setdefault(abstract_id, _abstract(abstract_id, [
+                _level(i, f'<w:numFmt w:val="bullet" /><w:lvlText w:val="{mark}" />')
+                + f'<w:rPr><w:rFonts w:ascii="{font}" w:hAnsi="{font}" w:cs="{font}" w:hint="default" />'
+                  f'</w:rPr></w:lvl>'
+                for i, (mark, font) in enumerate(BULLET_MARKS * 3)]))
+            overrides = ""
+        nums.append(f'<w:num w:numId="{num_id}"><w:abstractNumId w:val="{abstract_id}" />{overrides}</w:num>')
+    return ('<?xml version="1.0" encoding="UTF-8"?><w:numbering xmlns:w="http://schemas.openxmlformats.org/'
+            f'wordprocessingml/2006/main">{"".join(abstracts.values())}{"".join(nums)}</w:numbering>').encode("utf-8")
+
+
+# ============================================================
+# Body
+# ============================================================
+HR_XML = ('<w:p><w:r><w:pict><v:rect style="width:0;height:1.5pt" o:hralign="center" '
+          'o:hrstd="t" o:hr="t" /></w:pict></w:r></w:p>')
+# Longest bookmark name pandoc keeps; longer identifiers are hashed
+MAX_BOOKMARK = 40
+
+Rendered = namedtuple("Rendered", ["body", "lists", "links"])
+
+
+def heading_id(text, used):
+    """pandoc's auto identifier for a heading, unique within used."""
+    ident = "-".join("".join(c for c in plain_text(text).lower()
+                             if c.isalnum() or c in "_-. " or c.isspace()).split())
+    ident = ident[next((k for k, c in enumerate(ident) if c.isalpha()), len(ident)):] or "section"
+    base, k = ident, 0
+    while ident in used:
+        k += 1
+        ident = f"{base}-{k}"
+    used.add(ident)
+    return ident
+
+
+class _Writer:
+    def __init__(self, table_parts, code_cache):
+        self.table_parts = table_parts
+        self.code_cache = code_cache
+        self.code_added = 0
+        self.out = []
+        self.first_para = False
+        self.sections = []  # open heading bookmarks: (level, id)
+        self.bookmark_id = 0
+        self.ids = set()
+        self.lists = []  # (numId, ordered, start)
+        self.links = {}  # url -> relationship index
+
+    # --- inlines ---
+    def runs(self, runs, extra_style=None):
+        out = []
+        k = 0
+        while k < len(runs):
+            link = runs[k].link
+            j = k
+            while j < len(runs) and runs[j].link == link:
+                j += 1
+            xml = "".join(self.run(run, extra_style) for run in runs[k:j])
+            if link is not None:
+                index = self.links.setdefault(link, len(self.links))
+                xml = f'<w:hyperlink r:id="{link_rid(index)}">{xml}</w:hyperlink>'
+            out.append(xml)
+            k = j
+        return "".join(out)
+
+    @staticmethod
+    def run(run, extra_style=None):
+        props = ""
+        style = "VerbatimChar" if run.code else ("Hyperlink" if run.link is not None else extra_style)
+        if style:
+            props += f'<w:rStyle w:val="{style}" />'
+        if run.bold:
+            props += "<w:b /><w:bCs />"
+        if run.italic:
+            props += "<w:i /><w:iCs />"
+        props = f"<w:rPr>{props}</w:rPr>" if props else ""
+        return f'<w:r>{props}<w:t xml:space="preserve">{html.escape(run.text, quote=False)}</w:t></w:r>'
+
+    # --- blocks ---
+    def blocks(self, blocks, style=None, numbering=None):
+        """style: paragraph style of every Para (BlockText in quotes);
+        numbering: (numId, ilvl) for the first block of a list item."""
+        for block in blocks:
+            if isinstance(block, Heading):
+                self.heading(block)
+            elif isinstance(block, Para):
+                self.para(block, style, numbering)
+            elif isinstance(block, Code):
+                self.code(block, numbering)
+            elif isinstance(block, Table):
+                self.table(block)
+            elif isinstance(block, Quote):
+                self.blocks(block.blocks, "BlockText", numbering)
+                self.first_para = True
+            elif isinstance(block, ListBlock):
+                self.list(block, 0 if numbering is None else numbering[1] + 1)
+            else:
+                self.out.append(HR_XML)
+                self.first_para = True
+            if numbering is not None:
+                numbering = (CONTINUATION_NUM, numbering[1])
+
+    def ppr(self, style, numbering, extra=""):
+        props = f'<w:pStyle w:val="{style}" />' if style else ""
+        if numbering is not None:
+            props += f'<w:numPr><w:ilvl w:val="{numbering[1]}" /><w:numId w:val="{numbering[0]}" /></w:numPr>'
+        props += extra
+        return f"<w:pPr>{props}</w:pPr>" if props else ""
+
+    def heading(self, block):
+        while self.sections and self.sections[-1][0] >= block.level:
+            self.out.append(f'<w:bookmarkEnd w:id="{self.sections.pop()[1]}" />')
+        name = heading_id(block.text, self.ids)
+        if len(name) > MAX_BOOKMARK:
+            name = "X" + hashlib.sha1(name.encode("utf-8")).hexdigest()[1:MAX_BOOKMARK]
+        self.bookmark_id += 1
+        self.sections.append((block.level, self.bookmark_id))
+        self.out.append(f'<w:bookmarkStart w:id="{self.bookmark_id}" w:name="{html.escape(name)}" />'
+                        f'<w:p>{self.ppr(f"Heading{block.level}", None)}'
+                        f'{self.runs(inline_runs(block.text))}</w:p>')
+        self.first_para = True
+
+    def para(self, block, style, numbering):
+        if numbering is not None:
+            style = "Compact" if block.plain else None
+        elif style is None:
+            style = "FirstParagraph" if self.first_para else "BodyText"
+        self.out.append(f"<w:p>{self.ppr(style, numbering)}{self.runs(inline_runs(block.text))}</w:p>")
+        self.first_para = False
+
+    def code(self, block, numbering):
+        key = content_hash(CODE_KEY, block.lang, block.code)
+        runs = self.code_cache.get(key)
+        if runs is None:
+            lines = []
+            for line in code_lines(block.lang, block.code):
+                lines.append("".join(self.run(Run(text, False, False, style is None, None), style)
+                                     for style, text in line))
+            runs = self.code_cache[key] = "<w:r><w:br /></w:r>".join(lines)
+            self.code_added += 1
+        self.out.append(f'<w:p>{self.ppr("SourceCode", numbering)}{runs}</w:p>')
+        self.first_para = True
+
+    def table(self, block):
+        tbl_pr, grid, header_tc_pr, body_tc_pr = self.table_parts(len(block.header))
+        rows = []
+        for row_idx, cells in enumerate([block.header, *block.rows]):
+            xml = []
+            for cell, align in zip(cells, block.aligns + [None] * len(cells)):
+                jc = f'<w:jc w:val="{align}" />' if align else ""
+                xml.append(f'<w:tc>{header_tc_pr if row_idx == 0 else body_tc_pr}'
+                           f'<w:p>{self.ppr("Compact", None, jc)}{self.runs(inline_runs(cell))}</w:p></w:tc>')
+            tr_pr = '<w:trPr><w:tblHeader w:val="on" /></w:trPr>' if row_idx == 0 else ""
+            rows.append(f"<w:tr>{tr_pr}{''.join(xml)}</w:tr>")
+        self.out.append(f"<w:tbl>{tbl_pr}{grid}{''.join(rows)}</w:tbl>")
+        self.first_para = False
+
+    def list(self, block, ilvl):
+        num_id = CONTINUATION_NUM + 1 + len(self.lists)
+        self.lists.append((num_id, block.ordered, block.start))
+        for blocks in block.items:
+            self.blocks(blocks, numbering=(num_id, ilvl))
+        self.first_para = True
+
+    def close(self):
+        while self.sections:
+            self.out.append(f'<w:bookmarkEnd w:id="{self.sections.pop()[1]}" />')
+
+
+def link_rid(index):
+    """Relationship id of the index-th distinct hyperlink target."""
+    return f"rIdLink{index + 1}"
+
+
+def render(md_text, table_parts):
+    """Render Markdown to the children of <w:body> (without sectPr).
+
+    table_parts(columns) returns (tblPr, tblGrid, header tcPr, body tcPr)
+    XML for a table. Highlighted code blocks are reused from
+    .build_cache/docx_code.json. Returns Rendered(body XML,
+    [(numId, ordered, start)], [hyperlink target per link_rid index]).
+    """
+    writer = _Writer(table_parts, load_json(CODE_CACHE_PATH))
+    writer.blocks(parse_blocks(md_text.split("\n")))
+    writer.close()
+    if writer.code_added:
+        save_json(CODE_CACHE_PATH, writer.code_cache)
+    return Rendered("\n".join(writer.out), writer.lists, list(writer.links))
@@ -0,0 +1,136 @@
+"""Self-hosted, subsetted web fonts for the HTML edition.
+
+The source fonts are supplied locally in fonts/src/ (file names in
+FONT_FACES; they are not committed). After the pages are written,
+convert.py collects every character the rendered pages use and subsets
+each available source font to exactly that set with fontTools, writing
+fonts/<Family>-<weight>.woff2 (WOFF if the brotli module is missing) and
+css/fonts.css with font-display: swap. A face is only re-subset when the
+glyph set or its source file changes.
+
+Without fontTools or source fonts the pages fall back to the system fonts
+in the style.css font stacks; no page loads fonts from the network.
+"""
+
+import importlib.util
+import logging
+import os
+from collections import namedtuple
+
+from buildcache import BASE_DIR, CACHE_DIR
+
+# fontTools.subset takes ~0.15 s to import, so it is only imported to subset
+HAVE_FONTTOOLS = importlib.util.find_spec("fontTools") is not None
+
+try:
+    import brotli  # noqa: F401  (fontTools needs it to write WOFF2)
+except ImportError:
+    brotli = None
+
+FONTS_DIR_REL = "fonts"
+SOURCE_DIR = os.path.join(BASE_DIR, "fonts", "src")
+FONTS_CSS_REL = "css/fonts.css"
+
+# [mtime_ns, size, sha256] of each source font, so unchanged fonts are not re-hashed
+SOURCE_STATE_PATH = os.path.join(CACHE_DIR, "font_sources.json")
+
+# Bump when the subsetting options change
+FONTS_VERSION = "1"
+
+FLAVOR = "woff2" if brotli else "woff"
+
+# family and weight as used in css/style.css; preload = needed for the first paint
+Face = namedtuple("Face", ["family", "weight", "source", "preload"])
+
+FONT_FACES = [
+    Face("Noto Sans KR", 400, "NotoSansKR-Regular.ttf", True),
+    Face("Noto Sans KR", 500, "NotoSansKR-Medium.ttf", False),
+    Face("Noto Sans KR", 600, "NotoSansKR-SemiBold.ttf", False),
+    Face("Noto Sans KR", 700, "NotoSansKR-Bold.ttf", True),
+    Face("Noto Sans KR", 800, "NotoSansKR-ExtraBold.ttf", False),
+    Face("JetBrains Mono", 400, "JetBrainsMono-Regular.ttf", False),
+    Face("JetBrains Mono", 700, "JetBrainsMono-Bold.ttf", False),
+]
+
+# Printable ASCII is always kept, so text typed into the search box renders too
+BASE_CHARS = "".join(chr(c) for c in range(0x20, 0x7F))
+
+
+def face_rel(face):
+    """Path of a subsetted face, relative to the repo root."""
+    return f"{FONTS_DIR_REL}/{face.family.replace(' ', '')}-{face.weight}.{FLAVOR}"
+
+
+def source_path(face):
+    return os.path.join(SOURCE_DIR, face.source)
+
+
+def fonttools_version():
+    from fontTools import version
+    return version
+
+
+def available_faces():
+    """Faces that can be built: fontTools is installed and the source font exists."""
+    if not HAVE_FONTTOOLS:
+        return []
+    return [face for face in FONT_FACES if os.path.exists(source_path(face))]
+
+
+def head_links(root):
+    """<link> tags for a page <head>, each on its own line ("" without fonts).
+
+    root is the path from the page to the repo root.
+    """
+    faces = available_faces()
+    if not faces:
+        return ""
+    links = [f'<link rel="preload" href="{root}{face_rel(face)}" as="font" type="font/{FLAVOR}" crossorigin>'
+             for face in faces if face.preload]
+    links.append(f'<link rel="stylesheet" href="{root}{FONTS_CSS_REL}">')
+    return "".join(f"\n  {link}" for link in links)
+
+
+def collect_glyphs(paths):
+    """Sorted string of every character in the given files, plus BASE_CHARS."""
+    chars = set(BASE_CHARS)
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            chars.update(f.read())
+    return "".join(sorted(c for c in chars if c >= " "))
+
+
+def font_face_css(faces):
+    """css/fonts.css for the given faces."""
+    rules = []
+    for face in faces:
+        rules.append(f"""@font-face {{
+  font-family: '{face.family}';
+  font-style: normal;
+  font-weight: {face.weight};
+  font-display: swap;
+  src: url('../{face_rel(face)}') format('{FLAVOR}');
+}}""")
+    return "\n\n".join(rules) + "\n"
+
+
+def subset_face(face, glyphs):
+    """Subset face's source font to glyphs and write it. Returns bytes written."""
+    from fontTools import subset
+
+    options = subset.Options()
+    options.flavor = FLAVOR
+    options.layout_features = ["*"]  # keep kerning and Hangul/ligature shaping
+    # "<table> NOT subset; dropped" notices for vendor tables are expected
+    logging.getLogger("fontTools.subset").setLevel(logging.ERROR)
+    font = subset.load_font(source_path(face), options)
+    try:
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(text=glyphs)
+        subsetter.subset(font)
+        out_path = os.path.join(BASE_DIR, face_rel(face))
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        subset.save_font(font, out_path, options)
+    finally:
+        font.close()
+    return os.path.getsize(out_path)
@@ -0,0 +1,97 @@
+"""Build-time syntax highlighting of fenced code blocks, cached on disk.
+
+highlight_fence() is registered with pymdownx.superfences as the formatter
+for every fenced block. Each block is highlighted with Pygments once; the
+HTML is stored under .build_cache/highlight/ keyed by (language, code,
+formatter options, Pygments version), so a snippet costs nothing on later
+builds or in other worker processes. Without Pygments, blocks are emitted
+as plain <pre><code>.
+
+The token colours live in css/style.css; regenerate that section with:
+    python3 highlight.py > /tmp/highlight.css
+"""
+
+import html
+import os
+
+from buildcache import CACHE_DIR, content_hash
+
+# The lexers and formatter are imported on the first block that is not cached
+try:
+    import pygments
+except ImportError:
+    pygments = None
+
+HIGHLIGHT_DIR = os.path.join(CACHE_DIR, "highlight")
+
+# Bump when the generated markup changes to invalidate cached blocks
+HIGHLIGHT_VERSION = "1"
+
+# HtmlFormatter options; token colours come from css/style.css
+FORMATTER_OPTIONS = {"cssclass": "highlight", "wrapcode": True}
+STYLE = "github-dark"
+CSS_SCOPE = ".content .highlight"
+
+# Identifies everything that shapes highlighted HTML (part of convert.py's body key)
+HIGHLIGHTER_KEY = content_hash(HIGHLIGHT_VERSION, pygments.__version__ if pygments else "none",
+                               repr(sorted(FORMATTER_OPTIONS.items())))
+
+_memo = {}  # key -> html, for blocks seen by this process
+
+
+def _render(src, language):
+    if pygments is None:
+        cls = f' class="language-{html.escape(language)}"' if language else ""
+        return f"<pre><code{cls}>{html.escape(src)}</code></pre>"
+    from pygments import highlight
+    from pygments.formatters import HtmlFormatter
+    from pygments.lexers import TextLexer, get_lexer_by_name
+    from pygments.util import ClassNotFound
+
+    try:
+        lexer = get_lexer_by_name(language) if language else TextLexer()
+    except ClassNotFound:
+        lexer = TextLexer()
+    return highlight(src, lexer, HtmlFormatter(**FORMATTER_OPTIONS))
+
+
+def highlight_code(src, language):
+    """Highlighted HTML for one code block, from the cache when possible."""
+    key = content_hash(HIGHLIGHTER_KEY, language or "", src)
+    cached = _memo.get(key)
+    if cached is not None:
+        return cached
+    path = os.path.join(HIGHLIGHT_DIR, key[:2], key + ".html")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cached = f.read()
+    except OSError:
+        cached = _render(src, language)
+        # Worker processes may write the same block; each uses its own temp file
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(cached)
+        os.replace(tmp_path, path)
+    _memo[key] = cached
+    return cached
+
+
+def highlight_fence(src, language, class_name, options, md, **kwargs):
+    """pymdownx.superfences formatter for all fenced blocks."""
+    return highlight_code(src, language)
+
+
+def style_css():
+    """Token colour rules for css/style.css (backgrounds are left to the stylesheet)."""
+    from pygments.formatters import HtmlFormatter
+
+    rules = HtmlFormatter(style=STYLE).get_style_defs(CSS_SCOPE).splitlines()
+    return "\n".join(rule for rule in rules
+                     if "background" not in rule and not rule.startswith(("pre ", "td.", "span.linenos")))
+
+
+if __name__ == "__main__":
+    if pygments is None:
+        raise SystemExit("Pygments is not installed (pip3 install pygments)")
+    print(style_css())
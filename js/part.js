@@ -0,0 +1,78 @@
+/* Loads the chapters of a part page on demand (see part_body in convert.py).
+ *
+ * A part page inlines its first chapter; every other chapter is a
+ * .part-chunk placeholder whose data-src is the chunk holding its body.
+ * A chunk is fetched when its placeholder comes within a screen or two of
+ * the viewport, or when the URL fragment names a heading listed in its
+ * data-anchors. If a fetch fails the placeholder keeps its link to the
+ * chapter page, which is also what readers without JavaScript get.
+ */
+(function () {
+  "use strict";
+
+  var chunks = Array.prototype.slice.call(document.querySelectorAll(".part-chunk[data-src]"));
+  if (!chunks.length || !window.fetch) {
+    return;
+  }
+
+  function load(chunk) {
+    if (!chunk.loading) {
+      chunk.loading = fetch(chunk.getAttribute("data-src")).then(function (response) {
+        if (!response.ok) {
+          throw new Error(response.status);
+        }
+        return response.text();
+      }).then(function (html) {
+        chunk.innerHTML = html;
+        chunk.removeAttribute("data-src");
+      }).catch(function (error) {
+        chunk.loading = null;
+        console.warn("part.js: " + chunk.getAttribute("data-src") + ": " + error.message);
+      });
+    }
+    return chunk.loading;
+  }
+
+  function chunkFor(id) {
+    for (var i = 0; i < chunks.length; i++) {
+      var anchors = " " + chunks[i].getAttribute("data-anchors") + " ";
+      if (anchors.indexOf(" " + id + " ") >= 0) {
+        return chunks[i];
+      }
+    }
+    return null;
+  }
+
+  function followHash() {
+    var id = decodeURIComponent(location.hash.slice(1));
+    var chunk = id && chunkFor(id);
+    if (!chunk || !chunk.hasAttribute("data-src")) {
+      return;
+    }
+    load(chunk).then(function () {
+      var target = document.getElementById(id);
+      if (target) {
+        target.scrollIntoView();
+      }
+    });
+  }
+
+  if ("IntersectionObserver" in window) {
+    var observer = new IntersectionObserver(function (entries) {
+      entries.forEach(function (entry) {
+        if (entry.isIntersecting) {
+          observer.unobserve(entry.target);
+          load(entry.target);
+        }
+      });
+    }, {rootMargin: "150% 0px"});
+    chunks.forEach(function (chunk) {
+      observer.observe(chunk);
+    });
+  } else {
+    chunks.forEach(load);
+  }
+
+  window.addEventListener("hashchange", followHash);
+  followHash();
+})();
@@ -0,0 +1,188 @@
+/* Full-text search over the precomputed index written by convert.py (see search.py).
+ *
+ * search/index.json maps each term to a bitmask of the chapter shards that
+ * contain it; only the shards every query term occurs in are fetched, and
+ * each shard is fetched once per page view. Tokenization mirrors search.py.
+ */
+(function () {
+  "use strict";
+
+  var form = document.querySelector(".search");
+  if (!form || !window.fetch || typeof BigInt === "undefined") {
+    return;
+  }
+  var base = form.getAttribute("data-base");  // path from this page to contents/
+  var input = form.querySelector("input");
+  var results = form.querySelector(".search-results");
+  var MAX_RESULTS = 20;
+
+  var HANGUL_RE = /[가-힣]+/g;
+  var IDENT_RE = /[a-z_][a-z0-9_]*(?:\.[a-z_][a-z0-9_]*)*/g;
+
+  function tokenize(text) {
+    var tokens = [];
+    text = text.toLowerCase();
+    (text.match(HANGUL_RE) || []).forEach(function (run) {
+      if (run.length === 1) {
+        tokens.push(run);
+      }
+      for (var i = 0; i < run.length - 1; i++) {
+        tokens.push(run.slice(i, i + 2));
+      }
+    });
+    (text.match(IDENT_RE) || []).forEach(function (ident) {
+      var parts = ident.split(".");
+      if (parts.length > 1) {
+        tokens.push(ident);
+      }
+      parts.forEach(function (part) {
+        if (part.length > 1) {
+          tokens.push(part);
+        }
+      });
+    });
+    return tokens.filter(function (t, i) { return tokens.indexOf(t) === i; });
+  }
+
+  function load(name) {
+    return fetch(base + "search/" + name).then(function (response) {
+      if (!response.ok) {
+        throw new Error(name + ": " + response.status);
+      }
+      return response.json();
+    });
+  }
+
+  var index = null;   // Promise of {shards, masks: Map term -> BigInt}
+  var shards = {};    // shard id -> Promise of shard
+
+  function getIndex() {
+    if (!index) {
+      index = load("index.json").then(function (data) {
+        var masks = new Map();
+        Object.keys(data.terms).forEach(function (mask) {
+          var bits = BigInt("0x" + mask);
+          data.terms[mask].split(" ").forEach(function (term) { masks.set(term, bits); });
+        });
+        return {shards: data.shards, masks: masks};
+      });
+    }
+    return index;
+  }
+
+  function getShard(id) {
+    if (!shards[id]) {
+      shards[id] = load(id + ".json");
+    }
+    return shards[id];
+  }
+
+  // Sections of a shard containing every token, with the summed term counts;
+  // bonus tokens (whole dotted names) only add to the score
+  function matchShard(shard, tokens, bonus) {
+    var scores = null;
+    tokens.forEach(function (token) {
+      var postings = shard.postings[token] || [];
+      var next = new Map();
+      for (var i = 0; i < postings.length; i += 2) {
+        if (scores === null || scores.has(postings[i])) {
+          next.set(postings[i], (scores ? scores.get(postings[i]) : 0) + postings[i + 1]);
+        }
+      }
+      scores = next;
+    });
+    bonus.forEach(function (token) {
+      var postings = shard.postings[token] || [];
+      for (var i = 0; i < postings.length; i += 2) {
+        if (scores.has(postings[i])) {
+          scores.set(postings[i], scores.get(postings[i]) + 2 * postings[i + 1]);
+        }
+      }
+    });
+    var hits = [];
+    scores.forEach(function (score, section) {
+      var anchor = shard.sections[section][0];
+      hits.push({
+        score: score,
+        href: base + shard.id + ".html" + (anchor ? "#" + anchor : ""),
+        chapter: shard.title,
+        section: shard.sections[section][1]
+      });
+    });
+    return hits;
+  }
+
+  function search(query) {
+    // "Flux.flatMap" must also find "Flux.just(1).flatMap(...)", so only its
+    // parts are required; the dotted name itself ranks exact uses first
+    var all = tokenize(query);
+    var bonus = all.filter(function (t) { return t.indexOf(".") >= 0; });
+    var tokens = all.filter(function (t) { return t.indexOf(".") < 0; });
+    if (!tokens.length) {
+      return Promise.resolve([]);
+    }
+    return getIndex().then(function (idx) {
+      var mask = -1n;
+      tokens.forEach(function (token) { mask &= idx.masks.get(token) || 0n; });
+      var ids = idx.shards.filter(function (_, i) { return (mask >> BigInt(i)) & 1n; })
+        .map(function (shard) { return shard[0]; });
+      return Promise.all(ids.map(getShard)).then(function (loaded) {
+        var hits = [];
+        loaded.forEach(function (shard) { hits = hits.concat(matchShard(shard, tokens, bonus)); });
+        return hits.sort(function (a, b) { return b.score - a.score; });
+      });
+    });
+  }
+
+  function show(hits, elapsed) {
+    results.textContent = "";
+    hits.slice(0, MAX_RESULTS).forEach(function (hit) {
+      var li = document.createElement("li");
+      var a = document.createElement("a");
+      a.href = hit.href;
+      a.textContent = hit.section && hit.section !== hit.chapter ? hit.chapter + " › " + hit.section : hit.chapter;
+      li.appendChild(a);
+      results.appendChild(li);
+    });
+    var summary = document.createElement("li");
+    summary.className = "search-summary";
+    summary.textContent = hits.length + "건 · " + Math.round(elapsed) + " ms";
+    results.appendChild(summary);
+    results.hidden = false;
+  }
+
+  var pending = 0;
+  function run() {
+    var query = input.value.trim();
+    var ticket = ++pending;
+    if (!query) {
+      results.hidden = true;
+      return;
+    }
+    var started = performance.now();
+    search(query).then(function (hits) {
+      if (ticket === pending) {
+        show(hits, performance.now() - started);
+      }
+    }, function (error) {
+      console.error("search:", error);
+    });
+  }
+
+  form.hidden = false;
+  results.hidden = true;
+  form.addEventListener("submit", function (e) {
+    e.preventDefault();
+    var first = results.querySelector("a");
+    if (first) {
+      location.href = first.href;
+    }
+  });
+  input.addEventListener("input", run);
+  input.addEventListener("focus", getIndex, {once: true});
+  document.addEventListener("click", function (e) {
+    if (!form.contains(e.target)) {
+      results.hidden = true;
+    }
+  });
+})();
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Rebuild the merged markdown files (parts/partN.md, books.md) from chapters.
+
+Replaces the manual `cat` step of the content pipeline. Each aggregate is
+streamed into a temp file next to it and atomically renamed into place, and
+is skipped entirely when none of its sources changed since the last merge.
+
+Usage:
+    python3 merge.py [--force]
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+
+from buildcache import CACHE_DIR, load_json, save_json, source_state
+from toc import load_toc, part_chapters
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PARTS_DIR = os.path.join(BASE_DIR, "parts")
+BOOKS_MD = os.path.join(BASE_DIR, "books.md")
+
+MERGE_MANIFEST_PATH = os.path.join(CACHE_DIR, "merge_manifest.json")
+# Bump when the merged output changes for the same sources
+MERGE_VERSION = "2"
+
+
+def part_path(file_id):
+    """Path of parts/<file_id>.md."""
+    return os.path.join(PARTS_DIR, f"{file_id}.md")
+
+
+def aggregates():
+    """Return [(output path, [source paths])] in dependency order.
+
+    Each part file is its chapters (from the TOC) concatenated; books.md is
+    all part files followed by the appendices.
+    """
+    book = load_toc()
+    mapping = part_chapters(book)
+    result = [(part_path(part_id), [part_path(ch) for ch in chapters])
+              for part_id, chapters in mapping.items()]
+    book_sources = list(mapping) + [c.file_id for c in book.appendices]
+    result.append((BOOKS_MD, [part_path(file_id) for file_id in book_sources]))
+    return result
+
+
+def concat_atomic(out_path, sources):
+    """Stream sources into out_path through a temp file and atomic rename.
+
+    Each source but the last is followed by a blank line, so the next
+    chapter's heading starts a block even if the file ends without one.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(out_path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for i, src in enumerate(sources):
+                with open(src, "rb") as f:
+                    shutil.copyfileobj(f, out)
+                    size = f.tell()
+                    f.seek(max(size - 2, 0))
+                    tail = f.read()
+                if i < len(sources) - 1:
+                    out.write(b"\n" * (2 - len(tail) + len(tail.rstrip(b"\n"))))
+        # mkstemp creates 0600 files; keep the usual permissions of the aggregate
+        os.chmod(tmp_path, os.stat(sources[0]).st_mode & 0o777)
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def merge_all(force=False):
+    """Rebuild every aggregate whose sources changed. Returns the rewritten paths."""
+    manifest = {} if force else load_json(MERGE_MANIFEST_PATH)
+    if manifest.get("version") != MERGE_VERSION:
+        manifest = {"version": MERGE_VERSION}
+    merged = []
+
+    for out_path, sources in aggregates():
+        missing = [src for src in sources if not os.path.exists(src)]
+        if missing:
+            print(f"SKIP (not found): {', '.join(os.path.relpath(m, BASE_DIR) for m in missing)}")
+            continue
+
+        out_rel = os.path.relpath(out_path, BASE_DIR)
+        previous = manifest.get(out_rel, {})
+        state = {}
+        for src in sources:
+            src_rel = os.path.relpath(src, BASE_DIR)
+            state[src_rel] = source_state(src, previous.get(src_rel))
+
+        unchanged = ({rel: s[2] for rel, s in state.items()}
+                     == {rel: s[2] for rel, s in previous.items()})
+        if unchanged and os.path.exists(out_path):
+            manifest[out_rel] = state
+            continue
+
+        concat_atomic(out_path, sources)
+        manifest[out_rel] = state
+        merged.append(out_path)
+        print(f"Merged: {out_rel}")
+
+    save_json(MERGE_MANIFEST_PATH, manifest)
+    return merged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--force", action="store_true",
+                        help="rewrite every aggregate even if its sources are unchanged")
+    args = parser.parse_args(argv)
+    merged = merge_all(force=args.force)
+    print(f"\nDone! {len(merged)} merged file(s) updated.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Service worker for offline reading of the HTML edition.
+
+convert.py writes sw.js at the site root (dist.py writes the dist/ copy
+with the hashed asset names). Its precache list holds the index, every
+chapter and part page with the part pages' chapter chunks, the 찾아보기
+(index) page, the stylesheets, scripts, fonts and the search dictionary,
+each with a content-hash revision; the cache version is a hash over that
+list. On update, entries whose revision did
+not change are copied from the previous cache instead of being
+downloaded again.
+
+Precached files are served cache-first, so every link in the book works
+without network after the first visit. The search shards (one per
+chapter) are left out to keep the first download smaller; they are
+cached as they are used (stale-while-revalidate), so offline search
+covers the chapters already searched.
+"""
+
+import json
+
+from buildcache import content_hash
+
+SW_REL = "sw.js"
+
+# Bump when the worker script below changes
+SW_VERSION = "2"
+
+SW_TEMPLATE = """/* Generated by convert.py (see offline.py); do not edit. */
+"use strict";
+
+const VERSION = "%(version)s";
+const PRECACHE = %(precache)s;
+const CACHE = "book-" + VERSION;
+const RUNTIME = "book-runtime-" + VERSION;
+const REVISIONS = "__revisions";
+
+function url(path) {
+  return new URL(path, self.registration.scope).href;
+}
+
+self.addEventListener("install", (event) => {
+  event.waitUntil((async () => {
+    const cache = await caches.open(CACHE);
+    // Reuse unchanged entries from the newest previous version
+    const names = (await caches.keys()).filter((n) => n.startsWith("book-") && !n.startsWith("book-runtime-"));
+    let old = null, oldRevisions = {};
+    for (const name of names.filter((n) => n !== CACHE)) {
+      const candidate = await caches.open(name);
+      const stored = await candidate.match(url(REVISIONS));
+      if (stored) {
+        old = candidate;
+        oldRevisions = await stored.json();
+      }
+    }
+    await Promise.all(PRECACHE.map(async ([path, revision]) => {
+      const previous = old && oldRevisions[path] === revision ? await old.match(url(path)) : null;
+      const response = previous || await fetch(url(path), {cache: "no-cache"});
+      if (!response.ok) {
+        throw new Error(path + ": " + response.status);
+      }
+      await cache.put(url(path), response);
+    }));
+    await cache.put(url(REVISIONS), new Response(JSON.stringify(Object.fromEntries(PRECACHE))));
+    await self.skipWaiting();
+  })());
+});
+
+self.addEventListener("activate", (event) => {
+  event.waitUntil((async () => {
+    for (const name of await caches.keys()) {
+      if (name.startsWith("book-") && name !== CACHE && name !== RUNTIME) {
+        await caches.delete(name);
+      }
+    }
+    await self.clients.claim();
+  })());
+});
+
+self.addEventListener("fetch", (event) => {
+  const request = event.request;
+  if (request.method !== "GET" || !request.url.startsWith(self.registration.scope)) {
+    return;
+  }
+  let key = request.url.split("#")[0].split("?")[0];
+  if (key.endsWith("/")) {
+    key += "index.html";
+  }
+  event.respondWith((async () => {
+    const cached = await (await caches.open(CACHE)).match(key);
+    if (cached) {
+      return cached;
+    }
+    // Not precached (search shards): stale-while-revalidate
+    const runtime = await caches.open(RUNTIME);
+    const stale = await runtime.match(key);
+    const fresh = fetch(request).then((response) => {
+      if (response.ok) {
+        runtime.put(key, response.clone());
+      }
+      return response;
+    });
+    if (stale) {
+      event.waitUntil(fresh.catch(() => null));
+      return stale;
+    }
+    return fresh;
+  })());
+});
+"""
+
+
+def register_script(root):
+    """Inline <script> that registers the service worker; root is the path to the site root."""
+    return (f'<script>if ("serviceWorker" in navigator) '
+            f'navigator.serviceWorker.register("{root}{SW_REL}");</script>')
+
+
+def service_worker(entries):
+    """sw.js source for [(path relative to the site root, revision)]."""
+    entries = sorted(entries)
+    version = content_hash(SW_VERSION, *(f"{path} {revision}" for path, revision in entries))[:16]
+    precache = "[\n" + ",\n".join(f"  {json.dumps([path, revision])}" for path, revision in entries) + "\n]"
+    return SW_TEMPLATE % {"version": version, "precache": precache}
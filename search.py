@@ -0,0 +1,112 @@
+"""Full-text search index for the HTML edition.
+
+convert.py writes one shard per chapter page (contents/search/<file_id>.json)
+from the rendered chapter body, plus a small term dictionary
+(contents/search/index.json) that tells the browser which shards contain a
+term. js/search.js loads the dictionary on first use and fetches only the
+shards a query can match.
+
+Tokens: Hangul runs become bigrams (a single syllable stays as is), so
+Korean matches regardless of particles and spacing; ASCII words become
+identifier tokens, and dotted names such as Flux.flatMap are indexed both
+whole and per part. js/search.js tokenizes queries the same way.
+
+Shard: {"id", "title", "sections": [[anchor, title], ...],
+        "postings": {term: [section, count, section, count, ...]}}
+Index: {"shards": [[id, title], ...],
+        "terms": {hex bitmask of shards: "term term ..."}}  (grouped by mask)
+"""
+
+import html
+import json
+import re
+from collections import Counter
+
+SEARCH_DIR_REL = "contents/search"
+INDEX_REL = f"{SEARCH_DIR_REL}/index.json"
+
+# Bump when the tokenizer or file layout changes (js/search.js must match)
+SEARCH_VERSION = "1"
+
+HANGUL_RE = re.compile(r"[가-힣]+")
+IDENT_RE = re.compile(r"[a-z_][a-z0-9_]*(?:\.[a-z_][a-z0-9_]*)*")
+SECTION_RE = re.compile(r'<h([1-3]) id="([^"]*)"[^>]*>(.*?)</h\1>', re.S)
+TAG_RE = re.compile(r"<[^>]+>")
+
+
+def shard_rel(file_id):
+    """Path of a chapter's search shard, relative to the repo root."""
+    return f"{SEARCH_DIR_REL}/{file_id}.json"
+
+
+def tokenize(text):
+    """Yield the search tokens of text (see the module docstring)."""
+    text = text.lower()
+    for run in HANGUL_RE.findall(text):
+        if len(run) == 1:
+            yield run
+        for i in range(len(run) - 1):
+            yield run[i:i + 2]
+    for ident in IDENT_RE.findall(text):
+        parts = ident.split(".")
+        if len(parts) > 1:
+            yield ident
+        for part in parts:
+            if len(part) > 1:
+                yield part
+
+
+def _text(fragment):
+    return html.unescape(TAG_RE.sub(" ", fragment))
+
+
+def split_sections(body_html):
+    """Split a rendered body into [(anchor, title, text)] at h1-h3 headings.
+
+    Text before the first heading belongs to a section with an empty anchor.
+    """
+    sections = []
+    anchor, title, start = "", "", 0
+    for m in SECTION_RE.finditer(body_html):
+        sections.append((anchor, title, _text(body_html[start:m.start()])))
+        anchor, title, start = m.group(2), " ".join(_text(m.group(3)).split()), m.end()
+    sections.append((anchor, title, _text(body_html[start:])))
+    # Heading text is searchable too
+    return [(a, t, f"{t} {body}") for a, t, body in sections if t or body.strip()]
+
+
+def build_shard(file_id, title, body_html):
+    """Search shard of one chapter page."""
+    sections = split_sections(body_html)
+    postings = {}
+    for i, (_, _, text) in enumerate(sections):
+        for term, count in Counter(tokenize(text)).items():
+            postings.setdefault(term, []).extend((i, count))
+    return {
+        "id": file_id,
+        "title": title,
+        "sections": [[anchor, section_title] for anchor, section_title, _ in sections],
+        "postings": postings,
+    }
+
+
+def build_index(shards):
+    """Term dictionary over the given shards, in order."""
+    masks = {}
+    for bit, shard in enumerate(shards):
+        for term in shard["postings"]:
+            masks[term] = masks.get(term, 0) | (1 << bit)
+    # Most terms occur in one or a few chapters; grouping by mask keeps the file small
+    groups = {}
+    for term, mask in sorted(masks.items()):
+        groups.setdefault(format(mask, "x"), []).append(term)
+    return {
+        "version": SEARCH_VERSION,
+        "shards": [[shard["id"], shard["title"]] for shard in shards],
+        "terms": {mask: " ".join(terms) for mask, terms in groups.items()},
+    }
+
+
+def dumps(data):
+    """Compact JSON for the browser."""
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""Local preview server for the generated HTML book.
+
+Serves index.html, sw.js, contents/, css/, js/ and fonts/ over HTTP/1.1 with keep-alive. Text
+responses are compressed (brotli if the `brotli` module is installed,
+otherwise gzip); precompressed .br/.gz siblings next to a file are used
+when they are up to date, other variants are compressed once per file
+version and kept in memory. Every response carries a strong ETag derived
+from the content hash, and If-None-Match requests are answered with 304.
+
+Open pages reload themselves when convert.py rewrites them: the server
+polls the served files and pushes the changed paths to the browser over
+Server-Sent Events (/__livereload). Run `python3 convert.py --watch` in a
+second terminal for edit -> rebuild -> reload.
+
+With --dist the deployable tree from `convert.py --dist` is served instead,
+using its .gz/.br files as is; the content-hashed files under /assets/ get
+immutable cache headers, and live reload is off.
+
+Usage:
+    python3 serve.py [--host 127.0.0.1] [--port 8000] [--no-reload] [--dist]
+"""
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+from collections import namedtuple
+from email.utils import formatdate
+from urllib.parse import unquote, urlsplit
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Build output that is served; everything else in the repo is not
+SERVED = ("index.html", "sw.js", "contents", "css", "js", "fonts")
+DIST_SERVED = ("index.html", "sw.js", "contents", "assets")
+IMMUTABLE_PREFIX = "/assets/"  # dist/assets/ names carry a content hash
+
+LIVERELOAD_PATH = "/__livereload"
+POLL_INTERVAL = 0.3         # seconds between checks for rewritten files
+KEEPALIVE_TIMEOUT = 15      # seconds an idle connection is kept open
+SSE_PING_INTERVAL = 15      # seconds between SSE keep-alive comments
+MAX_HEADER_BYTES = 16 * 1024
+MIN_COMPRESS_SIZE = 512     # smaller bodies are sent as is
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+LIVERELOAD_SNIPPET = b"""<script>
+(function () {
+  // The offline service worker would answer reloads from its cache
+  if ("serviceWorker" in navigator) {
+    navigator.serviceWorker.getRegistrations().then(function (regs) {
+      regs.forEach(function (reg) { reg.unregister(); });
+    });
+  }
+  var here = location.pathname.replace(/\\/$/, "/index.html");
+  var source = new EventSource("%s");
+  source.addEventListener("change", function (e) {
+    var paths = JSON.parse(e.data);
+    if (paths.indexOf(here) >= 0 || paths.some(function (p) { return /\\.css$/.test(p); })) {
+      location.reload();
+    }
+  });
+})();
+</script>
+""" % LIVERELOAD_PATH.encode()
+
+STATUS_TEXT = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found",
+               405: "Method Not Allowed"}
+
+# A served file version: the body, its content type, its ETag tag (content hash)
+# and the compressed variants made so far ({"gzip": bytes, "br": bytes})
+Asset = namedtuple("Asset", ["stat", "body", "content_type", "tag", "variants"])
+
+
+def resolve(url_path, root, served):
+    """Map a URL path to a file under one of root's served entries, or None."""
+    rel = posixpath.normpath(unquote(url_path)).lstrip("/")
+    if rel in ("", "."):
+        rel = "index.html"
+    if rel.startswith("..") or rel.split("/", 1)[0] not in served:
+        return None
+    path = os.path.join(root, *rel.split("/"))
+    return path if os.path.isfile(path) else None
+
+
+def accepted_encodings(header):
+    """Encodings from an Accept-Encoding header with q > 0."""
+    result = set()
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name and q > 0:
+            result.add(name.strip().lower())
+    return result
+
+
+def _compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+class Server:
+    def __init__(self, live_reload=True, dist=False):
+        self.live_reload = live_reload and not dist
+        self.dist = dist
+        self.root = os.path.join(BASE_DIR, "dist") if dist else BASE_DIR
+        self.served = DIST_SERVED if dist else SERVED
+        self.encodings = ["br", "gzip"] if brotli else ["gzip"]
+        self.assets = {}        # path -> Asset
+        self.listeners = set()  # asyncio.Queue per open SSE stream
+
+    # ---- assets -------------------------------------------------------
+    def load(self, path):
+        """Return the current Asset for path, re-reading it if the file changed."""
+        st = os.stat(path)
+        stat = (st.st_mtime_ns, st.st_size)
+        asset = self.assets.get(path)
+        if asset is not None and asset.stat == stat:
+            return asset
+        with open(path, "rb") as f:
+            body = f.read()
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if content_type.startswith("text/") or content_type == "application/javascript":
+            content_type += "; charset=utf-8"
+        if self.live_reload and content_type.startswith("text/html"):
+            body = body.replace(b"</body>", LIVERELOAD_SNIPPET + b"</body>", 1)
+        tag = hashlib.sha256(body).hexdigest()[:32]
+        asset = Asset(stat, body, content_type, tag, {})
+        self.assets[path] = asset
+        return asset
+
+    async def variant(self, path, asset, encoding):
+        """Compressed body of asset, from a fresh sibling file or compressed once."""
+        if encoding not in asset.variants:
+            data = None
+            sibling = path + (".br" if encoding == "br" else ".gz")
+            # Precompressed siblings can't contain the injected reload script
+            injected = self.live_reload and asset.content_type.startswith("text/html")
+            if not injected and os.path.exists(sibling) and os.stat(sibling).st_mtime_ns >= asset.stat[0]:
+                with open(sibling, "rb") as f:
+                    data = f.read()
+            if data is None:
+                loop = asyncio.get_running_loop()
+                data = await loop.run_in_executor(None, _compress, asset.body, encoding)
+            asset.variants[encoding] = data
+        return asset.variants[encoding]
+
+    # ---- HTTP ---------------------------------------------------------
+    async def respond(self, method, url_path, headers):
+        """Return (status, headers, body) for a GET/HEAD request."""
+        if method not in ("GET", "HEAD"):
+            return 405, {"Allow": "GET, HEAD"}, b"Method Not Allowed\n"
+        path = resolve(url_path, self.root, self.served)
+        if path is None:
+            return 404, {"Content-Type": "text/plain; charset=utf-8"}, b"Not Found\n"
+        asset = self.load(path)
+
+        encoding = None
+        if len(asset.body) >= MIN_COMPRESS_SIZE and asset.content_type.startswith(COMPRESSIBLE_TYPES):
+            accepted = accepted_encodings(headers.get("accept-encoding", ""))
+            encoding = next((e for e in self.encodings if e in accepted), None)
+        etag = f'"{asset.tag}-{encoding}"' if encoding else f'"{asset.tag}"'
+        out = {
+            "Content-Type": asset.content_type,
+            "ETag": etag,
+            "Cache-Control": ("public, max-age=31536000, immutable"
+                              if self.dist and url_path.startswith(IMMUTABLE_PREFIX) else "no-cache"),
+            "Vary": "Accept-Encoding",
+        }
+
+        # Any variant of the same content is still fresh for the client
+        candidates = {t.strip().removeprefix("W/") for t in headers.get("if-none-match", "").split(",")}
+        if "*" in candidates or any(t.strip('"').split("-")[0] == asset.tag for t in candidates if t):
+            return 304, out, b""
+
+        body = asset.body
+        if encoding:
+            body = await self.variant(path, asset, encoding)
+            out["Content-Encoding"] = encoding
+        return 200, out, body
+
+    async def handle(self, reader, writer):
+        """Serve requests on one connection until it closes or idles out."""
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEPALIVE_TIMEOUT)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError,
+                        asyncio.LimitOverrunError, ConnectionError):
+                    break
+                try:
+                    request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                    method, target, version = request_line.split(" ")
+                except ValueError:
+                    await self.send(writer, "HTTP/1.1", 400, {}, b"Bad Request\n", False)
+                    break
+                headers = {}
+                for line in header_lines:
+                    name, sep, value = line.partition(":")
+                    if sep:
+                        headers[name.strip().lower()] = value.strip()
+                connection = headers.get("connection", "").lower()
+                keep_alive = (connection != "close" if version == "HTTP/1.1"
+                              else connection == "keep-alive")
+                url_path = urlsplit(target).path
+
+                if self.live_reload and method == "GET" and url_path == LIVERELOAD_PATH:
+                    await self.stream_events(writer)
+                    break
+                if "content-length" in headers or "transfer-encoding" in headers:
+                    keep_alive = False  # request bodies are not read
+                status, out, body = await self.respond(method, url_path, headers)
+                await self.send(writer, version, status, out, body, keep_alive, method == "HEAD")
+                print(f"{method} {url_path} {status} {out.get('Content-Encoding', '')}".rstrip())
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def send(self, writer, version, status, headers, body, keep_alive, head_only=False):
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT[status]}",
+                 f"Date: {formatdate(usegmt=True)}",
+                 "Server: book-preview"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        if status != 304:
+            lines.append(f"Content-Length: {len(body)}")
+        if keep_alive:
+            lines.append(f"Keep-Alive: timeout={KEEPALIVE_TIMEOUT}")
+        else:
+            lines.append("Connection: close")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        if status != 304 and not head_only:
+            writer.write(body)
+        await writer.drain()
+
+    # ---- live reload --------------------------------------------------
+    async def stream_events(self, writer):
+        """Hold an SSE stream open and forward change events to it."""
+        queue = asyncio.Queue()
+        self.listeners.add(queue)
+        try:
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                         b"Cache-Control: no-cache\r\nConnection: keep-alive\r\n\r\nretry: 1000\n\n")
+            await writer.drain()
+            while True:
+                try:
+                    paths = await asyncio.wait_for(queue.get(), SSE_PING_INTERVAL)
+                    writer.write(f"event: change\ndata: {json.dumps(paths)}\n\n".encode("utf-8"))
+                except asyncio.TimeoutError:
+                    writer.write(b": ping\n\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.listeners.discard(queue)
+
+    def served_files(self):
+        """{url path: (mtime_ns, size)} for every served file."""
+        state = {}
+        for name in self.served:
+            top = os.path.join(self.root, name)
+            if os.path.isfile(top):
+                paths = [top]
+            else:
+                paths = [os.path.join(d, f) for d, _, files in os.walk(top) for f in files]
+            for path in paths:
+                if path.endswith((".gz", ".br")):
+                    continue
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                url = "/" + os.path.relpath(path, self.root).replace(os.sep, "/")
+                state[url] = (st.st_mtime_ns, st.st_size)
+        return state
+
+    async def watch_files(self):
+        """Poll the served files and notify SSE listeners of changes."""
+        state = self.served_files()
+        while True:
+            await asyncio.sleep(POLL_INTERVAL)
+            current = self.served_files()
+            changed = sorted(url for url in set(state) | set(current) if state.get(url) != current.get(url))
+            state = current
+            if changed and self.listeners:
+                print(f"Reload: {', '.join(changed)}")
+                for queue in self.listeners:
+                    queue.put_nowait(changed)
+
+
+async def serve(host, port, live_reload, dist=False):
+    server = Server(live_reload, dist)
+    if dist and not os.path.isdir(server.root):
+        raise SystemExit("dist/ does not exist; run python3 convert.py --dist first")
+    listener = await asyncio.start_server(server.handle, host, port, limit=MAX_HEADER_BYTES)
+    watcher = asyncio.create_task(server.watch_files()) if server.live_reload else None
+    encodings = ", ".join(server.encodings)
+    mode = ", dist/" if dist else (", live reload" if server.live_reload else "")
+    print(f"Serving http://{host}:{port}/ ({encodings}{mode})")
+    if not brotli:
+        print("  (pip3 install brotli to enable br)")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        if watcher:
+            watcher.cancel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Preview server for the generated HTML book")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--no-reload", action="store_true",
+                        help="don't inject the live reload script or serve /__livereload")
+    parser.add_argument("--dist", action="store_true",
+                        help="serve dist/ (convert.py --dist) with immutable caching of assets/")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, not args.no_reload, args.dist))
+    except KeyboardInterrupt:
+        print("\nStopped.")
+
+
+if __name__ == "__main__":
+    main()
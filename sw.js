@@ -0,0 +1,134 @@
+/* Generated by convert.py (see offline.py); do not edit. */
+"use strict";
+
+const VERSION = "9cfa67b7105ca671";
+const PRECACHE = [
+  ["contents/appendix_a.html", "95b4460293925a15"],
+  ["contents/appendix_b.html", "e966a79838075dc8"],
+  ["contents/appendix_c.html", "a41a8951dbef4187"],
+  ["contents/appendix_d.html", "b2d0267b9a51f619"],
+  ["contents/ch01.html", "fa35801d45bf3557"],
+  ["contents/ch02.html", "c2f179837465eedc"],
+  ["contents/ch03.html", "f1a996fa2b7e6359"],
+  ["contents/ch04.html", "2b786043e63d197c"],
+  ["contents/ch05.html", "3947b5375a8dd862"],
+  ["contents/ch06.html", "221f661f3403da9f"],
+  ["contents/ch07.html", "f363ee31f181ea6d"],
+  ["contents/ch08.html", "45da6199295592c6"],
+  ["contents/ch09.html", "2409ad53ef4354d7"],
+  ["contents/ch10.html", "60bc5398e1887e5a"],
+  ["contents/ch11.html", "5ff51cfb047fefe3"],
+  ["contents/ch12.html", "f236a359eb94e92e"],
+  ["contents/ch13.html", "21600f1e1437c4fd"],
+  ["contents/ch14.html", "528531a261da5aad"],
+  ["contents/ch15.html", "dd9c12c517beae59"],
+  ["contents/ch16.html", "b9f78839440e049a"],
+  ["contents/ch17.html", "0552fd2d18943f8e"],
+  ["contents/ch18.html", "d695b934756b81af"],
+  ["contents/ch19.html", "747b773989ea7659"],
+  ["contents/ch20.html", "01afb0255cec99bb"],
+  ["contents/ch21.html", "a1a6a8ce61a23a0d"],
+  ["contents/chunks/part1-ch02.html", "6f8b9eb84dd43af8"],
+  ["contents/chunks/part1-ch03.html", "7f28a2d21eb66196"],
+  ["contents/chunks/part1-ch04.html", "1aee6c549432049e"],
+  ["contents/chunks/part2-ch06.html", "1880b8202c431bcc"],
+  ["contents/chunks/part2-ch07.html", "50256db38fab7fb1"],
+  ["contents/chunks/part3-ch09.html", "f1ce559d164b8425"],
+  ["contents/chunks/part3-ch10.html", "e937b40dd8051606"],
+  ["contents/chunks/part3-ch11.html", "d3ac5cee05cc3845"],
+  ["contents/chunks/part4-ch13.html", "947bbe2db619a11a"],
+  ["contents/chunks/part4-ch14.html", "396582a435d6f164"],
+  ["contents/chunks/part4-ch15.html", "a2769a8b298f9041"],
+  ["contents/chunks/part5-ch17.html", "ecc9d3b1680877f8"],
+  ["contents/chunks/part6-ch19.html", "69627a7e8f3834ff"],
+  ["contents/chunks/part6-ch20.html", "b296d067471b1ebc"],
+  ["contents/part1.html", "64d4e575bf467d4a"],
+  ["contents/part2.html", "604d5842333d9fc3"],
+  ["contents/part3.html", "f64f0facda9b14dd"],
+  ["contents/part4.html", "dc3039940749b23b"],
+  ["contents/part5.html", "b94911515d5e4f22"],
+  ["contents/part6.html", "d3a33efbc6214ca8"],
+  ["contents/part7.html", "bab347149584397f"],
+  ["contents/search/index.json", "24ecb1933a2bcaed"],
+  ["contents/terms.html", "177e42d91cbc5e7b"],
+  ["css/style.css", "0f0bb22eaeb07e6c"],
+  ["index.html", "bc09a22a40c2ecb5"],
+  ["js/part.js", "0e90bf196945fa03"],
+  ["js/search.js", "562a8a2d684f788c"]
+];
+const CACHE = "book-" + VERSION;
+const RUNTIME = "book-runtime-" + VERSION;
+const REVISIONS = "__revisions";
+
+function url(path) {
+  return new URL(path, self.registration.scope).href;
+}
+
+self.addEventListener("install", (event) => {
+  event.waitUntil((async () => {
+    const cache = await caches.open(CACHE);
+    // Reuse unchanged entries from the newest previous version
+    const names = (await caches.keys()).filter((n) => n.startsWith("book-") && !n.startsWith("book-runtime-"));
+    let old = null, oldRevisions = {};
+    for (const name of names.filter((n) => n !== CACHE)) {
+      const candidate = await caches.open(name);
+      const stored = await candidate.match(url(REVISIONS));
+      if (stored) {
+        old = candidate;
+        oldRevisions = await stored.json();
+      }
+    }
+    await Promise.all(PRECACHE.map(async ([path, revision]) => {
+      const previous = old && oldRevisions[path] === revision ? await old.match(url(path)) : null;
+      const response = previous || await fetch(url(path), {cache: "no-cache"});
+      if (!response.ok) {
+        throw new Error(path + ": " + response.status);
+      }
+      await cache.put(url(path), response);
+    }));
+    await cache.put(url(REVISIONS), new Response(JSON.stringify(Object.fromEntries(PRECACHE))));
+    await self.skipWaiting();
+  })());
+});
+
+self.addEventListener("activate", (event) => {
+  event.waitUntil((async () => {
+    for (const name of await caches.keys()) {
+      if (name.startsWith("book-") && name !== CACHE && name !== RUNTIME) {
+        await caches.delete(name);
+      }
+    }
+    await self.clients.claim();
+  })());
+});
+
+self.addEventListener("fetch", (event) => {
+  const request = event.request;
+  if (request.method !== "GET" || !request.url.startsWith(self.registration.scope)) {
+    return;
+  }
+  let key = request.url.split("#")[0].split("?")[0];
+  if (key.endsWith("/")) {
+    key += "index.html";
+  }
+  event.respondWith((async () => {
+    const cached = await (await caches.open(CACHE)).match(key);
+    if (cached) {
+      return cached;
+    }
+    // Not precached (search shards): stale-while-revalidate
+    const runtime = await caches.open(RUNTIME);
+    const stale = await runtime.match(key);
+    const fresh = fetch(request).then((response) => {
+      if (response.ok) {
+        runtime.put(key, response.clone());
+      }
+      return response;
+    });
+    if (stale) {
+      event.waitUntil(fresh.catch(() => null));
+      return stale;
+    }
+    return fresh;
+  })());
+});
@@ -0,0 +1,131 @@
+"""A small make-like task runner used by build.py.
+
+Each Task declares the files it reads (inputs) and writes (outputs);
+a task depends on every task that writes one of its inputs, plus any
+extra names in deps. Tasks whose dependencies are done run concurrently:
+CPU-bound ones (pool="process") in worker processes, the rest (pandoc
+subprocesses, file I/O) in threads.
+
+A task is skipped when its key is unchanged and its outputs exist and
+were last written by it (two tasks may write the same file in different
+builds, e.g. the DOCX from either writer). The key hashes the task's
+params and the content of its inputs (re-hashed only when mtime or size
+changed, see buildcache.source_state); keys are kept in
+.build_cache/tasks.json. After the run, critical_path() gives the
+chain of tasks that determined the total time.
+"""
+
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from buildcache import BASE_DIR, CACHE_DIR, content_hash, load_json, save_json, source_state
+
+TASKS_PATH = os.path.join(CACHE_DIR, "tasks.json")
+
+# run(*args) executes in the pool; done(result), if given, runs afterwards in
+# the main thread (e.g. to record the result in a manifest). params are
+# extra strings for the key; deps names tasks that must finish first even
+# without a file between them.
+Task = namedtuple("Task", ["name", "run", "args", "inputs", "outputs", "params", "deps", "pool", "done"],
+                  defaults=((), (), (), (), (), "thread", None))
+
+# How a task ended: "ran", "skipped" or "failed"; times from the run's start
+Result = namedtuple("Result", ["status", "start", "end", "error"])
+
+
+def dependencies(tasks):
+    """{task name: set of names it waits for}."""
+    writers = {}
+    for task in tasks:
+        for path in task.outputs:
+            writers[path] = task.name
+    return {task.name: {writers[path] for path in task.inputs if path in writers} | set(task.deps)
+            for task in tasks}
+
+
+def _key(task, states):
+    """Hash of the task's params and inputs; states caches source_state per path."""
+    parts = [task.name, *task.params]
+    for path in task.inputs:
+        rel = os.path.relpath(path, BASE_DIR)
+        if os.path.exists(path):
+            states[rel] = source_state(path, states.get(rel))
+            parts.append(f"{rel} {states[rel][2]}")
+        else:
+            parts.append(f"{rel} missing")
+    return content_hash(*parts)
+
+
+def run_tasks(tasks, jobs=1, force=False, log=print):
+    """Run tasks in dependency order, concurrently where possible.
+
+    Returns {name: Result}. A task whose dependency failed is not run
+    (it fails too).
+    """
+    deps = dependencies(tasks)
+    by_name = {task.name: task for task in tasks}
+    saved = load_json(TASKS_PATH)
+    keys, states = saved.get("keys", {}), saved.get("states", {})
+    written_by = saved.get("written_by", {})  # output path -> task name
+    results = {}
+    running = {}  # future -> (name, key, start)
+    t0 = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max(jobs, 2)) as threads, \
+            ProcessPoolExecutor(max_workers=jobs) as processes:
+        while len(results) < len(tasks):
+            active = {name for name, _, _ in running.values()}
+            progressed = False
+            for task in tasks:
+                if task.name in results or task.name in active:
+                    continue
+                if not all(dep in results for dep in deps[task.name]):
+                    continue
+                now = time.perf_counter() - t0
+                progressed = True
+                if any(results[dep].status == "failed" for dep in deps[task.name]):
+                    results[task.name] = Result("failed", now, now, "dependency failed")
+                    continue
+                key = _key(task, states)
+                if (not force and keys.get(task.name) == key and all(map(os.path.exists, task.outputs))
+                        and all(written_by.get(path, task.name) == task.name for path in task.outputs)):
+                    results[task.name] = Result("skipped", now, now, None)
+                    continue
+                keys.pop(task.name, None)  # recorded again once it succeeds
+                pool = processes if task.pool == "process" else threads
+                running[pool.submit(task.run, *task.args)] = (task.name, key, now)
+            if not running:
+                if not progressed:
+                    raise ValueError(f"dependency cycle among: {', '.join(sorted(set(by_name) - set(results)))}")
+                continue  # every ready task was skipped; look again
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, key, start = running.pop(future)
+                try:
+                    result = future.result()
+                    if by_name[name].done is not None:
+                        by_name[name].done(result)
+                except Exception as e:  # reported with the task; independent tasks go on
+                    log(f"✗ {name}: {e}")
+                    results[name] = Result("failed", start, time.perf_counter() - t0, str(e))
+                    continue
+                keys[name] = key
+                written_by.update((path, name) for path in by_name[name].outputs)
+                results[name] = Result("ran", start, time.perf_counter() - t0, None)
+    save_json(TASKS_PATH, {"keys": keys, "states": states, "written_by": written_by})
+    return results
+
+
+def critical_path(tasks, results):
+    """The chain of tasks, ending at the last to finish, each waiting on the previous one."""
+    deps = dependencies(tasks)
+    if not results:
+        return []
+    name = max(results, key=lambda n: results[n].end)
+    path = [name]
+    while deps[name]:
+        name = max(deps[name], key=lambda n: results[n].end)
+        path.append(name)
+    return path[::-1]
@@ -0,0 +1,197 @@
+"""Table of contents model shared by convert.py, build_docx.py and merge.py.
+
+The book structure (parts, chapter order, appendices) comes from list.md.
+Chapter and section titles come from the headings of parts/<file_id>.md, so
+the HTML index/nav and the DOCX TOC always match the text itself. The parsed
+model is cached in .build_cache/toc.json and reused until a source changes.
+
+Usage:
+    python3 toc.py          # print the current TOC
+"""
+
+import os
+import re
+from collections import namedtuple
+
+from buildcache import CACHE_DIR, load_json, save_json, source_state
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PARTS_DIR = os.path.join(BASE_DIR, "parts")
+LIST_MD = os.path.join(BASE_DIR, "list.md")
+TOC_CACHE_PATH = os.path.join(CACHE_DIR, "toc.json")
+
+# Bump when the parsing rules below change
+TOC_VERSION = "1"
+
+# label: "Chapter 1" / "부록 A", title: "리액티브 프로그래밍 소개",
+# sections: ["1.1 리액티브 프로그래밍이란?", ...]
+Chapter = namedtuple("Chapter", ["file_id", "label", "title", "sections"])
+# label: "Part 1", title: "기초 다지기"
+Part = namedtuple("Part", ["file_id", "label", "title", "chapters"])
+Toc = namedtuple("Toc", ["parts", "appendices"])
+
+PART_RE = re.compile(r"^## (Part (\d+))\. (.+)$")
+CHAPTER_RE = re.compile(r"^### (Chapter (\d+))\. (.+)$")
+APPENDIX_RE = re.compile(r"^### (부록 ([A-Z]))\. (.+)$")
+LIST_ITEM_RE = re.compile(r"^- (.+)$")
+TITLE_RE = re.compile(r"^# (.+?)\. (.+)$")
+# Numbered sections only ("1.1 ...", "A.1 ..."), not "정리"/"요약"/"FAQ 1."
+SECTION_RE = re.compile(r"^## ((?:\d+|[A-Z])\.\d+ .+)$")
+
+
+def chapter_heading(chapter):
+    """Full chapter heading, e.g. "Chapter 1. 리액티브 프로그래밍 소개"."""
+    return f"{chapter.label}. {chapter.title}"
+
+
+def parse_list_md(text):
+    """Parse list.md into a Toc using its own chapter/section titles."""
+    parts, appendices = [], []
+    chapters = None
+    for line in text.splitlines():
+        line = line.rstrip()
+        m = PART_RE.match(line)
+        if m:
+            chapters = []
+            parts.append(Part(f"part{m.group(2)}", m.group(1), m.group(3), chapters))
+            continue
+        if line == "## 부록":
+            chapters = appendices
+            continue
+        m = CHAPTER_RE.match(line)
+        if m and chapters is not None:
+            chapters.append(Chapter(f"ch{int(m.group(2)):02d}", m.group(1), m.group(3), []))
+            continue
+        m = APPENDIX_RE.match(line)
+        if m and chapters is not None:
+            chapters.append(Chapter(f"appendix_{m.group(2).lower()}", m.group(1), m.group(3), []))
+            continue
+        m = LIST_ITEM_RE.match(line)
+        if m and chapters:
+            chapters[-1].sections.append(m.group(1))
+    return Toc(parts, appendices)
+
+
+def scan_headings(md_path):
+    """Return (label, title, sections) from a chapter's top-level headings.
+
+    Lines inside fenced code blocks are ignored (shell comments look like
+    headings). label/title are None if the file has no "# X. title" line.
+    """
+    label = title = None
+    sections = []
+    in_fence = False
+    with open(md_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("```") or line.startswith("~~~"):
+                in_fence = not in_fence
+                continue
+            if in_fence or not line.startswith("#"):
+                continue
+            line = line.rstrip()
+            m = TITLE_RE.match(line)
+            if m and label is None:
+                label, title = m.group(1), m.group(2)
+                continue
+            m = SECTION_RE.match(line)
+            if m:
+                sections.append(m.group(1))
+    return label, title, sections
+
+
+def _apply_headings(chapter):
+    """Replace list.md titles with the chapter file's own headings."""
+    md_path = os.path.join(PARTS_DIR, f"{chapter.file_id}.md")
+    if not os.path.exists(md_path):
+        return chapter
+    label, title, sections = scan_headings(md_path)
+    return Chapter(chapter.file_id, label or chapter.label, title or chapter.title,
+                   sections or chapter.sections)
+
+
+def _source_paths(skeleton):
+    """list.md plus every chapter file the skeleton refers to."""
+    paths = [LIST_MD]
+    for chapter in all_chapters(skeleton):
+        md_path = os.path.join(PARTS_DIR, f"{chapter.file_id}.md")
+        if os.path.exists(md_path):
+            paths.append(md_path)
+    return paths
+
+
+def _to_json(toc):
+    return {
+        "parts": [dict(p._asdict(), chapters=[c._asdict() for c in p.chapters]) for p in toc.parts],
+        "appendices": [c._asdict() for c in toc.appendices],
+    }
+
+
+def _from_json(data):
+    parts = [Part(p["file_id"], p["label"], p["title"], [Chapter(**c) for c in p["chapters"]])
+             for p in data["parts"]]
+    return Toc(parts, [Chapter(**c) for c in data["appendices"]])
+
+
+def load_toc(force=False):
+    """Return the book's Toc, re-parsing only if list.md or a chapter changed."""
+    cache = {} if force else load_json(TOC_CACHE_PATH)
+    cached_sources = cache.get("sources", {}) if cache.get("version") == TOC_VERSION else {}
+
+    with open(LIST_MD, "r", encoding="utf-8") as f:
+        skeleton = parse_list_md(f.read())
+
+    sources = {}
+    for path in _source_paths(skeleton):
+        rel = os.path.relpath(path, BASE_DIR)
+        sources[rel] = source_state(path, cached_sources.get(rel))
+
+    if cached_sources and sources == cached_sources:
+        return _from_json(cache["toc"])
+
+    toc = Toc(
+        [Part(p.file_id, p.label, p.title, [_apply_headings(c) for c in p.chapters])
+         for p in skeleton.parts],
+        [_apply_headings(c) for c in skeleton.appendices],
+    )
+    save_json(TOC_CACHE_PATH, {"version": TOC_VERSION, "sources": sources, "toc": _to_json(toc)})
+    return toc
+
+
+def all_chapters(toc):
+    """Chapters then appendices, in reading order."""
+    return [c for p in toc.parts for c in p.chapters] + list(toc.appendices)
+
+
+def nav_order(toc):
+    """[(file_id, heading)] for every chapter and appendix page."""
+    return [(c.file_id, chapter_heading(c)) for c in all_chapters(toc)]
+
+
+def part_files(toc):
+    """[(file_id, title)] for the merged part pages, e.g. "Part 1. 기초 다지기 (Ch.1-4)"."""
+    result = []
+    for part in toc.parts:
+        if not part.chapters:
+            continue
+        numbers = [c.label.replace("Chapter ", "") for c in part.chapters]
+        span = numbers[0] if len(numbers) == 1 else f"{numbers[0]}-{numbers[-1]}"
+        result.append((part.file_id, f"{part.label}. {part.title} (Ch.{span})"))
+    return result
+
+
+def part_chapters(toc):
+    """{part file_id: [chapter file_ids]}."""
+    return {p.file_id: [c.file_id for c in p.chapters] for p in toc.parts}
+
+
+if __name__ == "__main__":
+    book = load_toc()
+    for part in book.parts:
+        print(f"{part.label}. {part.title}")
+        for chapter in part.chapters:
+            print(f"  {chapter_heading(chapter)}")
+            for section in chapter.sections:
+                print(f"    {section}")
+    print("부록")
+    for chapter in book.appendices:
+        print(f"  {chapter_heading(chapter)}")